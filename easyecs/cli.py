@@ -1,31 +1,63 @@
 #!python
 
+from concurrent.futures import ThreadPoolExecutor
 from importlib.metadata import version
 from dataclasses import dataclass
+import os
 from signal import SIGINT
+from threading import Thread
 import time
 from typing import Callable
 import click
 from easyecs.cloudformation.stack.create import create_stack
 from easyecs.cloudformation.stack.delete import delete_stack
 from easyecs.cloudformation.stack.update import update_stack
-from easyecs.cloudformation.template import create_template
+from easyecs.cloudformation.template import (
+    create_template,
+    is_aws_cdk_required,
+    write_template,
+)
+from easyecs.cloudformation.template.layered import (
+    get_base_stack_name,
+    split_template,
+)
+from easyecs.cloudformation.template.shared import (
+    create_shared_template,
+    get_cluster_name,
+    get_shared_stack_name,
+    share_template,
+)
 from easyecs.cloudformation.fetch import (
     fetch_aws_account,
-    fetch_containers,
+    fetch_tasks_containers,
     fetch_is_stack_created,
     fetch_load_balancer_dns,
+    get_image_pull,
 )
 from easyecs.command import (
     run_nc_commands,
     create_port_forwards,
     execute_command,
+    select_task_containers,
+    synchronize_all,
     popen_procs_port_forward,
     popen_procs_exec_command,
+    process_manager,
     threads,
-    event_handlers,
 )
-from easyecs.docker import build_docker_image
+from easyecs.command.deploy import (
+    dump_deployed_manifest,
+    find_fast_path_changes,
+    reconcile_service_task_definition,
+    update_service_task_definition,
+)
+from easyecs.command.process import terminate_processes
+from easyecs.docker import (
+    DEFAULT_DOCKER_PARALLELISM,
+    DockerBuildOptions,
+    build_docker_image,
+)
+from easyecs.docker.progress import format_build_summary
 from easyecs.helpers.color import Color
 from easyecs.helpers.common import check_credentials
 from easyecs.helpers.loader import Loader
@@ -36,10 +68,56 @@ from easyecs.helpers.settings import (
     ecs_file_to_yaml,
     load_settings,
     read_ecs_file,
+    save_deployed_manifest,
+    save_image_pull,
     save_hash,
 )
 
 
+# Seconds given to port forwards, sessions and observers to stop on Ctrl+C
+# before being terminated then killed.
+SHUTDOWN_TIMEOUT = 5
+
+
+# Thread importing aws_cdk ahead of the template synthesis, if any.
+aws_cdk_prewarm_thread = None
+
+
+def import_aws_cdk():
+    import aws_cdk  # noqa: F401
+
+
+def prewarm_aws_cdk():
+    try:
+        import_aws_cdk()
+    except Exception:
+        # Raised again by step_import_aws_cdk if aws_cdk turns out needed.
+        pass
+
+
+def step_prewarm_aws_cdk(template_args):
+    """
+    Starts importing aws_cdk, which also spawns the jsii runtime, in the
+    background when the template cannot be rendered without it: the manifest
+    is not supported natively and the template is not cached. The import then
+    overlaps with the ecs file hash check and the image builds.
+    """
+    global aws_cdk_prewarm_thread
+    if aws_cdk_prewarm_thread or not is_aws_cdk_required(*template_args):
+        return
+    aws_cdk_prewarm_thread = Thread(target=prewarm_aws_cdk, daemon=True)
+    aws_cdk_prewarm_thread.start()
+
+
+def wait_for_aws_cdk():
+    """
+    Imports aws_cdk, once its prewarm, if any, is done.
+    """
+    if aws_cdk_prewarm_thread:
+        aws_cdk_prewarm_thread.join()
+    import_aws_cdk()
+
+
 def step_import_aws_cdk():
     loader_import = Loader(
         "Importing CloudFormation:",
@@ -49,11 +127,17 @@ def step_import_aws_cdk():
     )
     loader_import.start()
     # It takes time to import CDK so we show it to the user!
-    import aws_cdk  # noqa: F401
+    wait_for_aws_cdk()
 
     loader_import.stop()
 
 
+def synthesize_template(template_args, cdk_required=False):
+    if cdk_required:
+        wait_for_aws_cdk()
+    return create_template(*template_args)
+
+
 @dataclass(frozen=True)
 class Options:
     no_docker_build: Callable = click.option(
@@ -83,6 +167,33 @@ class Options:
         show_default=True,
         help="If used, it will show the docker build and push logs",
     )
+    docker_parallelism: Callable = click.option(
+        "--docker-parallelism",
+        type=click.IntRange(min=1),
+        default=DEFAULT_DOCKER_PARALLELISM,
+        show_default=True,
+        help="Number of docker images built and pushed at once.",
+    )
+    buildx_push: Callable = click.option(
+        "--buildx-push",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help=(
+            "If used, docker buildx pushes the images to the registry while building"
+            " them, instead of a separate docker push."
+        ),
+    )
+    rebuild: Callable = click.option(
+        "--rebuild",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help=(
+            "If used, docker images are built and pushed even when their Dockerfile,"
+            " build arguments and build context did not change since their last push."
+        ),
+    )
 
     auto_install_nc: Callable = click.option(
         "--auto-install-nc",
@@ -91,6 +202,37 @@ class Options:
         show_default=True,
         help="If used, it will automatically install nc on the container",
     )
+    task_id: Callable = click.option(
+        "--task-id",
+        default=None,
+        help=(
+            "Id (or id prefix) of the task targeted by port forwards and the"
+            " interactive command when the service runs several tasks. Defaults to"
+            " the first task."
+        ),
+    )
+    port_forward_all_tasks: Callable = click.option(
+        "--port-forward-all-tasks",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help=(
+            "If used, port forwards are created on every task. The first task uses"
+            " the configured local ports, the others the next free ones, printed"
+            " per task."
+        ),
+    )
+    reconcile: Callable = click.option(
+        "--reconcile",
+        is_flag=True,
+        default=False,
+        show_default=True,
+        help=(
+            "If used, the stack is updated through CloudFormation even when only"
+            " images or environment variables changed, and the service is put back"
+            " on the task definition of the stack."
+        ),
+    )
     file_name: Callable = click.option(
         "--file-name",
         default="ecs.yml",
@@ -112,18 +254,141 @@ def step_docker_build_and_push(
     azs,
     show_docker_logs,
     run,
+    cdk_required=False,
+    docker_options=DockerBuildOptions(),
+):
+    template_args = (
+        stack_name,
+        aws_account_id,
+        aws_region,
+        vpc_id,
+        subnet_ids,
+        azs,
+        ecs_manifest,
+        run,
+    )
+    if no_docker_build:
+        if cdk_required:
+            step_import_aws_cdk()
+        return step_create_template(template_args)
+
+    # The template only needs the image names, so aws_cdk is imported and the
+    # template synthesized while the images are built and pushed.
+    executor = ThreadPoolExecutor(max_workers=1)
+    template_future = executor.submit(synthesize_template, template_args, cdk_required)
+    try:
+        step_build_docker_images(ecs_manifest, show_docker_logs, docker_options)
+    except BaseException:
+        # The build failure is reported right away, not after the synthesis.
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    with executor:
+        return step_create_template(template_args, template_future)
+
+
+def step_build_docker_images(
+    ecs_manifest, show_docker_logs, docker_options=DockerBuildOptions()
+):
+    loader_docker = Loader(
+        "Building and pushing docker images:",
+        "Building and pushing docker images: \u2705",
+        "Building and pushing docker images: \u274c",
+        0.05,
+    )
+    loader_docker.start()
+    summaries = {}
+    try:
+        results = build_docker_image(
+            ecs_manifest,
+            show_docker_logs,
+            docker_options.parallelism,
+            docker_options.buildx_push,
+            docker_options.rebuild,
+            summaries,
+        )
+    except Exception:
+        loader_docker.stop_error()
+        print_build_summaries(summaries)
+        raise
+    unchanged = [name for name, result in results.items() if result == "unchanged"]
+    code_layers = [name for name, result in results.items() if result == "code layer"]
+    already_pushed = [
+        name for name, result in results.items() if result == "already pushed"
+    ]
+    metadata = []
+    if code_layers:
+        metadata.append(f"Code layer pushed: {', '.join(code_layers)}")
+    if already_pushed:
+        metadata.append(
+            f"Already in the registry, push skipped: {', '.join(already_pushed)}"
+        )
+    if unchanged:
+        metadata.append(
+            f"Unchanged images, use --rebuild to force: {', '.join(unchanged)}"
+        )
+    if metadata:
+        loader_docker.set_metadata("; ".join(metadata))
+    loader_docker.stop()
+    print_build_summaries(summaries)
+
+
+def print_build_summaries(summaries):
+    for name, summary in summaries.items():
+        print(f"{Color.GRAY}{format_build_summary(name, summary)}{Color.END}")
+
+
+def get_manifest_cluster_name(ecs_manifest):
+    metadata = ecs_manifest.metadata
+    return get_cluster_name(metadata.user, metadata.appname, metadata.shared_cluster)
+
+
+def step_fast_update_service(
+    no_docker_build,
+    ecs_manifest,
+    stack_name,
+    show_docker_logs,
+    changed_containers,
+    docker_options=DockerBuildOptions(),
 ):
     if not no_docker_build:
-        loader_docker = Loader(
-            "Building and pushing docker images:",
-            "Building and pushing docker images: \u2705",
-            "Building and pushing docker images: \u274c",
-            0.05,
+        step_build_docker_images(ecs_manifest, show_docker_logs, docker_options)
+    loader = Loader(
+        "Updating service without CloudFormation:",
+        "Updating service without CloudFormation: \u2705",
+        "Updating service without CloudFormation: \u274c",
+        0.05,
+    )
+    loader.start()
+    loader.set_metadata(
+        f"Changed containers: {', '.join(changed_containers)}",
+    )
+    try:
+        update_service_task_definition(
+            stack_name, changed_containers, get_manifest_cluster_name(ecs_manifest)
         )
-        loader_docker.start()
-        build_docker_image(ecs_manifest, show_docker_logs)
-        loader_docker.stop()
+    except Exception:
+        loader.stop_error()
+        raise
+    loader.stop()
+    print(
+        f"{Color.YELLOW}CloudFormation will be reconciled on the next stack update,"
+        f" or use --reconcile.{Color.END}"
+    )
+
 
+def step_reconcile_service(stack_name, cluster_name=None):
+    loader = Loader(
+        "Reconciling service with CloudFormation:",
+        "Reconciling service with CloudFormation: \u2705",
+        "Reconciling service with CloudFormation: \u274c",
+        0.05,
+    )
+    loader.start()
+    reconcile_service_task_definition(stack_name, cluster_name)
+    loader.stop()
+
+
+def step_create_template(template_args, template_future=None):
     loader = Loader(
         "Creating CloudFormation template:",
         "Creating CloudFormation template: \u2705",
@@ -131,24 +396,115 @@ def step_docker_build_and_push(
         0.05,
     )
     loader.start()
-    create_template(
-        stack_name,
-        aws_account_id,
-        aws_region,
-        vpc_id,
-        subnet_ids,
-        azs,
-        ecs_manifest,
-        run,
-    )
+    try:
+        if template_future:
+            template = template_future.result()
+        else:
+            template = create_template(*template_args)
+    except Exception:
+        loader.stop_error()
+        raise
     loader.stop()
+    if os.environ.get("DEBUG_EASYECS", None):
+        stack_name = template_args[0]
+        template_path = write_template(stack_name, template)
+        print(f"{Color.GRAY}Template written to {template_path}{Color.END}")
+    return template
 
 
-def step_create_or_update_stack(stack_name, force_redeployment):
+def step_create_or_update_stack(
+    stack_name, template, force_redeployment, cluster_name=None
+):
     if not fetch_is_stack_created(stack_name):
-        create_stack(stack_name)
+        create_stack(stack_name, template)
     else:
-        update_stack(stack_name, force_redeployment)
+        update_stack(stack_name, template, force_redeployment, cluster_name)
+
+
+def step_create_or_update_stacks(
+    ecs_manifest, stack_name, template, force_redeployment
+):
+    """
+    With a shared cluster, the stack shared by the applications of the user is
+    deployed first and the application stack only holds its service.
+    With layered stacks, the base stack is deployed first. It rarely changes,
+    so its update is usually skipped and only the service stack is deployed.
+    """
+    metadata = ecs_manifest.metadata
+    cluster_name = get_manifest_cluster_name(ecs_manifest)
+    if metadata.shared_cluster:
+        step_create_or_update_stack(
+            get_shared_stack_name(metadata.user),
+            create_shared_template(metadata.user),
+            False,
+        )
+        template = share_template(template, metadata.user, metadata.appname)
+    if not metadata.layered_stacks:
+        step_create_or_update_stack(
+            stack_name, template, force_redeployment, cluster_name
+        )
+        return
+    base_template, service_template = split_template(template, stack_name)
+    step_create_or_update_stack(get_base_stack_name(stack_name), base_template, False)
+    step_create_or_update_stack(
+        stack_name, service_template, force_redeployment, cluster_name
+    )
+
+
+def step_wait_for_containers(user, app_name, ecs_manifest):
+    loader = Loader(
+        "Waiting for the tasks to be ready:",
+        "Waiting for the tasks to be ready: \u2705",
+        "Waiting for the tasks to be ready: \u274c",
+        0.05,
+    )
+    loader.start()
+    healthchecked_containers = [
+        container.name
+        for container in ecs_manifest.task_definition.containers
+        if container.healthcheck
+    ]
+    try:
+        tasks_containers, tasks = fetch_tasks_containers(
+            user,
+            app_name,
+            healthchecked_containers,
+            ecs_manifest.metadata.shared_cluster,
+        )
+    except Exception:
+        loader.stop_error()
+        raise
+    image_pull = get_image_pull(tasks)
+    if image_pull:
+        previous_pull = save_image_pull(f"{user}-{app_name}", image_pull)
+        metadata = f"Image pull: {image_pull[1]:.1f}s"
+        if previous_pull:
+            metadata += f", previously {previous_pull['duration']:.1f}s"
+        loader.set_metadata(metadata)
+    loader.stop()
+    return tasks_containers
+
+
+def step_create_port_forwards(
+    ecs_manifest,
+    aws_region,
+    aws_account,
+    tasks_containers,
+    task_id,
+    port_forward_all_tasks,
+):
+    if port_forward_all_tasks:
+        create_port_forwards(ecs_manifest, aws_region, aws_account, tasks_containers)
+    else:
+        selected_task_id, parsed_containers = select_task_containers(
+            tasks_containers, task_id
+        )
+        create_port_forwards(
+            ecs_manifest,
+            aws_region,
+            aws_account,
+            {selected_task_id: parsed_containers},
+        )
 
 
 def step_idle_keyboard():
@@ -161,18 +517,35 @@ def step_idle_keyboard():
 
 
 def step_clean_exit():
+    process_manager.closing = True
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
     for popen_proc in popen_procs_port_forward:
-        popen_proc.send_signal(SIGINT)
-        popen_proc.wait()
+        try:
+            popen_proc.send_signal(SIGINT)
+        except ProcessLookupError:
+            pass
+
+    for popen_proc in popen_procs_exec_command:
+        try:
+            popen_proc.stdin.write("exit\x03\x04".encode("utf8"))
+            popen_proc.stdin.flush()
+        except OSError:
+            pass
 
     for thread in threads:
         thread.stop()
-        thread.join()
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
 
-    for popen_proc in popen_procs_exec_command:
-        popen_proc.stdin.write("exit\x03\x04".encode("utf8"))
-        popen_proc.stdin.flush()
-        popen_proc.wait()
+    terminate_processes(popen_procs_port_forward + popen_procs_exec_command, deadline)
+
+    if os.environ.get("DEBUG_EASYECS", None):
+        for lifetime in process_manager.lifetimes():
+            print(
+                f"{Color.GRAY}{lifetime['name']} (pid {lifetime['pid']}): ran"
+                f" {lifetime['lifetime']}s, exit code"
+                f" {lifetime['returncode']}{Color.END}"
+            )
 
 
 def has_ecs_file_changed(cache_settings, file_name: str):
@@ -195,11 +568,44 @@ def step_bring_up_stack(
     show_docker_logs,
     run,
     file_name,
+    reconcile=False,
+    docker_options=DockerBuildOptions(),
 ):
     print()
-    if has_ecs_file_changed(cache_settings, file_name) or force_redeployment:
-        step_import_aws_cdk()
-        step_docker_build_and_push(
+    if (
+        has_ecs_file_changed(cache_settings, file_name)
+        or force_redeployment
+        or reconcile
+    ):
+        deployed_manifest = dump_deployed_manifest(ecs_manifest, run)
+        fast_path_changes = None
+        if not reconcile:
+            fast_path_changes = find_fast_path_changes(
+                cache_settings["manifest"], ecs_manifest, run
+            )
+        if fast_path_changes and fetch_is_stack_created(stack_name):
+            step_fast_update_service(
+                no_docker_build,
+                ecs_manifest,
+                stack_name,
+                show_docker_logs,
+                fast_path_changes,
+                docker_options,
+            )
+            save_deployed_manifest(aws_account, deployed_manifest, reconcile=True)
+            save_hash(aws_account, file_name)
+            return
+        cdk_required = is_aws_cdk_required(
+            stack_name,
+            aws_account_id,
+            aws_region,
+            vpc_id,
+            subnet_ids,
+            azs,
+            ecs_manifest,
+            run,
+        )
+        template = step_docker_build_and_push(
             no_docker_build,
             ecs_manifest,
             stack_name,
@@ -210,8 +616,15 @@ def step_bring_up_stack(
             azs,
             show_docker_logs,
             run,
+            cdk_required,
+            docker_options,
         )
-        step_create_or_update_stack(stack_name, force_redeployment)
+        step_create_or_update_stacks(
+            ecs_manifest, stack_name, template, force_redeployment
+        )
+        if cache_settings["reconcile"]:
+            step_reconcile_service(stack_name, get_manifest_cluster_name(ecs_manifest))
+        save_deployed_manifest(aws_account, deployed_manifest, reconcile=False)
         save_hash(aws_account, file_name)
     else:
         print(f"{Color.YELLOW}No updates are to be performed.{Color.END}")
@@ -222,10 +635,19 @@ def action_run(
     no_docker_build: bool = False,
     force_redeployment: bool = False,
     show_docker_logs: bool = False,
+    task_id: str = None,
+    port_forward_all_tasks: bool = False,
+    reconcile: bool = False,
+    docker_parallelism: int = DEFAULT_DOCKER_PARALLELISM,
+    buildx_push: bool = False,
+    rebuild: bool = False,
 ):
+    docker_options = DockerBuildOptions(
+        parallelism=docker_parallelism, buildx_push=buildx_push, rebuild=rebuild
+    )
+    ecs_manifest = read_ecs_file(file_name)
     aws_account = fetch_aws_account()
     cache_settings = load_settings(aws_account)
-    ecs_manifest = read_ecs_file(file_name)
     app_name = ecs_manifest.metadata.appname
     user = ecs_manifest.metadata.user
     aws_region = cache_settings["aws_region"]
@@ -234,6 +656,18 @@ def action_run(
     subnet_ids = cache_settings["subnet_ids"]
     azs = cache_settings["azs"]
     stack_name = f"{user}-{app_name}"
+    step_prewarm_aws_cdk(
+        (
+            stack_name,
+            aws_account_id,
+            aws_region,
+            vpc_id,
+            subnet_ids,
+            azs,
+            ecs_manifest,
+            True,
+        )
+    )
 
     step_bring_up_stack(
         cache_settings,
@@ -250,10 +684,19 @@ def action_run(
         show_docker_logs,
         run=True,
         file_name=file_name,
+        reconcile=reconcile,
+        docker_options=docker_options,
     )
-    parsed_containers = fetch_containers(user, app_name)
     print()
-    create_port_forwards(ecs_manifest, aws_region, aws_account, parsed_containers)
+    tasks_containers = step_wait_for_containers(user, app_name, ecs_manifest)
+    step_create_port_forwards(
+        ecs_manifest,
+        aws_region,
+        aws_account,
+        tasks_containers,
+        task_id,
+        port_forward_all_tasks,
+    )
     step_idle_keyboard()
 
     step_clean_exit()
@@ -267,10 +710,19 @@ def action_dev(
     force_redeployment: bool = False,
     show_docker_logs: bool = False,
     auto_install_nc: bool = False,
+    task_id: str = None,
+    port_forward_all_tasks: bool = False,
+    reconcile: bool = False,
+    docker_parallelism: int = DEFAULT_DOCKER_PARALLELISM,
+    buildx_push: bool = False,
+    rebuild: bool = False,
 ):
+    docker_options = DockerBuildOptions(
+        parallelism=docker_parallelism, buildx_push=buildx_push, rebuild=rebuild
+    )
+    ecs_manifest = read_ecs_file(file_name)
     aws_account = fetch_aws_account()
     cache_settings = load_settings(aws_account)
-    ecs_manifest = read_ecs_file(file_name)
     app_name = ecs_manifest.metadata.appname
     user = ecs_manifest.metadata.user
     aws_region = cache_settings["aws_region"]
@@ -279,6 +731,18 @@ def action_dev(
     subnet_ids = cache_settings["subnet_ids"]
     azs = cache_settings["azs"]
     stack_name = f"{user}-{app_name}"
+    step_prewarm_aws_cdk(
+        (
+            stack_name,
+            aws_account_id,
+            aws_region,
+            vpc_id,
+            subnet_ids,
+            azs,
+            ecs_manifest,
+            False,
+        )
+    )
 
     step_bring_up_stack(
         cache_settings,
@@ -295,27 +759,38 @@ def action_dev(
         show_docker_logs,
         run=False,
         file_name=file_name,
+        reconcile=reconcile,
+        docker_options=docker_options,
     )
     if ecs_manifest.load_balancer:
         load_balancer_port = ecs_manifest.load_balancer.listener_port
-        load_balancer_dns = fetch_load_balancer_dns(stack_name)
+        load_balancer_stack_name = stack_name
+        if ecs_manifest.metadata.layered_stacks:
+            load_balancer_stack_name = get_base_stack_name(stack_name)
+        load_balancer_dns = fetch_load_balancer_dns(load_balancer_stack_name)
         print()
         print(
             "Your service is accessible on this URL:"
             f" http://{load_balancer_dns}:{load_balancer_port}"
         )
-    parsed_containers = fetch_containers(user, app_name)
     print()
-    create_port_forwards(ecs_manifest, aws_region, aws_account, parsed_containers)
+    tasks_containers = step_wait_for_containers(user, app_name, ecs_manifest)
+    step_create_port_forwards(
+        ecs_manifest,
+        aws_region,
+        aws_account,
+        tasks_containers,
+        task_id,
+        port_forward_all_tasks,
+    )
     run_nc_commands(
-        parsed_containers, aws_region, aws_account, ecs_manifest, auto_install_nc
+        tasks_containers, aws_region, aws_account, ecs_manifest, auto_install_nc
     )
     print()
 
-    for event_handler in event_handlers:
-        event_handler.synchronize()
-        time.sleep(0.1)
+    synchronize_all()
 
+    _, parsed_containers = select_task_containers(tasks_containers, task_id)
     found_tty = execute_command(
         ecs_manifest,
         parsed_containers,
@@ -336,6 +811,8 @@ def action_delete(file_name: str):
     user = ecs_manifest.metadata.user
     stack_name = f"{user}-{app_name}"
     delete_stack(stack_name)
+    if ecs_manifest.metadata.layered_stacks:
+        delete_stack(get_base_stack_name(stack_name))
     delete_hash(aws_account)
 
 
@@ -350,27 +827,62 @@ def entrypoint(ctx):
 @options.no_docker_build
 @options.force_redeployment
 @options.show_docker_logs
+@options.docker_parallelism
+@options.buildx_push
+@options.rebuild
+@options.task_id
+@options.port_forward_all_tasks
+@options.reconcile
 @options.file_name
 def click_run(
     no_docker_build: bool,
     force_redeployment: bool,
     show_docker_logs: bool,
+    docker_parallelism: int,
+    buildx_push: bool,
+    rebuild: bool,
+    task_id: str,
+    port_forward_all_tasks: bool,
+    reconcile: bool,
     file_name: str,
 ):
-    action_run(file_name, no_docker_build, force_redeployment, show_docker_logs)
+    action_run(
+        file_name,
+        no_docker_build,
+        force_redeployment,
+        show_docker_logs,
+        task_id,
+        port_forward_all_tasks,
+        reconcile,
+        docker_parallelism,
+        buildx_push,
+        rebuild,
+    )
 
 
 @entrypoint.command(name="dev", help="Run a stack in development mode")
 @options.no_docker_build
 @options.force_redeployment
 @options.show_docker_logs
+@options.docker_parallelism
+@options.buildx_push
+@options.rebuild
 @options.auto_install_nc
+@options.task_id
+@options.port_forward_all_tasks
+@options.reconcile
 @options.file_name
 def click_dev(
     no_docker_build: bool,
     force_redeployment: bool,
     show_docker_logs: bool,
+    docker_parallelism: int,
+    buildx_push: bool,
+    rebuild: bool,
     auto_install_nc: bool,
+    task_id: str,
+    port_forward_all_tasks: bool,
+    reconcile: bool,
     file_name: str,
 ):
     action_dev(
@@ -379,6 +891,12 @@ def click_dev(
         force_redeployment,
         show_docker_logs,
         auto_install_nc,
+        task_id,
+        port_forward_all_tasks,
+        reconcile,
+        docker_parallelism,
+        buildx_push,
+        rebuild,
     )
 
 
@@ -1,11 +1,16 @@
+import time
 import boto3
+from easyecs.cloudformation.template.shared import get_cluster_name
 from easyecs.helpers.common import (
+    adaptive_delays,
     convert_containers_to_dict,
     convert_tags_to_dict,
 )
 
 from easyecs.helpers.selector import select_action
 
+DESCRIBE_TASKS_BATCH_SIZE = 100
+
 
 def fetch_aws_account():
     aws_account = boto3.client("iam").list_account_aliases()["AccountAliases"][0]
@@ -94,21 +99,126 @@ def fetch_is_stack_created(stack_name):
     return True
 
 
-def fetch_containers(user, app_name):
-    cluster_name = f"{user}-{app_name}-cluster"
+def is_task_ready(task, healthchecked_containers=()):
+    """
+    A task is ready when it is RUNNING, the ExecuteCommandAgent of every running
+    container is RUNNING and containers with a healthcheck are HEALTHY.
+    """
+    if task.get("lastStatus") != "RUNNING":
+        return False
+    for container in task.get("containers", []):
+        if container.get("lastStatus") == "STOPPED":
+            # Containers that completed (e.g. init containers) have no agent.
+            continue
+        if container.get("lastStatus") != "RUNNING":
+            return False
+        agents = {
+            agent["name"]: agent.get("lastStatus")
+            for agent in container.get("managedAgents", [])
+        }
+        if agents.get("ExecuteCommandAgent") != "RUNNING":
+            return False
+        if (
+            container["name"] in healthchecked_containers
+            and container.get("healthStatus") != "HEALTHY"
+        ):
+            return False
+    return True
+
+
+def fetch_tasks(cluster_name, service_name=None):
+    """
+    Lists every task of the cluster, or of one of its services, and describes
+    them by batches of 100.
+    """
     client = boto3.client("ecs")
-    res = client.list_tasks(cluster=cluster_name)
-    task_arns = res["taskArns"]
-    res_task = client.describe_tasks(cluster=cluster_name, tasks=task_arns)
-    containers = res_task["tasks"][0]["containers"]
-    # This inject the target for easier use with SSM.
-    for container in containers:
-        runtime_id = container["runtimeId"]
-        task_id = runtime_id.split("-")[0]
-        target = f"ecs:{cluster_name}_{task_id}_{runtime_id}"
-        container["ssm_target"] = target
-    parsed_containers = convert_containers_to_dict(containers)
-    return parsed_containers
+    paginator = client.get_paginator("list_tasks")
+    kwargs = {"cluster": cluster_name}
+    if service_name:
+        kwargs["serviceName"] = service_name
+    task_arns = [
+        task_arn
+        for page in paginator.paginate(**kwargs)
+        for task_arn in page["taskArns"]
+    ]
+    tasks = []
+    for i in range(0, len(task_arns), DESCRIBE_TASKS_BATCH_SIZE):
+        batch = task_arns[i : i + DESCRIBE_TASKS_BATCH_SIZE]
+        tasks += client.describe_tasks(cluster=cluster_name, tasks=batch)["tasks"]
+    return tasks
+
+
+def wait_for_tasks_ready(
+    cluster_name, healthchecked_containers=(), timeout=900, service_name=None
+):
+    """
+    Polls the tasks of the cluster with an adaptive backoff until every task that
+    should be running is ready to accept SSM sessions.
+    Tasks being stopped (e.g. from a previous deployment) are ignored.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in adaptive_delays():
+        tasks = [
+            task
+            for task in fetch_tasks(cluster_name, service_name)
+            if task.get("desiredStatus") == "RUNNING"
+        ]
+        if tasks and all(
+            is_task_ready(task, healthchecked_containers) for task in tasks
+        ):
+            return sorted(tasks, key=lambda task: task["taskArn"])
+        if time.monotonic() + delay > deadline:
+            raise Exception(
+                f"Tasks of {cluster_name} were not ready after {timeout} seconds!"
+            )
+        time.sleep(delay)
+
+
+def fetch_tasks_containers(
+    user, app_name, healthchecked_containers=(), shared_cluster=False
+):
+    """
+    Returns the containers of every running task, indexed by task id, along
+    with the tasks as described by ECS.
+    """
+    cluster_name = get_cluster_name(user, app_name, shared_cluster)
+    service_name = None
+    # The shared cluster also runs the tasks of the other applications.
+    if shared_cluster:
+        service_name = f"{user}-{app_name}-service"
+    tasks = wait_for_tasks_ready(
+        cluster_name, healthchecked_containers, service_name=service_name
+    )
+    tasks_containers = {}
+    for task in tasks:
+        containers = task["containers"]
+        # This inject the target for easier use with SSM.
+        for container in containers:
+            runtime_id = container["runtimeId"]
+            task_id = runtime_id.split("-")[0]
+            target = f"ecs:{cluster_name}_{task_id}_{runtime_id}"
+            container["ssm_target"] = target
+        tasks_containers[task["taskArn"].split("/")[-1]] = convert_containers_to_dict(
+            containers
+        )
+    return tasks_containers, tasks
+
+
+def get_image_pull(tasks):
+    """
+    Returns when the images of the tasks started to be pulled and how many
+    seconds the slowest pull took, None when Fargate did not report it.
+    """
+    pulls = [
+        (task["pullStartedAt"], task["pullStoppedAt"])
+        for task in tasks
+        if task.get("pullStartedAt") and task.get("pullStoppedAt")
+    ]
+    if not pulls:
+        return None
+    started_at = min(started for started, _ in pulls)
+    duration = max((stopped - started).total_seconds() for started, stopped in pulls)
+    return started_at.isoformat(), duration
 
 
 def fetch_session_region():
@@ -0,0 +1,81 @@
+import json
+import time
+from typing import Dict, Optional
+from uuid import uuid4
+
+from easyecs.cloudformation.client import get_client_cloudformation
+from easyecs.helpers.common import adaptive_delays
+from easyecs.helpers.exceptions import StackDeploymentException
+
+# Reasons given by CloudFormation to a change set without any change.
+EMPTY_CHANGE_SET_REASONS = [
+    "The submitted information didn't contain changes.",
+    "No updates are to be performed.",
+]
+
+
+def generate_unique_name() -> str:
+    return f"easyecs-{uuid4().hex}"
+
+
+def wait_for_change_set(stack_name: str, change_set_name: str) -> Dict:
+    """
+    Waits for the change set to be computed, the change set is polled on an
+    adaptive delay instead of the 30 seconds of the boto3 waiter.
+    """
+    client = get_client_cloudformation()
+    for delay in adaptive_delays(initial=0.5, maximum=2.0):
+        change_set = client.describe_change_set(
+            StackName=stack_name, ChangeSetName=change_set_name
+        )
+        if change_set["Status"] in ["CREATE_COMPLETE", "FAILED"]:
+            return change_set
+        time.sleep(delay)
+
+
+def is_empty_change_set(change_set: Dict) -> bool:
+    status_reason = change_set.get("StatusReason", "")
+    return any(reason in status_reason for reason in EMPTY_CHANGE_SET_REASONS)
+
+
+def create_change_set(
+    stack_name: str, template_body: Dict, change_set_type: str
+) -> Optional[str]:
+    """
+    Creates a change set of the given type (CREATE or UPDATE) and waits for
+    it to be computed. Returns its name, or None when the template does not
+    change anything.
+    """
+    client = get_client_cloudformation()
+    change_set_name = generate_unique_name()
+    client.create_change_set(
+        StackName=stack_name,
+        ChangeSetName=change_set_name,
+        ChangeSetType=change_set_type,
+        TemplateBody=json.dumps(template_body),
+        Capabilities=["CAPABILITY_NAMED_IAM"],
+    )
+    change_set = wait_for_change_set(stack_name, change_set_name)
+    if change_set["Status"] == "FAILED":
+        if is_empty_change_set(change_set):
+            client.delete_change_set(
+                StackName=stack_name, ChangeSetName=change_set_name
+            )
+            return None
+        raise StackDeploymentException(change_set.get("StatusReason"))
+    return change_set_name
+
+
+def execute_change_set(stack_name: str, change_set_name: str) -> str:
+    """
+    Executes the change set. Returns the token tagging the stack events of
+    the execution.
+    """
+    client = get_client_cloudformation()
+    client_request_token = generate_unique_name()
+    client.execute_change_set(
+        StackName=stack_name,
+        ChangeSetName=change_set_name,
+        ClientRequestToken=client_request_token,
+    )
+    return client_request_token
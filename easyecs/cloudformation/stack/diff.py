@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from easyecs.cloudformation.client import get_client_cloudformation
+from easyecs.helpers.color import Color
+
+DEPLOYED_TEMPLATE_CACHE_DIR = ".tmp/stacks"
+# Stacks in those states are left to update_stack and its error handling.
+UPDATABLE_STACK_STATUSES = [
+    "CREATE_COMPLETE",
+    "UPDATE_COMPLETE",
+    "UPDATE_ROLLBACK_COMPLETE",
+    "IMPORT_COMPLETE",
+    "IMPORT_ROLLBACK_COMPLETE",
+]
+
+
+def canonicalize_template(template: Dict) -> str:
+    """
+    Dumps the template with sorted keys, so that two templates only differing
+    by the order of their keys are equal. Lists are kept in order, as their
+    order matters to CloudFormation.
+    """
+    return json.dumps(template, sort_keys=True, separators=(",", ":"))
+
+
+def get_deployed_template_cache_path(stack_id: str) -> Path:
+    stack_hash = hashlib.sha256(stack_id.encode()).hexdigest()
+    return Path(DEPLOYED_TEMPLATE_CACHE_DIR) / f"{stack_hash}.json"
+
+
+def get_last_updated_time(stack: Dict) -> str:
+    last_updated_time = stack.get("LastUpdatedTime") or stack["CreationTime"]
+    return str(last_updated_time)
+
+
+def load_cached_deployed_template(stack: Dict) -> Optional[Dict]:
+    cache_path = get_deployed_template_cache_path(stack["StackId"])
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if cached["last_updated_time"] != get_last_updated_time(stack):
+        return None
+    return cached["template"]
+
+
+def save_cached_deployed_template(stack: Dict, template: Dict):
+    os.makedirs(DEPLOYED_TEMPLATE_CACHE_DIR, exist_ok=True)
+    cache_path = get_deployed_template_cache_path(stack["StackId"])
+    partial_path = cache_path.with_suffix(f".{os.getpid()}.partial")
+    with open(partial_path, "w") as f:
+        json.dump(
+            {
+                "last_updated_time": get_last_updated_time(stack),
+                "template": template,
+            },
+            f,
+        )
+    os.replace(partial_path, cache_path)
+
+
+def fetch_stack(stack_name: str) -> Dict:
+    client = get_client_cloudformation()
+    return client.describe_stacks(StackName=stack_name)["Stacks"][0]
+
+
+def fetch_deployed_template(stack_name: str) -> Optional[Dict]:
+    """
+    Returns the template the stack was last deployed with, or None when the
+    stack is not in a state allowing an update. The template is only fetched
+    once per stack update, it is cached by stack id and last updated time.
+    """
+    stack = fetch_stack(stack_name)
+    if stack["StackStatus"] not in UPDATABLE_STACK_STATUSES:
+        return None
+    template = load_cached_deployed_template(stack)
+    if template is None:
+        client = get_client_cloudformation()
+        template_body = client.get_template(
+            StackName=stack["StackId"], TemplateStage="Original"
+        )["TemplateBody"]
+        # botocore already decodes JSON template bodies.
+        if isinstance(template_body, str):
+            template_body = json.loads(template_body)
+        template = json.loads(json.dumps(template_body))
+        save_cached_deployed_template(stack, template)
+    return template
+
+
+def save_deployed_template(stack_name: str, template: Dict):
+    """
+    Caches the template a stack was just updated with, sparing the next
+    update to fetch it.
+    """
+    save_cached_deployed_template(fetch_stack(stack_name), template)
+
+
+def diff_templates(deployed_template: Dict, template: Dict) -> Dict[str, str]:
+    """
+    Returns the changes between two templates, by resource logical id (or
+    section name for anything else than resources): "added", "removed" or
+    "modified".
+    """
+    changes = {}
+    deployed_resources = deployed_template.get("Resources", {})
+    resources = template.get("Resources", {})
+    for logical_id in sorted(set(deployed_resources) | set(resources)):
+        if logical_id not in deployed_resources:
+            changes[logical_id] = "added"
+        elif logical_id not in resources:
+            changes[logical_id] = "removed"
+        elif canonicalize_template(
+            deployed_resources[logical_id]
+        ) != canonicalize_template(resources[logical_id]):
+            changes[logical_id] = "modified"
+    sections = set(deployed_template) | set(template)
+    for section in sorted(sections - {"Resources"}):
+        if canonicalize_template(
+            deployed_template.get(section)
+        ) != canonicalize_template(template.get(section)):
+            changes[section] = "modified"
+    return changes
+
+
+def print_template_changes(changes: Dict[str, str], deployed_template, template):
+    signs = {
+        "added": f"{Color.GREEN}+",
+        "removed": f"{Color.RED}-",
+        "modified": f"{Color.YELLOW}~",
+    }
+    resources = {
+        **deployed_template.get("Resources", {}),
+        **template.get("Resources", {}),
+    }
+    for name, change in changes.items():
+        resource_type = resources.get(name, {}).get("Type")
+        description = f"{name} ({resource_type})" if resource_type else name
+        print(f"{signs[change]} {description}{Color.END}")
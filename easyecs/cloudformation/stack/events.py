@@ -0,0 +1,112 @@
+import time
+from typing import Dict, List, Optional
+
+from easyecs.cloudformation.client import get_client_cloudformation
+from easyecs.helpers.common import adaptive_delays
+from easyecs.helpers.exceptions import StackDeploymentException
+from easyecs.helpers.loader import Loader
+
+SUCCESS_STACK_STATUSES = ["CREATE_COMPLETE", "UPDATE_COMPLETE", "IMPORT_COMPLETE"]
+FAILURE_STACK_STATUSES = [
+    "CREATE_FAILED",
+    "DELETE_COMPLETE",
+    "DELETE_FAILED",
+    "ROLLBACK_COMPLETE",
+    "ROLLBACK_FAILED",
+    "UPDATE_FAILED",
+    "UPDATE_ROLLBACK_COMPLETE",
+    "UPDATE_ROLLBACK_FAILED",
+]
+# Events are polled quickly while resources change, and at most every second
+# otherwise so that completion is seen within about a second.
+EVENTS_INITIAL_DELAY = 0.25
+EVENTS_MAXIMUM_DELAY = 1.0
+
+
+def fetch_new_stack_events(
+    stack_name: str, client_request_token: str, last_event_id: Optional[str]
+) -> List[Dict]:
+    """
+    Returns the events of the operation tagged with the token that were not
+    seen yet, oldest first.
+    """
+    client = get_client_cloudformation()
+    events = []
+    kwargs = {"StackName": stack_name}
+    while True:
+        response = client.describe_stack_events(**kwargs)
+        for event in response["StackEvents"]:
+            # Events are listed newest first.
+            if (
+                event["EventId"] == last_event_id
+                or event.get("ClientRequestToken") != client_request_token
+            ):
+                return events[::-1]
+            events.append(event)
+        if not response.get("NextToken"):
+            return events[::-1]
+        kwargs["NextToken"] = response["NextToken"]
+
+
+def is_stack_event(event: Dict, stack_name: str) -> bool:
+    return (
+        event["ResourceType"] == "AWS::CloudFormation::Stack"
+        and event["LogicalResourceId"] == stack_name
+    )
+
+
+def describe_blocking_resource(in_progress_events: Dict[str, Dict]) -> Optional[str]:
+    """
+    The resource which has been in progress for the longest time is the one
+    holding the deployment.
+    """
+    if not in_progress_events:
+        return None
+    event = min(in_progress_events.values(), key=lambda event: event["Timestamp"])
+    return (
+        f"waiting for {event['LogicalResourceId']} ({event['ResourceType']})"
+        f" {event['ResourceStatus']}"
+    )
+
+
+def watch_stack_events(
+    stack_name: str, client_request_token: str, loader: Optional[Loader] = None
+) -> str:
+    """
+    Tails the stack events of an operation until the stack reaches a final
+    status, showing the resource being waited for on the loader. Returns the
+    final status, or raises StackDeploymentException with the reasons of the
+    failed resources.
+    """
+    in_progress_events = {}
+    failure_reasons = []
+    last_event_id = None
+    delays = adaptive_delays(EVENTS_INITIAL_DELAY, 2, EVENTS_MAXIMUM_DELAY)
+    while True:
+        events = fetch_new_stack_events(stack_name, client_request_token, last_event_id)
+        for event in events:
+            last_event_id = event["EventId"]
+            status = event["ResourceStatus"]
+            if is_stack_event(event, stack_name):
+                if status in SUCCESS_STACK_STATUSES:
+                    return status
+                if status in FAILURE_STACK_STATUSES:
+                    reasons = failure_reasons or [event.get("ResourceStatusReason")]
+                    raise StackDeploymentException(
+                        f"Stack {stack_name} ended in {status}:\n"
+                        + "\n".join(str(reason) for reason in reasons)
+                    )
+                continue
+            logical_id = event["LogicalResourceId"]
+            if status.endswith("_IN_PROGRESS"):
+                in_progress_events[logical_id] = event
+            else:
+                in_progress_events.pop(logical_id, None)
+            reason = event.get("ResourceStatusReason", "")
+            if status.endswith("_FAILED") and "cancelled" not in reason:
+                failure_reasons.append(f"{logical_id}: {reason}")
+        if loader:
+            loader.set_status(describe_blocking_resource(in_progress_events))
+        if events:
+            delays = adaptive_delays(EVENTS_INITIAL_DELAY, 2, EVENTS_MAXIMUM_DELAY)
+        time.sleep(next(delays))
@@ -1,35 +1,41 @@
-import json
 from typing import Dict
 import boto3
 from botocore.utils import ClientError
-from easyecs.cloudformation.client import get_client_cloudformation
 from easyecs.cloudformation.fetch import fetch_stack_url
+from easyecs.cloudformation.stack.change_set import (
+    create_change_set,
+    execute_change_set,
+)
+from easyecs.cloudformation.stack.diff import (
+    diff_templates,
+    fetch_deployed_template,
+    print_template_changes,
+    save_deployed_template,
+)
+from easyecs.cloudformation.stack.events import watch_stack_events
 from easyecs.cloudformation.stack.waiter import (
     wait_for_stack_create,
     wait_for_stack_rollback,
-    wait_for_stack_update,
 )
 from easyecs.command import run_force_new_deployment
 
 from easyecs.helpers.color import Color
-from easyecs.helpers.common import load_template
+from easyecs.helpers.exceptions import StackDeploymentException
 from easyecs.helpers.loader import Loader
 
 
-def update_cloudformation_stack(stack_name: str, template_body: Dict):
-    """
-    Sends a request to AWS to update a CloudFormation stack.
-    """
-    client = get_client_cloudformation()
-    client.update_stack(
-        StackName=stack_name,
-        TemplateBody=json.dumps(template_body),
-        Capabilities=["CAPABILITY_NAMED_IAM"],
-    )
+def handle_no_updates(stack_name: str, force_redeployment: bool, cluster_name=None):
+    print(f"{Color.YELLOW}No updates are to be performed.{Color.END}")
+    if force_redeployment:
+        run_force_new_deployment(stack_name, cluster_name)
 
 
 def handle_update_error(
-    e: ClientError, stack_name: str, force_redeployment: bool, loader: Loader
+    e: ClientError,
+    stack_name: str,
+    force_redeployment: bool,
+    loader: Loader,
+    cluster_name=None,
 ):
     """
     Handles a CloudFormation stack update failure.
@@ -39,9 +45,7 @@ def handle_update_error(
     message = e.response["Error"]["Message"]
     if message == "No updates are to be performed.":
         loader.stop()
-        print(f"{Color.YELLOW}No updates are to be performed.{Color.END}")
-        if force_redeployment:
-            run_force_new_deployment(stack_name)
+        handle_no_updates(stack_name, force_redeployment, cluster_name)
     elif "UPDATE_IN_PROGRESS" in message:
         cloudformation = boto3.resource("cloudformation")
         stack = cloudformation.Stack(stack_name)
@@ -59,10 +63,35 @@ def handle_update_error(
         print(e)
 
 
-def update_stack(stack_name: str, force_redeployment: bool):
+def handle_stack_update_failure(e: StackDeploymentException):
+    """
+    Handles a CloudFormation stack update which rolled back.
+    Prints the reason for the failure and exits the program, the stack is
+    left on its previous template.
+    """
+    print(f"{Color.RED}{e}{Color.END}")
+    exit(-1)
+
+
+def update_stack(
+    stack_name: str,
+    cloudformation_template: Dict,
+    force_redeployment: bool,
+    cluster_name=None,
+):
     """
-    Updates a CloudFormation stack with the given name.
+    Updates a CloudFormation stack with the given name and template.
+    The template is first compared with the deployed one, an update which
+    would not change anything is not sent.
     """
+    deployed_template = fetch_deployed_template(stack_name)
+    if deployed_template is not None:
+        changes = diff_templates(deployed_template, cloudformation_template)
+        if not changes:
+            handle_no_updates(stack_name, force_redeployment, cluster_name)
+            return
+        print_template_changes(changes, deployed_template, cloudformation_template)
+
     loader = Loader(
         "Updating CloudFormation stack:",
         "Updating CloudFormation stack: \u2705",
@@ -71,12 +100,22 @@ def update_stack(stack_name: str, force_redeployment: bool):
     )
     loader.start()
 
-    cloudformation_template = load_template(stack_name)
     loader.set_metadata(f"Cloudformation URL: {fetch_stack_url(stack_name)}")
 
     try:
-        update_cloudformation_stack(stack_name, cloudformation_template)
-        wait_for_stack_update(stack_name)
+        change_set_name = create_change_set(
+            stack_name, cloudformation_template, "UPDATE"
+        )
+        if change_set_name is None:
+            loader.stop()
+            handle_no_updates(stack_name, force_redeployment, cluster_name)
+            return
+        client_request_token = execute_change_set(stack_name, change_set_name)
+        watch_stack_events(stack_name, client_request_token, loader)
+        save_deployed_template(stack_name, cloudformation_template)
         loader.stop()
     except ClientError as e:
-        handle_update_error(e, stack_name, force_redeployment, loader)
+        handle_update_error(e, stack_name, force_redeployment, loader, cluster_name)
+    except StackDeploymentException as e:
+        loader.stop_error()
+        handle_stack_update_failure(e)
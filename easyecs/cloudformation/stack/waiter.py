@@ -1,16 +1,6 @@
 from easyecs.cloudformation.client import get_client_cloudformation
 
 
-def wait_for_stack_update(stack_name: str):
-    """
-    Waits for the CloudFormation stack to be updated.
-    Throws an exception if the update fails.
-    """
-    client = get_client_cloudformation()
-    waiter = client.get_waiter("stack_update_complete")
-    waiter.wait(StackName=stack_name)
-
-
 def wait_for_stack_rollback(stack_name: str):
     """
     Waits for the CloudFormation stack to be rolled back.
@@ -1,6 +1,21 @@
+import json
+import os
+import tempfile
+
+from easyecs.cloudformation.template.cache import (
+    compute_template_key,
+    load_cached_template,
+    save_cached_template,
+)
+from easyecs.cloudformation.template.native import (
+    create_native_template,
+    is_native_template_supported,
+)
 from easyecs.cloudformation.template.task_definition import create_task_definition
 from easyecs.model.ecs import EcsFileModel
 
+TEMPLATE_OUTDIR = "./.cloudformation"
+
 
 def create_template(
     service_name,
@@ -11,11 +26,115 @@ def create_template(
     azs,
     ecs_manifest,
     run=False,
+):
+    """
+    Renders the template in pure Python when the manifest allows it, and
+    falls back to aws_cdk otherwise. Rendered templates are cached by content
+    so that a manifest rendering an already known template skips synthesis.
+    """
+    template_args = (
+        service_name,
+        aws_account_id,
+        aws_region,
+        vpc_id,
+        subnet_ids,
+        azs,
+        ecs_manifest,
+        run,
+    )
+    key = compute_template_key(*template_args)
+    template = load_cached_template(key)
+    if template is None:
+        if is_native_template_supported(ecs_manifest):
+            template = create_native_template(*template_args)
+        else:
+            template = create_cdk_template(*template_args)
+        save_cached_template(key, template)
+    return template
+
+
+def write_template(service_name, template) -> str:
+    """
+    Writes the template for debugging, in a directory of its own so that
+    concurrent invocations never overwrite each other.
+    """
+    os.makedirs(TEMPLATE_OUTDIR, exist_ok=True)
+    outdir = tempfile.mkdtemp(prefix=f"{service_name}-", dir=TEMPLATE_OUTDIR)
+    template_path = f"{outdir}/{service_name}.template.json"
+    with open(template_path, "w") as f:
+        json.dump(template, f, indent=1)
+    return template_path
+
+
+def is_aws_cdk_required(
+    service_name,
+    aws_account_id,
+    aws_region,
+    vpc_id,
+    subnet_ids,
+    azs,
+    ecs_manifest,
+    run=False,
+) -> bool:
+    if is_native_template_supported(ecs_manifest):
+        return False
+    key = compute_template_key(
+        service_name,
+        aws_account_id,
+        aws_region,
+        vpc_id,
+        subnet_ids,
+        azs,
+        ecs_manifest,
+        run,
+    )
+    return load_cached_template(key) is None
+
+
+def create_cdk_template(
+    service_name,
+    aws_account_id,
+    aws_region,
+    vpc_id,
+    subnet_ids,
+    azs,
+    ecs_manifest,
+    run=False,
+):
+    """
+    Synthesizes the template with aws_cdk. The cloud assembly is only written
+    to a temporary directory, the template is read back from memory.
+    """
+    with tempfile.TemporaryDirectory(prefix="easyecs-") as outdir:
+        cloud_assembly = synthesize_cdk_app(
+            outdir,
+            service_name,
+            aws_account_id,
+            aws_region,
+            vpc_id,
+            subnet_ids,
+            azs,
+            ecs_manifest,
+            run,
+        )
+        return cloud_assembly.get_stack_by_name(service_name).template
+
+
+def synthesize_cdk_app(
+    outdir,
+    service_name,
+    aws_account_id,
+    aws_region,
+    vpc_id,
+    subnet_ids,
+    azs,
+    ecs_manifest,
+    run=False,
 ):
     from aws_cdk import App, BootstraplessSynthesizer, Environment, Stack
     from aws_cdk.aws_ec2 import Subnet, SubnetSelection, Vpc
 
-    app = App(outdir="./.cloudformation")
+    app = App(outdir=outdir)
     bootstrapless_synthesizer = BootstraplessSynthesizer()
     stack = Stack(
         app,
@@ -81,7 +200,7 @@ def create_template(
         ), "auto_destruction must be an Integer (minutes)"
         create_autodestroy(stack, ecs_manifest.metadata.auto_destruction)
 
-    app.synth()
+    return app.synth()
 
 
 def create_load_balancer(stack, ecs_manifest: EcsFileModel, vpc):
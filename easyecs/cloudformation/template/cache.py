@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Dict, Optional
+
+TEMPLATE_CACHE_DIR = ".tmp/templates"
+# Number of templates kept, the least recently used ones are evicted first.
+TEMPLATE_CACHE_SIZE = 32
+# Sources the rendered template depends on besides the manifest, a change in
+# any of them invalidates the cache.
+GENERATOR_FILES = [
+    Path(__file__).parent / "__init__.py",
+    Path(__file__).parent / "native.py",
+    Path(__file__).parent / "task_definition.py",
+    Path(__file__).parent.parent / "auto_destruction/harakiri.py",
+]
+
+
+def fetch_aws_cdk_version() -> Optional[str]:
+    try:
+        return version("aws-cdk-lib")
+    except PackageNotFoundError:
+        return None
+
+
+def compute_generator_hash() -> str:
+    hash_sha256 = hashlib.sha256()
+    for generator_file in GENERATOR_FILES:
+        hash_sha256.update(generator_file.read_bytes())
+    return hash_sha256.hexdigest()
+
+
+def compute_template_key(
+    service_name,
+    aws_account_id,
+    aws_region,
+    vpc_id,
+    subnet_ids,
+    azs,
+    ecs_manifest,
+    run=False,
+) -> str:
+    """
+    Hashes everything the template is rendered from. The manifest is hashed
+    once validated, so comments or reordered fields in the ecs file hit the
+    cache while the order of user defined maps (env, depends_on), which shows
+    in the template, does not.
+    """
+    payload = {
+        "generator": compute_generator_hash(),
+        "aws_cdk": fetch_aws_cdk_version(),
+        "service_name": service_name,
+        "aws_account_id": aws_account_id,
+        "aws_region": aws_region,
+        "vpc_id": vpc_id,
+        "subnet_ids": subnet_ids,
+        "azs": azs,
+        "run": run,
+        "manifest": ecs_manifest.model_dump(mode="json"),
+    }
+    canonical_payload = json.dumps(payload, separators=(",", ":"))
+    return hashlib.sha256(canonical_payload.encode()).hexdigest()
+
+
+def load_cached_template(key: str) -> Optional[Dict]:
+    cache_path = Path(TEMPLATE_CACHE_DIR) / f"{key}.json"
+    try:
+        with open(cache_path) as f:
+            template = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    # Refreshes the entry so that eviction drops the least recently used.
+    try:
+        os.utime(cache_path)
+    except FileNotFoundError:
+        # Evicted meanwhile by a concurrent run.
+        return None
+    return template
+
+
+def save_cached_template(key: str, template: Dict):
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    cache_path = Path(TEMPLATE_CACHE_DIR) / f"{key}.json"
+    # Written aside then renamed so that a concurrent run never reads a
+    # partial template.
+    partial_path = cache_path.with_suffix(f".{os.getpid()}.partial")
+    with open(partial_path, "w") as f:
+        json.dump(template, f)
+    os.replace(partial_path, cache_path)
+    evict_cached_templates()
+
+
+def get_last_use(cache_path: Path) -> float:
+    try:
+        return cache_path.stat().st_mtime
+    except FileNotFoundError:
+        # Evicted meanwhile by a concurrent run.
+        return 0
+
+
+def evict_cached_templates(size: int = TEMPLATE_CACHE_SIZE):
+    cache_paths = sorted(
+        Path(TEMPLATE_CACHE_DIR).glob("*.json"), key=get_last_use, reverse=True
+    )
+    for cache_path in cache_paths[size:]:
+        try:
+            cache_path.unlink()
+        except FileNotFoundError:
+            pass
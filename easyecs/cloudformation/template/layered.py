@@ -0,0 +1,157 @@
+import copy
+import re
+from typing import Dict, Optional, Set, Tuple
+
+# Resources deployed by the service stack, the ones changing with the images
+# and the environment. Everything else goes to the base stack, along with the
+# resources depending on the service stack.
+SERVICE_RESOURCE_TYPES = ["AWS::ECS::TaskDefinition", "AWS::ECS::Service"]
+
+
+def get_base_stack_name(stack_name: str) -> str:
+    return f"{stack_name}-base"
+
+
+def get_export_name(base_stack_name: str, resource_id: str, attribute=None) -> str:
+    # Export names only allow alphanumeric characters, colons and hyphens.
+    attribute = re.sub(r"[^A-Za-z0-9]", "-", attribute) if attribute else "Ref"
+    return f"{base_stack_name}:{resource_id}:{attribute}"
+
+
+def get_output_id(resource_id: str, attribute=None) -> str:
+    attribute = re.sub(r"[^A-Za-z0-9]", "", attribute) if attribute else "Ref"
+    return f"{resource_id}{attribute}"
+
+
+def parse_reference(value) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Returns the logical id and the attribute (None for a Ref) referenced by a
+    template value, if it is a Ref or a Fn::GetAtt. Pseudo parameters are not
+    references.
+    """
+    if not isinstance(value, dict) or len(value) != 1:
+        return None
+    if "Ref" in value and not value["Ref"].startswith("AWS::"):
+        return value["Ref"], None
+    if "Fn::GetAtt" in value:
+        get_att = value["Fn::GetAtt"]
+        if isinstance(get_att, str):
+            get_att = get_att.split(".", 1)
+        return get_att[0], get_att[1]
+    return None
+
+
+def find_references(value) -> Set[str]:
+    """
+    Returns the logical ids referenced by a template value through Ref or
+    Fn::GetAtt.
+    """
+    reference = parse_reference(value)
+    if reference:
+        return {reference[0]}
+    references = set()
+    if isinstance(value, dict):
+        for item in value.values():
+            references |= find_references(item)
+    elif isinstance(value, list):
+        for item in value:
+            references |= find_references(item)
+    return references
+
+
+def find_dependencies(resource: Dict) -> Set[str]:
+    depends_on = resource.get("DependsOn", [])
+    if isinstance(depends_on, str):
+        depends_on = [depends_on]
+    return find_references(resource) | set(depends_on)
+
+
+def filter_depends_on(resource: Dict, resource_ids: Set[str]):
+    """
+    Drops the dependencies of a resource on resources of another stack.
+    """
+    if "DependsOn" not in resource:
+        return
+    depends_on = resource["DependsOn"]
+    if isinstance(depends_on, str):
+        depends_on = [depends_on]
+    depends_on = [dependency for dependency in depends_on if dependency in resource_ids]
+    if depends_on:
+        resource["DependsOn"] = depends_on
+    else:
+        del resource["DependsOn"]
+
+
+def import_references(value, base_resources: Dict, base_stack_name: str, outputs):
+    """
+    Replaces the references to base resources by the import of their export,
+    which is added to the outputs of the base stack.
+    """
+    reference = parse_reference(value)
+    if reference and reference[0] in base_resources:
+        resource_id, attribute = reference
+        export_name = get_export_name(base_stack_name, resource_id, attribute)
+        outputs[get_output_id(resource_id, attribute)] = {
+            "Value": copy.deepcopy(value),
+            "Export": {"Name": export_name},
+        }
+        return {"Fn::ImportValue": export_name}
+    if isinstance(value, dict):
+        return {
+            key: import_references(item, base_resources, base_stack_name, outputs)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [
+            import_references(item, base_resources, base_stack_name, outputs)
+            for item in value
+        ]
+    return value
+
+
+def split_template(template: Dict, stack_name: str) -> Tuple[Dict, Dict]:
+    """
+    Splits a template into a base stack, holding the roles, the cluster, the
+    log group, the security groups and the load balancer, and a service stack
+    holding the task definition and the service. The service stack imports
+    what it references from the base stack, which is deployed first.
+    """
+    resources = template.get("Resources", {})
+    service_ids = {
+        resource_id
+        for resource_id, resource in resources.items()
+        if resource["Type"] in SERVICE_RESOURCE_TYPES
+    }
+    # A base resource depending on the service would be created before it.
+    moved = True
+    while moved:
+        moved = False
+        for resource_id, resource in resources.items():
+            if resource_id not in service_ids and (
+                find_dependencies(resource) & service_ids
+            ):
+                service_ids.add(resource_id)
+                moved = True
+
+    base_stack_name = get_base_stack_name(stack_name)
+    base_resources = {
+        resource_id: resource
+        for resource_id, resource in resources.items()
+        if resource_id not in service_ids
+    }
+    outputs = {}
+    service_resources = {}
+    for resource_id, resource in resources.items():
+        if resource_id not in service_ids:
+            continue
+        resource = import_references(resource, base_resources, base_stack_name, outputs)
+        # The base stack is deployed first, its resources already exist.
+        filter_depends_on(resource, service_ids)
+        service_resources[resource_id] = resource
+
+    base_template = copy.deepcopy(template)
+    base_template["Resources"] = copy.deepcopy(base_resources)
+    if outputs:
+        base_template["Outputs"] = {**base_template.get("Outputs", {}), **outputs}
+    service_template = {"Resources": service_resources}
+    return base_template, service_template
@@ -0,0 +1,954 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from easyecs.cloudformation.template.task_definition import (
+    SECRET_ARN_PATTERN,
+    split_if_str,
+)
+from easyecs.helpers.exceptions import UnsupportedNativeTemplateException
+from easyecs.model.ecs import (
+    EcsFileModel,
+    EcsFileRoleModel,
+    EcsFileSecretModel,
+    EcsFileSecretModelV2,
+)
+
+# The templates produced here must be identical to the ones produced by
+# aws_cdk, resources keep the logical ids CDK allocates so that a stack can be
+# updated by either generator.
+POLICY_VERSION = "2012-10-17"
+ALLOW_ALL_OUTBOUND = {
+    "CidrIp": "0.0.0.0/0",
+    "Description": "Allow all outbound traffic by default",
+    "IpProtocol": "-1",
+}
+EXECUTE_COMMAND_STATEMENTS = [
+    {
+        "Action": [
+            "ssmmessages:CreateControlChannel",
+            "ssmmessages:CreateDataChannel",
+            "ssmmessages:OpenControlChannel",
+            "ssmmessages:OpenDataChannel",
+        ],
+        "Effect": "Allow",
+        "Resource": "*",
+    },
+    {"Action": "logs:DescribeLogGroups", "Effect": "Allow", "Resource": "*"},
+    {
+        "Action": [
+            "logs:CreateLogStream",
+            "logs:DescribeLogStreams",
+            "logs:PutLogEvents",
+        ],
+        "Effect": "Allow",
+        "Resource": "*",
+    },
+]
+SECRET_READ_ACTIONS = ["secretsmanager:GetSecretValue", "secretsmanager:DescribeSecret"]
+DEPENDENCY_CONDITIONS = {
+    "service_completed_successfully": "COMPLETE",
+    "service_healthy": "HEALTHY",
+}
+# Order in which the ICU collation used by CDK to sort DependsOn ranks
+# punctuation, all of it ranking before digits and letters.
+COLLATION_PUNCTUATION = "_-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$"
+ROLE_ARN_PATTERN = r"^arn:aws:iam::(?P<account_id>\d{0,12}):role/(?P<path>.*)$"
+IPV4_CIDR_PATTERN = r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2}$"
+LOAD_BALANCER_NAME_PATTERN = r"^[A-Za-z0-9](?:[A-Za-z0-9-]{0,30}[A-Za-z0-9])?$"
+CPU_ARCHITECTURES = {"x86_64": "X86_64", "arm64": "ARM64"}
+
+
+@dataclass
+class NativeRole:
+    arn: Any
+    # Policy holding the statements granted by the stack to the role. None
+    # when the role belongs to another account and cannot be modified.
+    policy_id: Optional[str]
+    statements: List[Dict] = field(default_factory=list)
+    # Construct path -> logical id of the resources the service depends on.
+    resources: Dict[str, str] = field(default_factory=dict)
+
+
+def make_unique_id(components: List[str]) -> str:
+    """
+    Computes the id CDK allocates to a construct path: the path components
+    without their non alphanumeric characters, followed by a hash of the path.
+    """
+    components = [component for component in components if component != "Default"]
+    path_hash = hashlib.md5("/".join(components).encode()).hexdigest()[:8].upper()
+    human_components = []
+    for component in components:
+        if not human_components or not human_components[-1].endswith(component):
+            human_components.append(component)
+    human = "".join(
+        re.sub(r"[^A-Za-z0-9]", "", component)
+        for component in human_components
+        if component != "Resource"
+    )
+    return human[:240] + path_hash
+
+
+def construct_path(*ids) -> List[str]:
+    # Construct ids cannot contain the path separator, CDK replaces it.
+    return [construct_id.replace("/", "--") for construct_id in ids]
+
+
+def logical_id(*ids) -> str:
+    return make_unique_id(construct_path(*ids))
+
+
+def construct_unique_id(service_name, *ids) -> str:
+    return make_unique_id(construct_path(service_name, *ids))
+
+
+def collation_key(path: str):
+    return [
+        (1, char.lower()) if char.isalnum() else (0, COLLATION_PUNCTUATION.find(char))
+        for char in path
+    ]
+
+
+def render_depends_on(resources: Dict[str, str]) -> List[str]:
+    return [resources[path] for path in sorted(resources.keys(), key=collation_key)]
+
+
+def ref(resource_id):
+    return {"Ref": resource_id}
+
+
+def get_att(resource_id, attribute):
+    return {"Fn::GetAtt": [resource_id, attribute]}
+
+
+def render_values(values):
+    values = list(
+        {json.dumps(value, sort_keys=True): value for value in values}.values()
+    )
+    return values[0] if len(values) == 1 else values
+
+
+def policy_statement(actions, resources, effect="Allow", sid=None):
+    statement = {
+        "Action": render_values(actions),
+        "Effect": effect,
+        "Resource": render_values(resources),
+    }
+    if sid:
+        statement["Sid"] = sid
+    return statement
+
+
+def policy_document(statements):
+    unique_statements = {
+        json.dumps(statement, sort_keys=True): statement for statement in statements
+    }
+    return {"Statement": list(unique_statements.values()), "Version": POLICY_VERSION}
+
+
+def assume_role_policy_document(service):
+    return policy_document(
+        [
+            {
+                "Action": "sts:AssumeRole",
+                "Effect": "Allow",
+                "Principal": {"Service": service},
+            }
+        ]
+    )
+
+
+def managed_policy_arn(managed_policy_name):
+    return {
+        "Fn::Join": [
+            "",
+            [
+                "arn:",
+                ref("AWS::Partition"),
+                f":iam::aws:policy/{managed_policy_name}",
+            ],
+        ]
+    }
+
+
+def port_id(port):
+    return "ALL TRAFFIC" if port == -1 else str(port)
+
+
+def port_rule(port):
+    if port == -1:
+        return {"IpProtocol": "-1"}
+    return {"FromPort": port, "IpProtocol": "tcp", "ToPort": port}
+
+
+def sorted_properties(properties):
+    return dict(sorted(properties.items()))
+
+
+def check_native_template_support(ecs_manifest):
+    """
+    Raises UnsupportedNativeTemplateException for the manifests whose template
+    only CDK knows how to render, or that CDK rejects with its own error.
+    """
+    if not isinstance(ecs_manifest, EcsFileModel):
+        raise UnsupportedNativeTemplateException("Not an ecs manifest")
+    check_roles_support(ecs_manifest)
+    check_task_definition_support(ecs_manifest)
+    if ecs_manifest.load_balancer:
+        check_load_balancer_support(ecs_manifest)
+    auto_destruction = ecs_manifest.metadata.auto_destruction
+    if auto_destruction is not None and auto_destruction <= 0:
+        raise UnsupportedNativeTemplateException("auto_destruction must be positive")
+
+
+def check_roles_support(ecs_manifest):
+    role_arns = [ecs_manifest.role.arn, ecs_manifest.execution_role.arn]
+    if role_arns[0] is not None and role_arns[0] == role_arns[1]:
+        raise UnsupportedNativeTemplateException("Same role for task and execution")
+    for role in (ecs_manifest.role, ecs_manifest.execution_role):
+        if role.arn:
+            role_name = re.match(ROLE_ARN_PATTERN, role.arn).group("path")
+            if not role_name.split("/")[-1]:
+                raise UnsupportedNativeTemplateException(f"No role name: {role.arn}")
+            continue
+        if not role.statements:
+            raise UnsupportedNativeTemplateException("Empty inline policy")
+        for statement in role.statements:
+            if not statement.actions or not statement.resources:
+                raise UnsupportedNativeTemplateException(
+                    f"Statement {statement.sid} without actions or resources"
+                )
+
+
+def check_task_definition_support(ecs_manifest):
+    task_definition = ecs_manifest.task_definition
+    containers = task_definition.containers
+    if not any(container.essential for container in containers):
+        raise UnsupportedNativeTemplateException("No essential container")
+    containers_cpu = sum(container.resources.limits.cpu for container in containers)
+    if containers_cpu > task_definition.resources.limits.cpu:
+        raise UnsupportedNativeTemplateException("Containers cpu exceed task cpu")
+    for container in containers:
+        if container.command == [] or container.entry_point == []:
+            raise UnsupportedNativeTemplateException(f"Empty command: {container.name}")
+        if isinstance(container.env, dict) and not all(
+            isinstance(value, str) for value in container.env.values()
+        ):
+            raise UnsupportedNativeTemplateException(
+                f"Non string env: {container.name}"
+            )
+        for port in container.ports or []:
+            host_port, container_port = port.split(":")
+            if int(host_port) != int(container_port):
+                raise UnsupportedNativeTemplateException(f"Host port differs: {port}")
+        secret_names = [secret.name for secret in container.secrets]
+        if len(secret_names) != len(set(secret_names)):
+            raise UnsupportedNativeTemplateException(
+                f"Duplicate secret: {container.name}"
+            )
+        healthcheck = container.healthcheck
+        if healthcheck and not (
+            5 <= healthcheck.interval <= 300
+            and 2 <= healthcheck.timeout <= 120
+            and 0 <= healthcheck.start_period <= 300
+        ):
+            raise UnsupportedNativeTemplateException(
+                f"Healthcheck out of range: {container.name}"
+            )
+
+
+def check_load_balancer_support(ecs_manifest):
+    load_balancer = ecs_manifest.load_balancer
+    default_container = get_default_container(ecs_manifest)
+    if default_container is None or not default_container.ports:
+        raise UnsupportedNativeTemplateException("No port on the default container")
+    name = load_balancer.load_balancer_name
+    if name is not None and not re.match(LOAD_BALANCER_NAME_PATTERN, name):
+        raise UnsupportedNativeTemplateException(f"Load balancer name: {name}")
+    rules = load_balancer.security_group_rules
+    if not rules:
+        return
+    if load_balancer.security_group_id and (rules.egress or rules.ingress):
+        raise UnsupportedNativeTemplateException("Rules on an imported security group")
+    for direction in (rules.egress, rules.ingress):
+        if len([rule for rule in direction if rule.security_group_id]) > 1:
+            raise UnsupportedNativeTemplateException("Several security group peers")
+    for rule in rules.ingress:
+        if rule.cidr and not re.match(IPV4_CIDR_PATTERN, rule.cidr):
+            raise UnsupportedNativeTemplateException(f"Not an IPv4 CIDR: {rule.cidr}")
+
+
+def is_native_template_supported(ecs_manifest) -> bool:
+    try:
+        check_native_template_support(ecs_manifest)
+    except UnsupportedNativeTemplateException:
+        return False
+    return True
+
+
+def get_default_container(ecs_manifest):
+    for container in ecs_manifest.task_definition.containers:
+        if container.essential:
+            return container
+    return None
+
+
+def create_native_template(
+    service_name,
+    aws_account_id,
+    aws_region,
+    vpc_id,
+    subnet_ids,
+    azs,
+    ecs_manifest: EcsFileModel,
+    run=False,
+) -> Dict:
+    """
+    Builds the CloudFormation template straight from the manifest, without
+    aws_cdk. It renders the same template as create_cdk_template.
+    """
+    check_native_template_support(ecs_manifest)
+    resources = {}
+    target_group = listener = lb_security_group = None
+    if ecs_manifest.load_balancer:
+        lb_security_group, listener, target_group = create_load_balancer(
+            resources, service_name, vpc_id, ecs_manifest
+        )
+    task_role = create_role(
+        resources,
+        service_name,
+        aws_account_id,
+        ecs_manifest.role,
+        f"{service_name}-task-role",
+    )
+    execution_role = create_role(
+        resources,
+        service_name,
+        aws_account_id,
+        ecs_manifest.execution_role,
+        f"{service_name}-execution-task-role",
+    )
+    cluster = create_ecs_cluster(resources, service_name)
+    log_group = create_log_group(resources, service_name)
+    security_group = create_security_group(
+        resources, service_name, vpc_id, ecs_manifest, lb_security_group
+    )
+    task_definition = create_task_definition(
+        resources,
+        service_name,
+        aws_region,
+        task_role,
+        execution_role,
+        log_group,
+        ecs_manifest,
+        run,
+    )
+    create_ecs_service(
+        resources,
+        service_name,
+        subnet_ids,
+        cluster,
+        task_definition,
+        security_group,
+        task_role,
+        ecs_manifest,
+        target_group,
+        listener,
+    )
+    for role in (task_role, execution_role):
+        render_role_policy(resources, role)
+    if ecs_manifest.metadata.auto_destruction is not None:
+        create_autodestroy(
+            resources, service_name, ecs_manifest.metadata.auto_destruction
+        )
+    return {"Resources": resources}
+
+
+def create_load_balancer(resources, service_name, vpc_id, ecs_manifest):
+    load_balancer = ecs_manifest.load_balancer
+    security_group_unique_id = construct_unique_id(service_name, "nlb_security_group")
+    if load_balancer.security_group_id:
+        lb_security_group = load_balancer.security_group_id
+    else:
+        security_group_id = logical_id("nlb_security_group", "Resource")
+        lb_security_group = get_att(security_group_id, "GroupId")
+        security_group = {
+            "GroupDescription": "NLB Security Group",
+            "SecurityGroupEgress": [ALLOW_ALL_OUTBOUND],
+            "VpcId": vpc_id,
+        }
+        resources[security_group_id] = {
+            "Type": "AWS::EC2::SecurityGroup",
+            "Properties": security_group,
+        }
+        # Egress rules are ignored as the security group allows all outbound
+        # traffic, like CDK does.
+        rules = load_balancer.security_group_rules
+        inline_rules = []
+        for rule in rules.ingress if rules else []:
+            add_load_balancer_ingress_rule(
+                resources, service_name, inline_rules, lb_security_group, rule
+            )
+        if inline_rules:
+            resources[security_group_id]["Properties"] = sorted_properties(
+                {**security_group, "SecurityGroupIngress": inline_rules}
+            )
+    load_balancer_arn = load_balancer.arn
+    if not load_balancer_arn:
+        load_balancer_id = logical_id("nlb", "Resource")
+        load_balancer_arn = ref(load_balancer_id)
+        properties = {
+            "LoadBalancerAttributes": [
+                {"Key": "deletion_protection.enabled", "Value": "false"}
+            ],
+            "Scheme": "internal",
+            "SecurityGroups": [lb_security_group],
+            "Subnets": load_balancer.subnets,
+            "Type": "network",
+        }
+        if load_balancer.load_balancer_name:
+            properties["Name"] = load_balancer.load_balancer_name
+        resources[load_balancer_id] = {
+            "Type": "AWS::ElasticLoadBalancingV2::LoadBalancer",
+            "Properties": sorted_properties(properties),
+        }
+    listener_id = logical_id("nlb", "NlbListener", "Resource")
+    target_group_id = logical_id("nlb", "NlbListener", "NlbTargetGroup", "Resource")
+    resources[listener_id] = {
+        "Type": "AWS::ElasticLoadBalancingV2::Listener",
+        "Properties": {
+            "DefaultActions": [
+                {"TargetGroupArn": ref(target_group_id), "Type": "forward"}
+            ],
+            "LoadBalancerArn": load_balancer_arn,
+            "Port": load_balancer.listener_port,
+            "Protocol": "TCP",
+        },
+    }
+    target_group = {
+        "Port": load_balancer.target_group_port,
+        "Protocol": "TCP",
+        "TargetType": "ip",
+        "VpcId": vpc_id,
+    }
+    if isinstance(load_balancer.idle_timeout, int):
+        target_group["TargetGroupAttributes"] = [
+            {
+                "Key": "deregistration_delay.timeout_seconds",
+                "Value": str(load_balancer.idle_timeout),
+            }
+        ]
+    resources[target_group_id] = {
+        "Type": "AWS::ElasticLoadBalancingV2::TargetGroup",
+        "Properties": sorted_properties(target_group),
+    }
+    return (
+        (security_group_unique_id, lb_security_group),
+        (("nlb", "NlbListener", "Resource"), listener_id),
+        (("nlb", "NlbListener", "NlbTargetGroup", "Resource"), target_group_id),
+    )
+
+
+def add_load_balancer_ingress_rule(
+    resources, service_name, inline_rules, lb_security_group, rule
+):
+    if rule.cidr:
+        # CIDR rules are inlined in the security group, duplicates are dropped.
+        inline_rule = sorted_properties(
+            {"CidrIp": rule.cidr, "Description": rule.name, **port_rule(rule.port)}
+        )
+        if inline_rule not in inline_rules:
+            inline_rules.append(inline_rule)
+        return
+    if rule.prefix_list:
+        peer_id = rule.prefix_list
+        peer = {"SourcePrefixListId": rule.prefix_list}
+    else:
+        peer_id = construct_unique_id(service_name, "ingress_rule_sg")
+        peer = {"SourceSecurityGroupId": rule.security_group_id}
+    rule_id = logical_id("nlb_security_group", f"from {peer_id}:{port_id(rule.port)}")
+    if rule_id in resources:
+        return
+    resources[rule_id] = {
+        "Type": "AWS::EC2::SecurityGroupIngress",
+        "Properties": sorted_properties(
+            {
+                "Description": rule.name,
+                "GroupId": lb_security_group,
+                **peer,
+                **port_rule(rule.port),
+            }
+        ),
+    }
+
+
+def create_role(
+    resources, service_name, aws_account_id, role_model: EcsFileRoleModel, role_name
+) -> NativeRole:
+    if role_model.arn:
+        return import_role(resources, aws_account_id, role_model.arn)
+    role_id = logical_id(role_name, "Resource")
+    properties = {
+        "AssumeRolePolicyDocument": assume_role_policy_document(
+            "ecs-tasks.amazonaws.com"
+        )
+    }
+    if role_model.managed_policies:
+        properties["ManagedPolicyArns"] = [
+            managed_policy_arn(managed_policy)
+            for managed_policy in role_model.managed_policies
+        ]
+    properties["Policies"] = [
+        {
+            "PolicyDocument": policy_document(
+                [
+                    policy_statement(
+                        statement.actions,
+                        statement.resources,
+                        "Allow" if statement.effect == "Allow" else "Deny",
+                        statement.sid,
+                    )
+                    for statement in role_model.statements
+                ]
+            ),
+            "PolicyName": f"{role_name}-policy",
+        }
+    ]
+    resources[role_id] = {"Type": "AWS::IAM::Role", "Properties": properties}
+    policy_path = f"{role_name}/DefaultPolicy/Resource"
+    policy_id = logical_id(role_name, "DefaultPolicy", "Resource")
+    # Reserves the position of the default policy right after its role, its
+    # statements are only known once the whole stack is built.
+    resources[policy_id] = {"Type": "AWS::IAM::Policy", "Roles": [ref(role_id)]}
+    return NativeRole(
+        arn=get_att(role_id, "Arn"),
+        policy_id=policy_id,
+        resources={policy_path: policy_id, f"{role_name}/Resource": role_id},
+    )
+
+
+def import_role(resources, aws_account_id, role_arn) -> NativeRole:
+    arn_fields = re.match(ROLE_ARN_PATTERN, role_arn)
+    if arn_fields.group("account_id") != aws_account_id:
+        # Roles of another account are immutable, grants are dropped.
+        return NativeRole(arn=role_arn, policy_id=None)
+    role_path = construct_path(role_arn)[0]
+    policy_id = logical_id(role_arn, "Policy", "Resource")
+    resources[policy_id] = {
+        "Type": "AWS::IAM::Policy",
+        "Roles": [arn_fields.group("path").split("/")[-1]],
+    }
+    return NativeRole(
+        arn=role_arn,
+        policy_id=policy_id,
+        resources={f"{role_path}/Policy/Resource": policy_id},
+    )
+
+
+def render_role_policy(resources, role: NativeRole):
+    if role.policy_id is None:
+        return
+    policy = resources[role.policy_id]
+    policy["Properties"] = {
+        "PolicyDocument": policy_document(role.statements),
+        "PolicyName": role.policy_id[-128:],
+        "Roles": policy.pop("Roles"),
+    }
+
+
+def create_ecs_cluster(resources, service_name):
+    cluster_name = f"{service_name}-cluster"
+    cluster_id = logical_id(cluster_name, "Resource")
+    resources[cluster_id] = {
+        "Type": "AWS::ECS::Cluster",
+        "Properties": {"ClusterName": cluster_name},
+    }
+    return cluster_id
+
+
+def create_log_group(resources, service_name):
+    log_group_id = logical_id(f"{service_name}-log", "Resource")
+    resources[log_group_id] = {
+        "Type": "AWS::Logs::LogGroup",
+        "Properties": {"RetentionInDays": 731},
+        "UpdateReplacePolicy": "Retain",
+        "DeletionPolicy": "Retain",
+    }
+    return log_group_id
+
+
+def create_security_group(
+    resources, service_name, vpc_id, ecs_manifest, lb_security_group
+):
+    sg_name = f"{service_name}-sg"
+    if ecs_manifest.security_group_id:
+        security_group = ecs_manifest.security_group_id
+    else:
+        security_group_id = logical_id(sg_name, "Resource")
+        security_group = get_att(security_group_id, "GroupId")
+        resources[security_group_id] = {
+            "Type": "AWS::EC2::SecurityGroup",
+            "Properties": {
+                "GroupDescription": f"{service_name}/{sg_name}",
+                "SecurityGroupEgress": [ALLOW_ALL_OUTBOUND],
+                "VpcId": vpc_id,
+            },
+        }
+    if ecs_manifest.load_balancer:
+        peer_id, peer = lb_security_group
+        port = ecs_manifest.load_balancer.target_group_port
+        rule_id = logical_id(sg_name, f"from {peer_id}:{port_id(port)}")
+        resources[rule_id] = {
+            "Type": "AWS::EC2::SecurityGroupIngress",
+            "Properties": sorted_properties(
+                {
+                    "Description": "Allow Port from Load Balancer",
+                    "GroupId": security_group,
+                    "SourceSecurityGroupId": peer,
+                    **port_rule(port),
+                }
+            ),
+        }
+    return security_group
+
+
+def create_task_definition(
+    resources,
+    service_name,
+    aws_region,
+    task_role: NativeRole,
+    execution_role: NativeRole,
+    log_group,
+    ecs_manifest,
+    run=False,
+):
+    """Create a Fargate task definition."""
+    task_definition_name = f"{service_name}-task-definition"
+    task_definition_model = ecs_manifest.task_definition
+    resource_limits = task_definition_model.resources.limits
+    container_definitions = [
+        create_container_definition(
+            container, aws_region, execution_role, log_group, run
+        )
+        for container in task_definition_model.containers
+    ]
+    properties = {
+        "ContainerDefinitions": container_definitions,
+        "Cpu": str(resource_limits.cpu * 1024),
+        "ExecutionRoleArn": execution_role.arn,
+        "Family": construct_unique_id(service_name, task_definition_name),
+        "Memory": str(resource_limits.memory),
+        "NetworkMode": "awsvpc",
+        "RequiresCompatibilities": ["FARGATE"],
+        "TaskRoleArn": task_role.arn,
+    }
+    if isinstance(task_definition_model.ephemeral_storage, int):
+        properties["EphemeralStorage"] = {
+            "SizeInGiB": task_definition_model.ephemeral_storage
+        }
+    if task_definition_model.architectures:
+        properties["RuntimePlatform"] = {
+            "CpuArchitecture": CPU_ARCHITECTURES[
+                task_definition_model.architectures[0]
+            ],
+            "OperatingSystemFamily": "LINUX",
+        }
+    if task_definition_model.efs_volumes:
+        properties["Volumes"] = [
+            {
+                "EFSVolumeConfiguration": {
+                    "AuthorizationConfig": {"IAM": "ENABLED"},
+                    "FilesystemId": volume.id,
+                    "TransitEncryption": "ENABLED",
+                },
+                "Name": volume.name,
+            }
+            for volume in task_definition_model.efs_volumes
+        ]
+    task_definition_id = logical_id(task_definition_name, "Resource")
+    resources[task_definition_id] = {
+        "Type": "AWS::ECS::TaskDefinition",
+        "Properties": sorted_properties(properties),
+    }
+    return task_definition_id
+
+
+def create_container_definition(
+    container, aws_region, execution_role: NativeRole, log_group, run
+):
+    """Render a container definition, granting the execution role its reads."""
+    command = split_if_str(container.command)
+    if container.tty and not run:
+        command = ["sleep", "infinity"]
+    entry_point = split_if_str(container.entry_point)
+    environment = get_container_environment(container)
+    grant(
+        execution_role,
+        policy_statement(
+            ["logs:CreateLogStream", "logs:PutLogEvents"], [get_att(log_group, "Arn")]
+        ),
+    )
+    secrets = {}
+    for secret in container.secrets:
+        secret_arn, value_from = extract_secret(secret)
+        grant(execution_role, policy_statement(SECRET_READ_ACTIONS, [secret_arn]))
+        secrets[secret.name] = value_from
+
+    definition = {
+        "Cpu": container.resources.limits.cpu * 1024,
+        "Essential": container.essential,
+        "Image": container.image,
+        "LogConfiguration": {
+            "LogDriver": "awslogs",
+            "Options": {
+                "awslogs-group": ref(log_group),
+                "awslogs-stream-prefix": "ecs",
+                "awslogs-region": aws_region,
+            },
+        },
+        "Memory": container.resources.limits.memory,
+        "Name": container.name,
+        "User": container.user,
+    }
+    if command is not None:
+        definition["Command"] = command
+    if entry_point is not None:
+        definition["EntryPoint"] = entry_point
+    if container.depends_on:
+        definition["DependsOn"] = [
+            {
+                "Condition": map_dependency_condition(value["condition"]),
+                "ContainerName": key,
+            }
+            for key, value in container.depends_on.items()
+        ]
+    if environment:
+        definition["Environment"] = [
+            {"Name": name, "Value": environment[name]}
+            for name in js_object_keys(environment)
+        ]
+    if container.healthcheck:
+        definition["HealthCheck"] = extract_health_check(container.healthcheck)
+    if container.efs_volumes:
+        definition["MountPoints"] = [
+            {
+                "ContainerPath": volume.mount_point,
+                "ReadOnly": False,
+                "SourceVolume": volume.name,
+            }
+            for volume in container.efs_volumes
+        ]
+    if container.ports:
+        definition["PortMappings"] = [
+            {
+                "ContainerPort": int(port.split(":")[1]),
+                "HostPort": int(port.split(":")[0]),
+                "Protocol": "tcp",
+            }
+            for port in container.ports
+        ]
+    if secrets:
+        definition["Secrets"] = [
+            {"Name": name, "ValueFrom": secrets[name]}
+            for name in js_object_keys(secrets)
+        ]
+    return sorted_properties(definition)
+
+
+def get_container_environment(container) -> Dict:
+    if isinstance(container.env, list):
+        return {env.name: env.value for env in container.env if env.active}
+    if isinstance(container.env, dict):
+        return container.env
+    return {}
+
+
+def js_object_keys(values: Dict) -> List[str]:
+    """
+    Orders keys the way a JavaScript object does: integer-like keys first in
+    ascending order, then the other keys in insertion order.
+    """
+    integer_keys = sorted(
+        (key for key in values if re.match(r"^(0|[1-9]\d*)$", key)), key=int
+    )
+    return integer_keys + [key for key in values if key not in integer_keys]
+
+
+def grant(role: NativeRole, statement):
+    if role.policy_id is not None:
+        role.statements.append(statement)
+
+
+def extract_secret(secret_definition):
+    """Return the ARN to grant and the valueFrom of a container secret."""
+    if isinstance(secret_definition, EcsFileSecretModel):
+        secret_arn = secret_definition.arn
+        field = secret_definition.field
+    elif isinstance(secret_definition, EcsFileSecretModelV2):
+        arn_fields = list(re.finditer(SECRET_ARN_PATTERN, secret_definition.valueFrom))
+        if not arn_fields:
+            raise ValueError(f"Invalid ARN format: {secret_definition.valueFrom}")
+        secret_arn = arn_fields[0].groupdict()["secret_complete_arn"]
+        field = arn_fields[0].groupdict()["field"]
+    else:
+        raise Exception("Unsupported secret type")
+    return secret_arn, f"{secret_arn}:{field}::" if field else secret_arn
+
+
+def extract_health_check(raw_healthcheck):
+    command = split_if_str(raw_healthcheck.command)
+    if len(command) == 1:
+        command = ["CMD-SHELL", command[0]]
+    elif command[0] not in ("CMD", "CMD-SHELL"):
+        command = ["CMD", *command]
+    return {
+        "Command": command,
+        "Interval": raw_healthcheck.interval,
+        "Retries": raw_healthcheck.retries,
+        "StartPeriod": raw_healthcheck.start_period,
+        "Timeout": raw_healthcheck.timeout,
+    }
+
+
+def map_dependency_condition(condition_str):
+    if condition_str not in DEPENDENCY_CONDITIONS:
+        raise ValueError(f"Unrecognized dependency condition: {condition_str}")
+    return DEPENDENCY_CONDITIONS[condition_str]
+
+
+def create_ecs_service(
+    resources,
+    service_name,
+    subnet_ids,
+    cluster,
+    task_definition,
+    security_group,
+    task_role: NativeRole,
+    ecs_manifest,
+    target_group,
+    listener,
+):
+    service_name = f"{service_name}-service"
+    for statement in EXECUTE_COMMAND_STATEMENTS:
+        grant(task_role, statement)
+    depends_on = dict(task_role.resources)
+    properties = {
+        "Cluster": ref(cluster),
+        "DeploymentConfiguration": {
+            "Alarms": {"AlarmNames": [], "Enable": False, "Rollback": False},
+            "MaximumPercent": 200,
+            "MinimumHealthyPercent": 0,
+        },
+        "EnableECSManagedTags": False,
+        "EnableExecuteCommand": True,
+        "LaunchType": "FARGATE",
+        "NetworkConfiguration": {
+            "AwsvpcConfiguration": {
+                "AssignPublicIp": "DISABLED",
+                "SecurityGroups": [security_group],
+                "Subnets": subnet_ids,
+            }
+        },
+        "ServiceName": service_name,
+        "TaskDefinition": ref(task_definition),
+    }
+    if ecs_manifest.load_balancer:
+        default_container = get_default_container(ecs_manifest)
+        target_group_path, target_group_id = target_group
+        listener_path, listener_id = listener
+        properties["HealthCheckGracePeriodSeconds"] = 60
+        properties["LoadBalancers"] = [
+            {
+                "ContainerName": default_container.name,
+                "ContainerPort": int(default_container.ports[0].split(":")[1]),
+                "TargetGroupArn": ref(target_group_id),
+            }
+        ]
+        depends_on["/".join(target_group_path)] = target_group_id
+        depends_on["/".join(listener_path)] = listener_id
+    service = {
+        "Type": "AWS::ECS::Service",
+        "Properties": sorted_properties(properties),
+    }
+    if depends_on:
+        service["DependsOn"] = render_depends_on(depends_on)
+    resources[logical_id(service_name, "Service")] = service
+
+
+def schedule_rate(minutes: int) -> str:
+    for interval, unit in ((minutes / 1440, "day"), (minutes / 60, "hour")):
+        if interval.is_integer():
+            break
+    else:
+        interval, unit = minutes, "minute"
+    interval = int(interval)
+    return f"rate(1 {unit})" if interval == 1 else f"rate({interval} {unit}s)"
+
+
+def create_autodestroy(resources, service_name, deployment_timeout: int):
+    role_id = logical_id("AutoDestroy", "ServiceRole", "Resource")
+    policy_id = logical_id("AutoDestroy", "ServiceRole", "DefaultPolicy", "Resource")
+    function_id = logical_id("AutoDestroy", "Resource")
+    rule_id = logical_id("TimeToDestroy", "Resource")
+    function_unique_id = construct_unique_id(service_name, "AutoDestroy")
+    permission_id = logical_id("TimeToDestroy", f"AllowEventRule{function_unique_id}")
+    lambda_function_file = Path(__file__).parent.parent / "auto_destruction/harakiri.py"
+
+    resources[role_id] = {
+        "Type": "AWS::IAM::Role",
+        "Properties": {
+            "AssumeRolePolicyDocument": assume_role_policy_document(
+                "lambda.amazonaws.com"
+            ),
+            "ManagedPolicyArns": [
+                managed_policy_arn("service-role/AWSLambdaBasicExecutionRole")
+            ],
+        },
+    }
+    resources[policy_id] = {
+        "Type": "AWS::IAM::Policy",
+        "Properties": {
+            "PolicyDocument": policy_document(
+                [
+                    policy_statement(
+                        ["cloudformation:DeleteStack", "lambda:RemovePermission"],
+                        ["*"],
+                    )
+                ]
+            ),
+            "PolicyName": policy_id[-128:],
+            "Roles": [ref(role_id)],
+        },
+    }
+    resources[function_id] = {
+        "Type": "AWS::Lambda::Function",
+        "Properties": {
+            "Code": {"ZipFile": lambda_function_file.read_text()},
+            "Environment": {"Variables": {"StackName": service_name}},
+            "Handler": "index.handler",
+            "Role": get_att(role_id, "Arn"),
+            "Runtime": "python3.11",
+            "Timeout": 300,
+        },
+        "DependsOn": [policy_id, role_id],
+    }
+    resources[rule_id] = {
+        "Type": "AWS::Events::Rule",
+        "Properties": {
+            "ScheduleExpression": schedule_rate(deployment_timeout),
+            "State": "ENABLED",
+            "Targets": [{"Arn": get_att(function_id, "Arn"), "Id": "Target0"}],
+        },
+    }
+    resources[permission_id] = {
+        "Type": "AWS::Lambda::Permission",
+        "Properties": {
+            "Action": "lambda:InvokeFunction",
+            "FunctionName": get_att(function_id, "Arn"),
+            "Principal": "events.amazonaws.com",
+            "SourceArn": get_att(rule_id, "Arn"),
+        },
+    }
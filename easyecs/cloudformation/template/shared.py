@@ -0,0 +1,108 @@
+import copy
+from typing import Dict
+
+from easyecs.cloudformation.template.layered import filter_depends_on, parse_reference
+from easyecs.cloudformation.template.native import (
+    create_log_group,
+    get_att,
+    logical_id,
+    ref,
+)
+
+# Resources moved to the stack shared by the applications of a user.
+SHARED_RESOURCE_TYPES = ["AWS::ECS::Cluster", "AWS::Logs::LogGroup"]
+
+
+def get_shared_stack_name(user: str) -> str:
+    return f"{user}-easyecs-shared"
+
+
+def get_shared_cluster_name(user: str) -> str:
+    return f"{user}-cluster"
+
+
+def get_cluster_name(user: str, app_name: str, shared_cluster=False) -> str:
+    if shared_cluster:
+        return get_shared_cluster_name(user)
+    return f"{user}-{app_name}-cluster"
+
+
+def get_shared_export_name(user: str, name: str) -> str:
+    return f"{get_shared_stack_name(user)}:{name}"
+
+
+def create_shared_template(user: str) -> Dict:
+    """
+    Renders the stack shared by the applications of a user: an ECS cluster and
+    a log group in which every application logs under its own stream prefix.
+    """
+    resources = {}
+    cluster_id = logical_id("cluster", "Resource")
+    resources[cluster_id] = {
+        "Type": "AWS::ECS::Cluster",
+        "Properties": {"ClusterName": get_shared_cluster_name(user)},
+    }
+    log_group_id = create_log_group(resources, user)
+    outputs = {
+        "ClusterName": ref(cluster_id),
+        "ClusterArn": get_att(cluster_id, "Arn"),
+        "LogGroupName": ref(log_group_id),
+        "LogGroupArn": get_att(log_group_id, "Arn"),
+    }
+    return {
+        "Resources": resources,
+        "Outputs": {
+            name: {
+                "Value": value,
+                "Export": {"Name": get_shared_export_name(user, name)},
+            }
+            for name, value in outputs.items()
+        },
+    }
+
+
+def import_shared_references(value, shared_ids: Dict[str, str], user: str):
+    reference = parse_reference(value)
+    if reference and reference[0] in shared_ids:
+        resource_id, attribute = reference
+        name = f"{shared_ids[resource_id]}{attribute or 'Name'}"
+        return {"Fn::ImportValue": get_shared_export_name(user, name)}
+    if isinstance(value, dict):
+        return {
+            key: import_shared_references(item, shared_ids, user)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [import_shared_references(item, shared_ids, user) for item in value]
+    return value
+
+
+def share_template(template: Dict, user: str, app_name: str) -> Dict:
+    """
+    Removes the cluster and the log group from the template of an application,
+    which then runs its service in the cluster of the shared stack and logs
+    in its log group, under a stream prefix named after the application.
+    """
+    resources = template.get("Resources", {})
+    shared_ids = {
+        resource_id: (
+            "Cluster" if resource["Type"] == "AWS::ECS::Cluster" else "LogGroup"
+        )
+        for resource_id, resource in resources.items()
+        if resource["Type"] in SHARED_RESOURCE_TYPES
+    }
+    template = copy.deepcopy(template)
+    template["Resources"] = {}
+    for resource_id, resource in resources.items():
+        if resource_id in shared_ids:
+            continue
+        resource = import_shared_references(resource, shared_ids, user)
+        filter_depends_on(resource, set(resources) - set(shared_ids))
+        if resource["Type"] == "AWS::ECS::TaskDefinition":
+            for container_definition in resource["Properties"]["ContainerDefinitions"]:
+                log_configuration = container_definition.get("LogConfiguration", {})
+                options = log_configuration.get("Options", {})
+                if "awslogs-stream-prefix" in options:
+                    options["awslogs-stream-prefix"] = app_name
+        template["Resources"][resource_id] = resource
+    return template
@@ -1,6 +1,8 @@
 import re
 from easyecs.model.ecs import EcsFileSecretModel, EcsFileSecretModelV2
 
+SECRET_ARN_PATTERN = r"^^(?P<secret_complete_arn>arn:aws:secretsmanager:(?P<region_name>[a-z0-9-]+):(?P<account_id>\d{12}):secret:(?P<secret_name>[^:]+))(?::(?P<field>[^:]*))?(?::([^:]*))?(?::([^:]*))?$"  # noqa
+
 
 def create_task_definition(
     stack, service_name, task_role, execution_role, log_group, ecs_data, run=False
@@ -35,7 +37,10 @@ def create_fargate_task_definition(
     stack, service_name, task_role, execution_role, ecs_data
 ):
     from aws_cdk.aws_ecs import (
+        CpuArchitecture,
         FargateTaskDefinition,
+        OperatingSystemFamily,
+        RuntimePlatform,
     )
 
     """Create a Fargate task definition."""
@@ -55,6 +60,17 @@ def create_fargate_task_definition(
     if isinstance(ephemeral_storage, int):
         task_definition_kwargs["ephemeral_storage_gib"] = ephemeral_storage
 
+    architectures = ecs_data.task_definition.architectures
+    if architectures:
+        cpu_architecture = {
+            "x86_64": CpuArchitecture.X86_64,
+            "arm64": CpuArchitecture.ARM64,
+        }[architectures[0]]
+        task_definition_kwargs["runtime_platform"] = RuntimePlatform(
+            cpu_architecture=cpu_architecture,
+            operating_system_family=OperatingSystemFamily.LINUX,
+        )
+
     return FargateTaskDefinition(
         stack,
         task_definition_name,
@@ -182,10 +198,7 @@ def extract_secrets(stack, secret_definitions, container_name):
             secrets[secret_name] = ecs_secret
         elif isinstance(secret_definition, EcsFileSecretModelV2):
             arn_fields = list(
-                re.finditer(
-                    r"^^(?P<secret_complete_arn>arn:aws:secretsmanager:(?P<region_name>[a-z0-9-]+):(?P<account_id>\d{12}):secret:(?P<secret_name>[^:]+))(?::(?P<field>[^:]*))?(?::([^:]*))?(?::([^:]*))?$",  # noqa
-                    secret_definition.valueFrom,
-                )
+                re.finditer(SECRET_ARN_PATTERN, secret_definition.valueFrom)
             )
             if not arn_fields:
                 raise ValueError(f"Invalid ARN format: {secret_definition.valueFrom}")
@@ -1,12 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5
 import json
 import os
+import re
 import subprocess
-import time
 import boto3
 import signal
+import time
+from threading import Thread
 from watchdog.observers import Observer
 from easyecs.command.event.synchronize_event_handler import SynchronizeEventHandler
+from easyecs.command.process import ProcessManager, terminate_processes
 from easyecs.helpers.color import Color
 from easyecs.helpers.common import generate_random_port, is_port_in_use
 from easyecs.helpers.loader import Loader
@@ -18,39 +22,119 @@ threads = []
 event_handlers = []
 popen_procs_port_forward = []
 popen_procs_exec_command = []
+process_manager = ProcessManager()
+# Deployment configuration of the services updated outside CloudFormation. The
+# circuit breaker marks a deployment whose tasks keep failing as FAILED.
+DEPLOYMENT_CONFIGURATION = {
+    "minimumHealthyPercent": 0,
+    "deploymentCircuitBreaker": {"enable": True, "rollback": False},
+}
+
+
+def notify_unexpected_exit(tracked):
+    if not process_manager.closing:
+        print(
+            f"\n{Color.YELLOW}{tracked.name} exited unexpectedly with code"
+            f" {tracked.returncode} after {tracked.lifetime:.0f}s{Color.END}"
+        )
 
 
-def create_port_forwards(ecs_manifest, aws_region, aws_account, parsed_containers):
+def select_task_containers(tasks_containers, task_id=None):
+    """
+    Returns the task id and containers of the task to target, the first one if
+    no task id (or task id prefix) is given.
+    """
+    if task_id is None:
+        return next(iter(tasks_containers.items()))
+    for candidate_task_id, parsed_containers in tasks_containers.items():
+        if candidate_task_id.startswith(task_id):
+            return candidate_task_id, parsed_containers
+    raise Exception(
+        f"Task {task_id} not found, running tasks are:"
+        f" {', '.join(tasks_containers.keys())}"
+    )
+
+
+def allocate_local_ports(containers, task_count):
+    """
+    Returns the local port of every port forward of each task, by container
+    name and port forward. The first task gets the configured local ports.
+    The next tasks get, for each of them, the first following port that is
+    neither configured nor allocated yet, so that no two forwards collide.
+    """
+    configured_ports = {
+        int(container_port.split(":")[0])
+        for container in containers
+        for container_port in container.port_forward
+    }
+    allocated_ports = set(configured_ports)
+    tasks_local_ports = []
+    for task_index in range(task_count):
+        local_ports = {}
+        for container in containers:
+            for container_port in container.port_forward:
+                local_port = int(container_port.split(":")[0])
+                if task_index > 0:
+                    while local_port in allocated_ports:
+                        local_port += 1
+                    allocated_ports.add(local_port)
+                local_ports[(container.name, container_port)] = str(local_port)
+        tasks_local_ports.append(local_ports)
+    return tasks_local_ports
+
+
+def create_port_forwards(ecs_manifest, aws_region, aws_account, tasks_containers):
+    """
+    Creates the port forwards of every container on the given tasks. With
+    several tasks, the local ports are allocated by allocate_local_ports and
+    the ports of each task are printed.
+    """
     containers = ecs_manifest.task_definition.containers
-    for container in containers:
-        container_name = container.name
-        container_ports = container.port_forward
-        for container_port in container_ports:
-            from_port = container_port.split(":")[0]
-            to_port = container_port.split(":")[1]
-            loader = Loader(
-                f"Creating port forward on {container_name} container from"
-                f" {from_port} to {to_port}:",
-                f"Creating port forward on {container_name} container from"
-                f" {from_port} to {to_port}: \u2705",
-                f"Creating port forward on {container_name} container from"
-                f" {from_port} to {to_port}: \u274c",
-                0.05,
-            )
-            loader.start()
-            if not is_port_in_use(int(from_port)):
-                port_forward(
-                    parsed_containers,
-                    container_name,
-                    to_port,
-                    from_port,
-                    aws_region,
-                    aws_account,
+    tasks_local_ports = allocate_local_ports(containers, len(tasks_containers))
+    for (task_id, parsed_containers), local_ports in zip(
+        tasks_containers.items(), tasks_local_ports
+    ):
+        on_task = f" (task {task_id})" if len(tasks_containers) > 1 else ""
+        for container in containers:
+            container_name = container.name
+            container_ports = container.port_forward
+            for container_port in container_ports:
+                from_port = local_ports[(container_name, container_port)]
+                to_port = container_port.split(":")[1]
+                loader = Loader(
+                    f"Creating port forward on {container_name} container{on_task}"
+                    f" from {from_port} to {to_port}:",
+                    f"Creating port forward on {container_name} container{on_task}"
+                    f" from {from_port} to {to_port}: \u2705",
+                    f"Creating port forward on {container_name} container{on_task}"
+                    f" from {from_port} to {to_port}: \u274c",
+                    0.05,
                 )
-                loader.stop()
-            else:
-                loader.stop_error()
-                print(f"{Color.RED}Port {from_port} is already in use!{Color.END}")
+                loader.start()
+                if not is_port_in_use(int(from_port)):
+                    port_forward(
+                        parsed_containers,
+                        container_name,
+                        to_port,
+                        from_port,
+                        aws_region,
+                        aws_account,
+                    )
+                    loader.stop()
+                else:
+                    loader.stop_error()
+                    print(f"{Color.RED}Port {from_port} is already in use!{Color.END}")
+    if len(tasks_containers) > 1:
+        print_task_local_ports(tasks_containers, tasks_local_ports)
+
+
+def print_task_local_ports(tasks_containers, tasks_local_ports):
+    for task_id, local_ports in zip(tasks_containers, tasks_local_ports):
+        forwards = ", ".join(
+            f"{container_name} {container_port.split(':')[1]} on {local_port}"
+            for (container_name, container_port), local_port in local_ports.items()
+        )
+        print(f"{Color.GRAY}Task {task_id}: {forwards}{Color.END}")
 
 
 def port_forward(
@@ -84,28 +168,29 @@ def port_forward(
             stdout=subprocess.DEVNULL,
         )
         popen_procs_port_forward.append(process)
+        process_manager.track(
+            process,
+            f"Port forward on {container_name} container from {local_port_number} to"
+            f" {port_number}",
+            on_exit=notify_unexpected_exit,
+        )
 
 
-def run_sync_thread(parsed_containers, ecs_manifest):
-    containers = ecs_manifest.task_definition.containers
-    for container in containers:
-        if len(container.volumes) > 0:
-            observer = Observer()
-            container_name = container.name
-            for volume in container.volumes:
-                md5_volume = md5(volume.encode("utf-8")).hexdigest()
-                port = parsed_containers[container_name].get(
-                    f"netcat_port_{md5_volume}", None
-                )
-                _from, _ = volume.split(":")
-                event_handler = SynchronizeEventHandler(
-                    volume, port, container.volumes_excludes
-                )
-                event_handlers.append(event_handler)
-                observer.schedule(event_handler, _from, recursive=True)
-            observer.daemon = True
-            observer.start()
-            threads.append(observer)
+def run_sync_thread(parsed_containers, container):
+    observer = Observer()
+    container_name = container.name
+    for volume in container.volumes:
+        md5_volume = md5(volume.encode("utf-8")).hexdigest()
+        port = parsed_containers[container_name].get(f"netcat_port_{md5_volume}", None)
+        _from, _ = volume.split(":")
+        event_handler = SynchronizeEventHandler(
+            volume, port, container.volumes_excludes
+        )
+        event_handlers.append(event_handler)
+        observer.schedule(event_handler, _from, recursive=True)
+    observer.daemon = True
+    observer.start()
+    threads.append(observer)
 
 
 def execute_command(ecs_manifest, parsed_containers, aws_region, aws_account):
@@ -114,6 +199,7 @@ def execute_command(ecs_manifest, parsed_containers, aws_region, aws_account):
     ssm_client = boto3.client("ssm")
     found_tty = False
     tty_cmd = ""
+    tty_container_name = ""
     for container in containers:
         command = container.command
         tty = container.tty
@@ -140,6 +226,7 @@ def execute_command(ecs_manifest, parsed_containers, aws_region, aws_account):
             if tty:
                 found_tty = True
                 tty_cmd = cmd_container
+                tty_container_name = container_name
             else:
                 proc_nc_server = subprocess.Popen(
                     cmd_container,
@@ -147,15 +234,19 @@ def execute_command(ecs_manifest, parsed_containers, aws_region, aws_account):
                     start_new_session=True,
                 )
                 popen_procs_exec_command.append(proc_nc_server)
+                process_manager.track(
+                    proc_nc_server,
+                    f"Command on {container_name} container",
+                    on_exit=notify_unexpected_exit,
+                )
     if found_tty:
         for sig in catchable_sigs:
             signal.signal(sig, override_sigint)
-        proc_nc_server = subprocess.Popen(tty_cmd)
-        while True:
-            if not proc_nc_server.poll():
-                proc_nc_server.wait()
-                break
-            time.sleep(0.1)
+        proc_tty = subprocess.Popen(tty_cmd)
+        tracked_tty = process_manager.track(
+            proc_tty, f"Interactive session on {tty_container_name} container"
+        )
+        process_manager.wait(tracked_tty)
     return found_tty
 
 
@@ -171,129 +262,172 @@ def generate_ssm_cmd(ssm_nc_server, aws_region, aws_account, target):
     ]
 
 
-def run_nc_command(
-    parsed_containers, aws_region, aws_account, container_name, ecs_manifest
-):
-    containers = ecs_manifest.task_definition.containers
-    for container in containers:
-        if len(container.volumes) > 0:
-            for volume in container.volumes:
-                md5_volume = md5(volume.encode("utf-8")).hexdigest()
-                random_port = generate_random_port()
-                parsed_containers[container_name][
-                    f"netcat_port_{md5_volume}"
-                ] = random_port
-                port_forward(
-                    parsed_containers,
-                    container_name,
-                    random_port,
-                    random_port,
-                    aws_region,
-                    aws_account,
-                )
-                client = boto3.client("ssm")
-                target = parsed_containers.get(container_name)["ssm_target"]
-                command_server = [f"""
-                    bash -c '
-                        set -x
-                        set -u
-                        while true
-                        do
-                            RANDOM_PORT={random_port}
-                            RANDOM_NUMBER=$RANDOM
-                            nc -v -l ${{RANDOM_PORT}} > /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.tar.gz.tmp
-                            cp /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.tar.gz.tmp /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz
-                            rm /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.tar.gz.tmp
-                            fc=$(cat /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz | tar -ztf - | head -c1)
-                            if [ $fc = . ]
-                            then
-                                cat /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz | tar -xzf -
-                            else
-                                # cat /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz | tar -xzf - -C /
-                                tar -xzf /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz -C /
-                            fi
-                            rm /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz
-                        done'
-                    """]  # noqa
-                parameters_nc_server = {"command": command_server}
-                ssm_nc_server = client.start_session(
-                    Target=target,
-                    DocumentName="AWS-StartInteractiveCommand",
-                    Parameters=parameters_nc_server,
-                )
-                cmd_nc_server = generate_ssm_cmd(
-                    ssm_nc_server, aws_region, aws_account, target
-                )
-                DEBUG_EASYECS = os.environ.get("DEBUG_EASYECS", None)
-                stdout = None if DEBUG_EASYECS else subprocess.DEVNULL
-                proc_nc_server = subprocess.Popen(
-                    cmd_nc_server,
-                    start_new_session=True,
-                    stdin=subprocess.PIPE,
-                    stdout=stdout,
-                )
-                popen_procs_port_forward.append(proc_nc_server)
+# Seconds given to the bootstrap session to report its status, installing
+# netcat included.
+BOOTSTRAP_TIMEOUT = 180
+BOOTSTRAP_STATUS_PATTERN = re.compile(r"^EASYECS_BOOTSTRAP (\{.*\})\s*$")
 
 
-def install_netcat_command(target, aws_region, aws_account) -> None:
-    client = boto3.client("ssm")
-    commands_server = [["apt update"], ["apt install -y netcat-openbsd"]]
-    for command_server in commands_server:
-        parameters_nc_server = {"command": command_server}
-        ssm_nc_server = client.start_session(
-            Target=target,
-            DocumentName="AWS-StartInteractiveCommand",
-            Parameters=parameters_nc_server,
-        )
-        cmd_nc_server = [
-            "session-manager-plugin",
-            json.dumps(ssm_nc_server),
-            aws_region,
-            "StartSession",
-            aws_account,
-            json.dumps(dict(Target=target)),
-            "https://ssm.eu-west-1.amazonaws.com",
-        ]
-        DEBUG_EASYECS = os.environ.get("DEBUG_EASYECS", None)
-        stdout = None if DEBUG_EASYECS else subprocess.DEVNULL
-        subprocess.run(
-            cmd_nc_server,
-            start_new_session=True,
-            stdout=stdout,
-        )
+def generate_bootstrap_command(ports, auto_install_nc):
+    """
+    Generates the shell script run in a single SSM session on a container.
+    It probes netcat, installs it if allowed, starts one receiver per port
+    and reports its status on a single EASYECS_BOOTSTRAP line.
+    """
+    receivers = "\n".join([f"receive {port} &" for port in ports])
+    started_ports = ", ".join([str(port) for port in ports])
+    install = "1" if auto_install_nc else "0"
+    return f"""
+        bash -c '
+            set -u
+            receive() {{
+                RANDOM_PORT=$1
+                while true
+                do
+                    RANDOM_NUMBER=$RANDOM
+                    nc -v -l ${{RANDOM_PORT}} > /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.tar.gz.tmp
+                    cp /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.tar.gz.tmp /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz
+                    rm /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.tar.gz.tmp
+                    fc=$(cat /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz | tar -ztf - | head -c1)
+                    if [ $fc = . ]
+                    then
+                        cat /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz | tar -xzf -
+                    else
+                        tar -xzf /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz -C /
+                    fi
+                    rm /tmp/${{RANDOM_PORT}}.${{RANDOM_NUMBER}}.copy.tar.gz
+                done
+            }}
+            if command -v nc > /dev/null 2>&1
+            then
+                NC=present
+            elif [ {install} = 1 ] && apt update > /dev/null 2>&1 && apt install -y netcat-openbsd > /dev/null 2>&1
+            then
+                NC=installed
+            else
+                NC=missing
+            fi
+            if [ $NC = missing ]
+            then
+                echo "EASYECS_BOOTSTRAP {{\\"nc\\": \\"$NC\\", \\"ports\\": []}}"
+                exit 1
+            fi
+            {receivers}
+            echo "EASYECS_BOOTSTRAP {{\\"nc\\": \\"$NC\\", \\"ports\\": [{started_ports}]}}"
+            wait'
+    """  # noqa
+
+
+def parse_bootstrap_status(line):
+    """
+    Parses an EASYECS_BOOTSTRAP status line, returns None for any other line.
+    """
+    match = BOOTSTRAP_STATUS_PATTERN.match(line.strip("\r\n"))
+    if not match:
+        return None
+    return json.loads(match.group(1))
 
 
-def check_nc_command(target, aws_region, aws_account):
+def read_bootstrap_status(process, timeout=BOOTSTRAP_TIMEOUT):
+    """
+    Reads the bootstrap session output until its status line is found.
+    Returns None if the session ended without reporting a status, or did not
+    report it before the timeout, in which case the session is killed.
+    """
+    result = {}
+
+    def read_status():
+        for raw_line in iter(process.stdout.readline, b""):
+            line = raw_line.decode("utf8", errors="replace")
+            if os.environ.get("DEBUG_EASYECS", None):
+                print(line, end="")
+            status = parse_bootstrap_status(line)
+            if status is not None:
+                result["status"] = status
+                return
+
+    reader = Thread(target=read_status, daemon=True)
+    reader.start()
+    reader.join(timeout)
+    if reader.is_alive():
+        terminate_processes([process], time.monotonic())
+        return None
+    return result.get("status")
+
+
+def drain_output(process):
+    """
+    Keeps reading a session output so the receivers never block on a full pipe.
+    """
+    for raw_line in iter(process.stdout.readline, b""):
+        if os.environ.get("DEBUG_EASYECS", None):
+            print(raw_line.decode("utf8", errors="replace"), end="")
+
+
+def bootstrap_container(
+    parsed_containers, container, aws_region, aws_account, auto_install_nc
+):
+    """
+    Probes netcat, installs it if needed and starts every receiver of a
+    container in one SSM session, then opens the matching port forwards.
+    """
+    container_name = container.name
+    volume_ports = {}
+    for volume in container.volumes:
+        md5_volume = md5(volume.encode("utf-8")).hexdigest()
+        volume_ports[md5_volume] = generate_random_port()
     client = boto3.client("ssm")
-    command_server = ["which nc"]
-    parameters_nc_server = {"command": command_server}
-    ssm_nc_server = client.start_session(
+    target = parsed_containers.get(container_name)["ssm_target"]
+    command_server = [
+        generate_bootstrap_command(volume_ports.values(), auto_install_nc)
+    ]
+    ssm_bootstrap = client.start_session(
         Target=target,
         DocumentName="AWS-StartInteractiveCommand",
-        Parameters=parameters_nc_server,
+        Parameters={"command": command_server},
     )
-    cmd_nc_server = [
-        "session-manager-plugin",
-        json.dumps(ssm_nc_server),
-        aws_region,
-        "StartSession",
-        aws_account,
-        json.dumps(dict(Target=target)),
-        "https://ssm.eu-west-1.amazonaws.com",
-    ]
-    output = subprocess.check_output(cmd_nc_server, start_new_session=True)
-    return "/nc" in output.decode("utf8").split("\n")[2]
+    cmd_bootstrap = generate_ssm_cmd(ssm_bootstrap, aws_region, aws_account, target)
+    proc_bootstrap = subprocess.Popen(
+        cmd_bootstrap,
+        start_new_session=True,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    popen_procs_port_forward.append(proc_bootstrap)
+    status = read_bootstrap_status(proc_bootstrap) or {"nc": "failed", "ports": []}
+    if status["nc"] in ["missing", "failed"]:
+        return status
+    process_manager.track(
+        proc_bootstrap,
+        f"Synchronization receivers on {container_name} container",
+        on_exit=notify_unexpected_exit,
+    )
+    Thread(target=drain_output, args=(proc_bootstrap,), daemon=True).start()
+    for md5_volume, port in volume_ports.items():
+        parsed_containers[container_name][f"netcat_port_{md5_volume}"] = port
+        port_forward(
+            parsed_containers,
+            container_name,
+            port,
+            port,
+            aws_region,
+            aws_account,
+        )
+    return status
 
 
 def run_nc_commands(
-    parsed_containers, aws_region, aws_account, ecs_manifest, auto_install_nc
+    tasks_containers, aws_region, aws_account, ecs_manifest, auto_install_nc
 ):
+    """
+    Bootstraps the synchronization receivers of every container on all tasks
+    in parallel, then starts watching the local volumes for each of them.
+    """
     containers = ecs_manifest.task_definition.containers
     for container in containers:
         if len(container.volumes) > 0:
             container_name = container.name
-            parsed_container = parsed_containers.get(container_name)
-            ssm_target = parsed_container["ssm_target"]
             loader = Loader(
                 f"Running netcat command on container {container_name} for"
                 " synchronization:",
@@ -304,31 +438,63 @@ def run_nc_commands(
                 0.05,
             )
             loader.start()
-            has_nc = check_nc_command(ssm_target, aws_region, aws_account)
-            if not has_nc and not auto_install_nc:
+            with ThreadPoolExecutor(max_workers=len(tasks_containers)) as executor:
+                statuses = list(
+                    executor.map(
+                        lambda parsed_containers: bootstrap_container(
+                            parsed_containers,
+                            container,
+                            aws_region,
+                            aws_account,
+                            auto_install_nc,
+                        ),
+                        tasks_containers.values(),
+                    )
+                )
+            has_missing_nc = has_failed_bootstrap = False
+            for parsed_containers, status in zip(tasks_containers.values(), statuses):
+                if status["nc"] == "missing":
+                    has_missing_nc = True
+                elif status["nc"] == "failed":
+                    has_failed_bootstrap = True
+                else:
+                    run_sync_thread(parsed_containers, container)
+            if has_missing_nc or has_failed_bootstrap:
                 loader.stop_error()
+            else:
+                loader.stop()
+            if has_missing_nc:
                 print(
                     f"{Color.YELLOW}In order to use volumes on container"
                     f" {container_name}, you need to install netcat command on the"
                     " container and on the host machine!\nYou can try to install it on"
                     f" the container using --auto-install-nc{Color.END}"
                 )
-            else:
-                if not has_nc and auto_install_nc:
-                    install_netcat_command(ssm_target, aws_region, aws_account)
-                run_nc_command(
-                    parsed_containers,
-                    aws_region,
-                    aws_account,
-                    container_name,
-                    ecs_manifest,
+            if has_failed_bootstrap:
+                print(
+                    f"{Color.YELLOW}The session starting the synchronization"
+                    f" receivers of container {container_name} ended or timed out"
+                    f" after {BOOTSTRAP_TIMEOUT}s, its volumes are not"
+                    " synchronized!\nSet DEBUG_EASYECS=1 to see the output of the"
+                    f" session{Color.END}"
                 )
-                run_sync_thread(parsed_containers, ecs_manifest)
-                loader.stop()
 
 
-def run_force_new_deployment(stack_name):
-    cluster_name = f"{stack_name}-cluster"
+def synchronize_all():
+    """
+    Runs a first synchronization of every volume on every task in parallel.
+    """
+    if event_handlers:
+        with ThreadPoolExecutor(max_workers=len(event_handlers)) as executor:
+            list(
+                executor.map(
+                    lambda event_handler: event_handler.synchronize(), event_handlers
+                )
+            )
+
+
+def run_force_new_deployment(stack_name, cluster_name=None):
+    cluster_name = cluster_name or f"{stack_name}-cluster"
     service_name = f"{stack_name}-service"
     client = boto3.client("ecs")
     loader = Loader(
@@ -342,7 +508,7 @@ def run_force_new_deployment(stack_name):
         cluster=cluster_name,
         service=service_name,
         forceNewDeployment=True,
-        deploymentConfiguration={"minimumHealthyPercent": 0},
+        deploymentConfiguration=DEPLOYMENT_CONFIGURATION,
     )
     waiter = client.get_waiter("services_stable")
     waiter.wait(
@@ -0,0 +1,230 @@
+import copy
+import time
+from typing import Dict, Optional
+
+import boto3
+
+from easyecs.cloudformation.template.native import (
+    get_container_environment,
+    js_object_keys,
+)
+from easyecs.command import DEPLOYMENT_CONFIGURATION
+from easyecs.helpers.common import adaptive_delays
+from easyecs.model.ecs import EcsFileModel
+
+# Container fields a new task definition revision can change without going
+# through CloudFormation.
+FAST_PATH_CONTAINER_FIELDS = ["image", "env"]
+# Fields of describe_task_definition accepted back by register_task_definition.
+REGISTER_TASK_DEFINITION_FIELDS = [
+    "family",
+    "taskRoleArn",
+    "executionRoleArn",
+    "networkMode",
+    "containerDefinitions",
+    "volumes",
+    "placementConstraints",
+    "requiresCompatibilities",
+    "cpu",
+    "memory",
+    "pidMode",
+    "ipcMode",
+    "proxyConfiguration",
+    "inferenceAccelerators",
+    "ephemeralStorage",
+    "runtimePlatform",
+]
+
+
+def dump_deployed_manifest(ecs_manifest: EcsFileModel, run: bool) -> Dict:
+    return {"manifest": ecs_manifest.model_dump(mode="json"), "run": run}
+
+
+def strip_fast_path_fields(manifest: Dict) -> Dict:
+    manifest = copy.deepcopy(manifest)
+    for container in manifest["task_definition"]["containers"]:
+        for field in FAST_PATH_CONTAINER_FIELDS:
+            container.pop(field, None)
+    return manifest
+
+
+def find_fast_path_changes(
+    deployed_manifest: Optional[Dict], ecs_manifest: EcsFileModel, run: bool
+) -> Optional[Dict[str, object]]:
+    """
+    Compares the manifest with the last deployed one. When they only differ by
+    the image or the environment of some containers, returns those containers
+    by name, otherwise returns None and the stack goes through CloudFormation.
+    """
+    if not isinstance(deployed_manifest, dict) or deployed_manifest["run"] != run:
+        return None
+    manifest = ecs_manifest.model_dump(mode="json")
+    if strip_fast_path_fields(deployed_manifest["manifest"]) != strip_fast_path_fields(
+        manifest
+    ):
+        return None
+    deployed_containers = deployed_manifest["manifest"]["task_definition"]["containers"]
+    changes = {}
+    for deployed_container, container, container_model in zip(
+        deployed_containers,
+        manifest["task_definition"]["containers"],
+        ecs_manifest.task_definition.containers,
+    ):
+        if any(
+            deployed_container.get(field) != container.get(field)
+            for field in FAST_PATH_CONTAINER_FIELDS
+        ):
+            environment = get_container_environment(container_model)
+            # The ECS API only takes strings, such an env is left to the stack.
+            if not all(isinstance(value, str) for value in environment.values()):
+                return None
+            changes[container_model.name] = container_model
+    return changes or None
+
+
+def register_task_definition_revision(
+    task_definition_arn: str, changed_containers: Dict[str, object]
+) -> str:
+    """
+    Registers a revision of the task definition with the image and the
+    environment of the changed containers. Returns the revision ARN.
+    """
+    client = boto3.client("ecs")
+    response = client.describe_task_definition(
+        taskDefinition=task_definition_arn, include=["TAGS"]
+    )
+    task_definition = response["taskDefinition"]
+    kwargs = {
+        field: task_definition[field]
+        for field in REGISTER_TASK_DEFINITION_FIELDS
+        if field in task_definition
+    }
+    # Tags prefixed with aws:, e.g. the ones of CloudFormation, are reserved
+    # and rejected by register_task_definition.
+    tags = [
+        tag for tag in response.get("tags", []) if not tag["key"].startswith("aws:")
+    ]
+    if tags:
+        kwargs["tags"] = tags
+    for container_definition in kwargs["containerDefinitions"]:
+        container = changed_containers.get(container_definition["name"])
+        if container is None:
+            continue
+        environment = get_container_environment(container)
+        container_definition["image"] = container.image
+        container_definition["environment"] = [
+            {"name": name, "value": environment[name]}
+            for name in js_object_keys(environment)
+        ]
+    response = client.register_task_definition(**kwargs)
+    return response["taskDefinition"]["taskDefinitionArn"]
+
+
+def fetch_service(cluster_name: str, service_name: str) -> Dict:
+    client = boto3.client("ecs")
+    response = client.describe_services(cluster=cluster_name, services=[service_name])
+    return response["services"][0]
+
+
+def is_deployment_completed(service: Dict, task_definition_arn: str) -> bool:
+    """
+    The deployment is completed once the revision is the only one deployed
+    and runs the desired count of tasks. Raises as soon as a task of the
+    revision failed, while the previous deployment may still be running.
+    """
+    deployments = service["deployments"]
+    deployment = next(
+        (
+            deployment
+            for deployment in deployments
+            if deployment["taskDefinition"] == task_definition_arn
+        ),
+        None,
+    )
+    if deployment is None:
+        return False
+    if deployment.get("rolloutState") == "FAILED":
+        raise Exception(
+            "The deployment of the service failed:"
+            f" {deployment.get('rolloutStateReason')}"
+        )
+    if deployment.get("failedTasks", 0) > 0:
+        raise Exception(
+            f"The deployment of the service failed: {deployment['failedTasks']}"
+            " task(s) of the new task definition failed to start!"
+        )
+    return (
+        len(deployments) == 1 and deployment["runningCount"] == service["desiredCount"]
+    )
+
+
+def wait_for_service_deployment(
+    cluster_name: str, service_name: str, task_definition_arn: str, timeout=900
+):
+    """
+    Polls the service on an adaptive delay of at most 2 seconds, rather than
+    the fixed delay of the services_stable waiter.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in adaptive_delays(initial=0.5, maximum=2.0):
+        service = fetch_service(cluster_name, service_name)
+        if is_deployment_completed(service, task_definition_arn):
+            return
+        if time.monotonic() > deadline:
+            raise Exception(
+                f"The service {service_name} was not deployed after {timeout}s!"
+            )
+        time.sleep(delay)
+
+
+def update_service_task_definition(
+    stack_name: str, changed_containers: Dict[str, object], cluster_name=None
+):
+    """
+    Deploys the changed containers by registering a task definition revision
+    and updating the service with it, without CloudFormation.
+    """
+    cluster_name = cluster_name or f"{stack_name}-cluster"
+    service_name = f"{stack_name}-service"
+    service = fetch_service(cluster_name, service_name)
+    task_definition_arn = register_task_definition_revision(
+        service["taskDefinition"], changed_containers
+    )
+    client = boto3.client("ecs")
+    client.update_service(
+        cluster=cluster_name,
+        service=service_name,
+        taskDefinition=task_definition_arn,
+        deploymentConfiguration=DEPLOYMENT_CONFIGURATION,
+    )
+    wait_for_service_deployment(cluster_name, service_name, task_definition_arn)
+
+
+def fetch_stack_task_definition_arn(stack_name: str) -> Optional[str]:
+    client = boto3.client("cloudformation")
+    response = client.describe_stack_resources(StackName=stack_name)
+    for resource in response["StackResources"]:
+        if resource["ResourceType"] == "AWS::ECS::TaskDefinition":
+            return resource["PhysicalResourceId"]
+    return None
+
+
+def reconcile_service_task_definition(stack_name: str, cluster_name=None):
+    """
+    Puts the service back on the task definition managed by the stack, after
+    revisions were deployed without CloudFormation.
+    """
+    cluster_name = cluster_name or f"{stack_name}-cluster"
+    service_name = f"{stack_name}-service"
+    task_definition_arn = fetch_stack_task_definition_arn(stack_name)
+    service = fetch_service(cluster_name, service_name)
+    if task_definition_arn is None or service["taskDefinition"] == task_definition_arn:
+        return
+    client = boto3.client("ecs")
+    client.update_service(
+        cluster=cluster_name,
+        service=service_name,
+        taskDefinition=task_definition_arn,
+        deploymentConfiguration=DEPLOYMENT_CONFIGURATION,
+    )
+    wait_for_service_deployment(cluster_name, service_name, task_definition_arn)
@@ -0,0 +1,151 @@
+import os
+import selectors
+import signal
+import time
+from dataclasses import dataclass, field
+from subprocess import Popen, TimeoutExpired
+from threading import Event, Lock, Thread
+from typing import Callable, List, Optional
+
+
+@dataclass
+class TrackedProcess:
+    name: str
+    process: Popen
+    on_exit: Optional[Callable] = None
+    started_at: float = field(default_factory=time.monotonic)
+    ended_at: Optional[float] = None
+    exited: Event = field(default_factory=Event)
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    @property
+    def lifetime(self) -> float:
+        ended_at = self.ended_at if self.ended_at is not None else time.monotonic()
+        return ended_at - self.started_at
+
+
+def open_pidfd(process: Popen) -> Optional[int]:
+    """
+    Opens a file descriptor that becomes readable when the process exits.
+    Returns None when the platform does not support pidfd (macOS, old kernels).
+    """
+    if not hasattr(os, "pidfd_open"):
+        return None
+    try:
+        return os.pidfd_open(process.pid)
+    except (OSError, TypeError):
+        return None
+
+
+class ProcessManager:
+    def __init__(self):
+        """
+        Tracks every spawned session-manager-plugin process and gets notified
+        as soon as one exits, without polling.
+
+        On Linux all processes are watched by a single thread blocked on their
+        pidfds, elsewhere each process gets a thread blocked on wait().
+        """
+        self.processes: List[TrackedProcess] = []
+        self.closing = False
+        self._lock = Lock()
+        self._selector = None
+        self._watcher = None
+
+    def track(self, process: Popen, name: str, on_exit=None) -> TrackedProcess:
+        tracked = TrackedProcess(name=name, process=process, on_exit=on_exit)
+        with self._lock:
+            self.processes.append(tracked)
+        pidfd = open_pidfd(process)
+        if pidfd is None:
+            Thread(target=self._wait_blocking, args=(tracked,), daemon=True).start()
+        else:
+            self._start_watcher()
+            self._selector.register(pidfd, selectors.EVENT_READ, tracked)
+        return tracked
+
+    def wait(self, tracked: TrackedProcess, timeout=None) -> bool:
+        return tracked.exited.wait(timeout)
+
+    def running(self) -> List[TrackedProcess]:
+        with self._lock:
+            return [
+                tracked for tracked in self.processes if not tracked.exited.is_set()
+            ]
+
+    def lifetimes(self):
+        with self._lock:
+            return [
+                {
+                    "name": tracked.name,
+                    "pid": tracked.process.pid,
+                    "lifetime": round(tracked.lifetime, 3),
+                    "returncode": tracked.returncode,
+                    "running": not tracked.exited.is_set(),
+                }
+                for tracked in self.processes
+            ]
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is None:
+                self._selector = selectors.DefaultSelector()
+                self._watcher = Thread(target=self._watch_pidfds, daemon=True)
+                self._watcher.start()
+
+    def _watch_pidfds(self):
+        while True:
+            for key, _ in self._selector.select():
+                self._selector.unregister(key.fd)
+                os.close(key.fd)
+                self._mark_exited(key.data)
+
+    def _wait_blocking(self, tracked: TrackedProcess):
+        tracked.process.wait()
+        self._mark_exited(tracked)
+
+    def _mark_exited(self, tracked: TrackedProcess):
+        # The process has already exited, this only reaps it.
+        tracked.process.wait()
+        tracked.ended_at = time.monotonic()
+        tracked.exited.set()
+        if tracked.on_exit is not None:
+            tracked.on_exit(tracked)
+
+
+def wait_until(processes: List[Popen], deadline: float) -> List[Popen]:
+    """
+    Waits for all processes until a shared deadline and returns the ones still
+    running. They were all signalled beforehand, so they exit concurrently.
+    """
+    for process in processes:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            process.wait(timeout=remaining)
+        except TimeoutExpired:
+            pass
+    return [process for process in processes if process.poll() is None]
+
+
+def terminate_processes(
+    processes: List[Popen], deadline: float, escalation_timeout: float = 2
+):
+    """
+    Escalates to SIGTERM then SIGKILL on processes that did not exit by the
+    deadline after their graceful stop request.
+    """
+    alive = wait_until(processes, deadline)
+    for escalation in (signal.SIGTERM, signal.SIGKILL):
+        if not alive:
+            return
+        for process in alive:
+            try:
+                process.send_signal(escalation)
+            except ProcessLookupError:
+                pass
+        alive = wait_until(alive, time.monotonic() + escalation_timeout)
@@ -1,8 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+import hashlib
+import os
+import shlex
+import signal
+import shutil
 import subprocess
+from threading import Event, Lock
+from typing import Dict, List, Optional, Tuple
+
+from easyecs.docker.code_layer import (
+    compute_base_fingerprint,
+    get_code_files,
+    push_code_layer,
+)
+from easyecs.docker.fingerprint import (
+    compute_build_fingerprint,
+    load_image_fingerprint,
+    save_image_fingerprint,
+)
+from easyecs.docker.progress import BuildProgress, save_build_summary
+from easyecs.docker.registry import (
+    fetch_image_digests,
+    get_registry_credentials,
+    parse_image_name,
+    resolve_platform_manifest,
+)
+from easyecs.helpers.color import Color
 from easyecs.helpers.common import parse_dict_with_env_var
+from easyecs.helpers.exceptions import DockerBuildCancelledException
+
+# Number of images built and pushed at once.
+DEFAULT_DOCKER_PARALLELISM = 4
+BUILD_CACHE_DIR = ".tmp/buildcache"
+# Tag of the registry cache, pushed next to the image.
+REGISTRY_CACHE_TAG = "buildcache"
+# Docker platform of the images run by each CPU architecture of Fargate.
+PLATFORMS = {"x86_64": "linux/amd64", "arm64": "linux/arm64"}
+DEFAULT_PLATFORMS = [PLATFORMS["x86_64"]]
+COMPRESSIONS = ["gzip", "zstd"]
+
+
+@dataclass(frozen=True)
+class DockerBuildOptions:
+    parallelism: int = DEFAULT_DOCKER_PARALLELISM
+    # Pushes the image from buildx, rather than building it to the local
+    # image store then pushing it.
+    buildx_push: bool = False
+    # Builds and pushes the images even when their build context is unchanged.
+    rebuild: bool = False
+
+
+def get_image_repository(image_name):
+    """
+    Strips the tag and the digest of an image name.
+    """
+    repository = image_name.split("@", 1)[0]
+    name_start = repository.rfind("/") + 1
+    if ":" in repository[name_start:]:
+        repository = repository[: repository.rindex(":")]
+    return repository
+
+
+def get_build_cache(build, image_name):
+    """
+    Returns the --cache-from and --cache-to values of the build: the ones of
+    the manifest, or else the defaults of its cache preset.
+    The registry cache is pushed as an image manifest, the format ECR accepts.
+    """
+    cache_from, cache_to = list(build.cache_from), list(build.cache_to)
+    if build.cache == "registry":
+        cache_ref = f"{get_image_repository(image_name)}:{REGISTRY_CACHE_TAG}"
+        default_from = [f"type=registry,ref={cache_ref}"]
+        default_to = [
+            f"type=registry,ref={cache_ref},mode=max,image-manifest=true,"
+            "oci-mediatypes=true"
+        ]
+    elif build.cache == "local":
+        image_hash = hashlib.sha256(image_name.encode()).hexdigest()[:16]
+        cache_dir = os.path.join(BUILD_CACHE_DIR, image_hash)
+        default_from = [f"type=local,src={cache_dir}"]
+        default_to = [f"type=local,dest={cache_dir},mode=max"]
+    elif build.cache == "inline":
+        default_from = [f"type=registry,ref={image_name}"]
+        default_to = ["type=inline"]
+    else:
+        default_from, default_to = [], []
+    return cache_from or default_from, cache_to or default_to
+
+
+def get_build_platforms(architectures) -> List[str]:
+    return [PLATFORMS[architecture] for architecture in architectures] or list(
+        DEFAULT_PLATFORMS
+    )
 
 
-def docker_build_cmd(build, image_name):
+def docker_build_cmd(
+    build, image_name, push=False, platforms=DEFAULT_PLATFORMS, progress=None
+):
     dockerfile = build.dockerfile
     target = build.target
     if target:
@@ -17,52 +114,366 @@ def docker_build_cmd(build, image_name):
     build_cmd_params += ["-f", dockerfile] if dockerfile else []
     build_cmd_params += [target] if target else []
     build_cmd_params += [build_args_str] if build_args else []
-    build_cmd_params += ["--platform=linux/amd64", build.context]
+    cache_from, cache_to = get_build_cache(build, image_name)
+    build_cmd_params += [f"--cache-from={shlex.quote(value)}" for value in cache_from]
+    build_cmd_params += [f"--cache-to={shlex.quote(value)}" for value in cache_to]
+    if build.compression in COMPRESSIONS:
+        # Layers are only recompressed by the image exporter, pushing them.
+        build_cmd_params += [
+            f"--output=type=image,push={str(push).lower()},"
+            f"compression={build.compression},force-compression=true,"
+            "oci-mediatypes=true"
+        ]
+    elif push:
+        build_cmd_params += ["--push"]
+    build_cmd_params += [f"--progress={progress}"] if progress else []
+    build_cmd_params += [f"--platform={','.join(platforms)}", build.context]
 
     build_cmd = " ".join(build_cmd_params)
 
     return build_cmd
 
 
-def build_docker_image(ecs_manifest, show_docker_logs):
-    containers = ecs_manifest.task_definition.containers
-    for container in containers:
-        image_name = container.image
-        build = container.build
-        if build:
-            build_cmd = docker_build_cmd(build, image_name)
-            if show_docker_logs:
-                res = subprocess.Popen(
-                    build_cmd,
+def docker_push_cmd(image_name):
+    return f"docker push {image_name}"
+
+
+def soci_index_cmd(image_name, platforms=DEFAULT_PLATFORMS):
+    """
+    Pulls the pushed image in containerd, then creates and pushes its SOCI
+    index, which Fargate uses to lazy load the image.
+    """
+    credentials = get_registry_credentials(parse_image_name(image_name)[0])
+    user = f" --user {shlex.quote(credentials)}" if credentials else ""
+    platform = (
+        " --all-platforms" if len(platforms) > 1 else f" --platform {platforms[0]}"
+    )
+    image = shlex.quote(image_name)
+    return (
+        f"ctr image pull{user}{platform} {image}"
+        f" && soci create{platform} {image}"
+        f" && soci push{user}{platform} {image}"
+    )
+
+
+def docker_image_id(image_name) -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image_name],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def is_image_pushed(image_name, platform) -> bool:
+    """
+    Whether the registry already has the image built locally. The id of a
+    local image is the digest of its config, or of its manifest with the
+    containerd image store, both compared with the ones of the registry.
+    Any failure means the image has to be pushed.
+    """
+    image_id = docker_image_id(image_name)
+    if not image_id:
+        return False
+    try:
+        return image_id in fetch_image_digests(image_name, platform)
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=None)
+def is_rawjson_progress_supported() -> bool:
+    """
+    Whether buildx streams its progress as JSON lines, since its 0.14 release.
+    Checked once, from the progress modes listed by its help.
+    """
+    try:
+        result = subprocess.run(
+            ["docker", "buildx", "build", "--help"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return "rawjson" in result.stdout
+
+
+def check_soci_commands(builds):
+    if any(build.soci for build in builds) and not (
+        shutil.which("ctr") and shutil.which("soci")
+    ):
+        raise Exception(
+            "The ctr and soci commands are needed to generate SOCI indexes!"
+        )
+
+
+class DockerBuilds:
+    def __init__(
+        self,
+        show_docker_logs,
+        buildx_push=False,
+        rebuild=False,
+        platforms=DEFAULT_PLATFORMS,
+    ):
+        """
+        Runs the docker commands of the builds scheduled concurrently, prefixes
+        their logs with the name of the container and terminates them all as
+        soon as one of them fails.
+        """
+        self.show_docker_logs = show_docker_logs
+        # A multi-platform image does not fit in the local image store, buildx
+        # pushes its manifest list.
+        self.buildx_push = buildx_push or len(platforms) > 1
+        self.rebuild = rebuild
+        self.platforms = platforms
+        # Without it, the builds run as before, without their summaries.
+        self.rawjson_progress = is_rawjson_progress_supported()
+        # Container name -> "built", "already pushed", "code layer" or
+        # "unchanged".
+        self.results = {}
+        # Container names -> summary of the build of their image.
+        self.summaries = {}
+        self.cancelled = Event()
+        self._processes = []
+        self._lock = Lock()
+
+    def print_log(self, name, line):
+        with self._lock:
+            print(f"{Color.GRAY}[{name}]{Color.END} {line}", end="", flush=True)
+
+    def run(self, name, cmd, error_message, progress=None):
+        """
+        Runs a docker command. With a progress, the command streams the
+        BuildKit progress as JSON lines, which are folded into it and shown
+        as readable logs.
+        """
+        with self._lock:
+            if self.cancelled.is_set():
+                raise DockerBuildCancelledException(name)
+            if progress is not None or self.show_docker_logs:
+                process = subprocess.Popen(
+                    cmd,
                     shell=True,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True,
+                    errors="replace",
+                    # Its own process group, terminated along with the shell.
+                    start_new_session=True,
                 )
             else:
-                res = subprocess.Popen(
-                    build_cmd,
+                process = subprocess.Popen(
+                    cmd,
                     shell=True,
                     stderr=subprocess.DEVNULL,
                     stdout=subprocess.DEVNULL,
+                    start_new_session=True,
                 )
-            res.wait()
-            if res.poll() != 0:
-                raise Exception(
-                    "There was an issue building the docker image. Use"
-                    " --show-docker-logs to get more information!"
-                )
-            push_docker_image(image_name, show_docker_logs)
+            self._processes.append(process)
+        if progress is not None or self.show_docker_logs:
+            for line in process.stdout:
+                log_lines = progress.feed(line) if progress is not None else [line]
+                if self.show_docker_logs:
+                    for log_line in log_lines:
+                        self.print_log(name, log_line)
+        process.wait()
+        with self._lock:
+            self._processes.remove(process)
+        if self.cancelled.is_set():
+            raise DockerBuildCancelledException(name)
+        if process.returncode != 0:
+            raise Exception(error_message)
 
+    def cancel(self):
+        with self._lock:
+            self.cancelled.set()
+            for process in self._processes:
+                try:
+                    os.killpg(process.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
 
-def push_docker_image(image_name, show_docker_logs):
-    push_cmd = f"docker push {image_name}"
-    if show_docker_logs:
-        res = subprocess.Popen(push_cmd, shell=True)
-    else:
-        res = subprocess.Popen(
-            push_cmd, shell=True, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL
+    def build_and_push(self, names, build, image_name):
+        """
+        Pushes the image as soon as it is built, while the other builds go on,
+        unless buildx already pushed it. The build is skipped when the image
+        was already pushed from the same build context, and replaced by the
+        push of a code layer when only the code of the context changed.
+        """
+        name = ",".join(names)
+        pushed = load_image_fingerprint(image_name)
+        build_cmd = docker_build_cmd(build, image_name, platforms=self.platforms)
+        fingerprint, files = compute_build_fingerprint(
+            build, build_cmd, pushed["files"]
         )
-    res.wait()
-    if res.poll() != 0:
-        raise Exception(
-            "There was an issue pushing the docker image. Use --show-docker-logs to get"
-            " more information!"
+        if not self.rebuild and fingerprint == pushed["fingerprint"]:
+            self.results.update(dict.fromkeys(names, "unchanged"))
+            return
+        base = None
+        if build.code_layer and len(self.platforms) == 1:
+            base = {
+                "fingerprint": compute_base_fingerprint(build, build_cmd, files),
+                "code_files": get_code_files(files, build.code_layer),
+            }
+            if (
+                not self.rebuild
+                and pushed["base"]
+                and pushed["base"]["fingerprint"] == base["fingerprint"]
+            ):
+                try:
+                    push_code_layer(
+                        build, image_name, pushed["base"], base["code_files"]
+                    )
+                except Exception as error:
+                    # E.g. the base image expired from the registry.
+                    self.print_log(
+                        name, f"Falling back to a full build, the code layer: {error}\n"
+                    )
+                else:
+                    save_image_fingerprint(
+                        image_name, fingerprint, files, pushed["base"]
+                    )
+                    self.results.update(dict.fromkeys(names, "code layer"))
+                    return
+        # The image exporter compressing the layers pushes them itself.
+        buildx_push = self.buildx_push or build.compression is not None
+        progress = BuildProgress() if self.rawjson_progress else None
+        push = None
+        try:
+            self.run(
+                name,
+                docker_build_cmd(
+                    build,
+                    image_name,
+                    push=buildx_push,
+                    platforms=self.platforms,
+                    progress="rawjson" if progress is not None else None,
+                ),
+                f"There was an issue building the docker image of {name}. Use"
+                " --show-docker-logs to get more information!",
+                progress,
+            )
+            if buildx_push:
+                push = "buildx"
+            elif is_image_pushed(image_name, self.platforms[0]):
+                push = "skipped"
+            else:
+                self.run(
+                    name,
+                    docker_push_cmd(image_name),
+                    f"There was an issue pushing the docker image of {name}. Use"
+                    " --show-docker-logs to get more information!",
+                )
+                push = "pushed"
+        finally:
+            if progress is not None:
+                self.record_summary(names, image_name, progress, push)
+        if build.soci:
+            self.run(
+                name,
+                soci_index_cmd(image_name, self.platforms),
+                f"There was an issue generating the SOCI index of {name}. Use"
+                " --show-docker-logs to get more information!",
+            )
+        if base:
+            try:
+                base["manifest"] = resolve_platform_manifest(
+                    image_name, self.platforms[0]
+                )
+            except Exception:
+                base["manifest"] = None
+            if base["manifest"] is None:
+                base = None
+        save_image_fingerprint(image_name, fingerprint, files, base)
+        result = "already pushed" if push == "skipped" else "built"
+        self.results.update(dict.fromkeys(names, result))
+
+    def record_summary(self, names, image_name, progress, push):
+        summary = progress.summary()
+        if not summary["steps"]:
+            return
+        # How the image reached the registry: buildx, pushed, skipped or None
+        # when the build or the push failed.
+        summary["push"] = push
+        self.summaries[",".join(names)] = summary
+        save_build_summary(
+            {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "image": image_name,
+                "containers": names,
+                **summary,
+            }
         )
+
+
+def plan_docker_builds(containers) -> Dict[str, Tuple[List[str], object]]:
+    """
+    Groups the containers by image, so that an image shared by several
+    containers (e.g. an app and its worker) is only built and pushed once.
+    Returns the container names and the build, by image name.
+    """
+    plan = {}
+    for container in containers:
+        if container.image not in plan:
+            plan[container.image] = ([container.name], container.build)
+            continue
+        names, build = plan[container.image]
+        if build != container.build:
+            raise Exception(
+                f"Containers {names[0]} and {container.name} build the image"
+                f" {container.image} differently!"
+            )
+        names.append(container.name)
+    return plan
+
+
+def build_docker_image(
+    ecs_manifest,
+    show_docker_logs,
+    parallelism=DEFAULT_DOCKER_PARALLELISM,
+    buildx_push=False,
+    rebuild=False,
+    summaries=None,
+):
+    """
+    Builds and pushes the images of the containers, up to parallelism of them
+    at once. The summaries of the builds, by container names, are added to
+    summaries when given. The first failure cancels the other builds and is raised.
+    The images are built for the architectures of the task definition.
+    Returns whether each image was built, pushed as a code layer or
+    unchanged, by container name.
+    """
+    containers = [
+        container
+        for container in ecs_manifest.task_definition.containers
+        if container.build
+    ]
+    if not containers:
+        return {}
+    plan = plan_docker_builds(containers)
+    check_soci_commands(build for _, build in plan.values())
+    platforms = get_build_platforms(ecs_manifest.task_definition.architectures)
+    builds = DockerBuilds(show_docker_logs, buildx_push, rebuild, platforms)
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+        futures = [
+            executor.submit(builds.build_and_push, names, build, image_name)
+            for image_name, (names, build) in plan.items()
+        ]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            # Also on Ctrl+C, so that no docker command outlives easyecs.
+            builds.cancel()
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            if summaries is not None:
+                summaries.update(builds.summaries)
+    return builds.results
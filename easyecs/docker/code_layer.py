@@ -0,0 +1,129 @@
+import gzip
+import io
+import json
+import os
+import posixpath
+import tarfile
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from easyecs.docker.fingerprint import (
+    get_dockerignore_path,
+    hash_build,
+    read_dockerignore_patterns,
+)
+from easyecs.docker.registry import (
+    DOCKER_MANIFEST_TYPE,
+    INDEX_TYPES,
+    RegistryClient,
+    compute_digest,
+    parse_image_name,
+)
+
+DOCKER_LAYER_TYPE = "application/vnd.docker.image.rootfs.diff.tar.gzip"
+OCI_LAYER_TYPE = "application/vnd.oci.image.layer.v1.tar+gzip"
+CODE_LAYER_CREATED_BY = "easyecs code layer"
+
+
+def is_code_path(path: str, code_paths: List[str]) -> bool:
+    return any(
+        code_path == "." or path == code_path or path.startswith(f"{code_path}/")
+        for code_path in code_paths
+    )
+
+
+def get_code_files(files: Dict, code_layer) -> List[str]:
+    return sorted(path for path in files if is_code_path(path, code_layer.paths))
+
+
+def compute_base_fingerprint(build, build_cmd: str, files: Dict) -> str:
+    """
+    Hashes the build like compute_build_fingerprint, leaving out the files of
+    the code layer. While it does not change, only the code did.
+    """
+    patterns = read_dockerignore_patterns(get_dockerignore_path(build))
+    base_files = {
+        path: file
+        for path, file in files.items()
+        if not is_code_path(path, build.code_layer.paths)
+    }
+    return hash_build(build, build_cmd, patterns, base_files)
+
+
+def normalize_tarinfo(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+    # Owned by root, as the files copied by a Dockerfile COPY.
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ""
+    return tarinfo
+
+
+def create_code_layer(
+    context: str, destination: str, code_files: List[str], removed_files: List[str]
+) -> Tuple[bytes, str]:
+    """
+    Archives the code files under the destination, along with whiteouts
+    deleting the files removed since the base image was built.
+    Returns the gzipped layer and the digest of the tar, its diff id.
+    """
+    destination = destination.strip("/")
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        for path in code_files:
+            tar.add(
+                os.path.join(context, path),
+                arcname=posixpath.join(destination, path),
+                recursive=False,
+                filter=normalize_tarinfo,
+            )
+        for path in removed_files:
+            directory, name = posixpath.split(posixpath.join(destination, path))
+            whiteout = tarfile.TarInfo(posixpath.join(directory, f".wh.{name}"))
+            tar.addfile(normalize_tarinfo(whiteout))
+    layer = archive.getvalue()
+    return gzip.compress(layer, mtime=0), compute_digest(layer)
+
+
+def push_code_layer(build, image_name: str, base: Dict, code_files: List[str]) -> str:
+    """
+    Pushes the image as the base image plus a layer of the code files,
+    straight to the registry: only the layer, the image config and the
+    manifest are uploaded. Returns the digest of the manifest.
+    """
+    registry, repository, reference = parse_image_name(image_name)
+    client = RegistryClient(registry)
+    manifest, media_type, _ = client.get_manifest(repository, base["manifest"])
+    if media_type in INDEX_TYPES:
+        raise Exception(f"The base image of {image_name} is not a single manifest!")
+    removed_files = sorted(set(base["code_files"]) - set(code_files))
+    layer, diff_id = create_code_layer(
+        build.context, build.code_layer.destination, code_files, removed_files
+    )
+    config = json.loads(client.get_blob(repository, manifest["config"]["digest"]))
+    config["rootfs"]["diff_ids"].append(diff_id)
+    config.setdefault("history", []).append(
+        {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "created_by": CODE_LAYER_CREATED_BY,
+        }
+    )
+    config_blob = json.dumps(config, separators=(",", ":")).encode()
+    layer_type = (
+        DOCKER_LAYER_TYPE if media_type == DOCKER_MANIFEST_TYPE else OCI_LAYER_TYPE
+    )
+    manifest = {
+        **manifest,
+        "mediaType": media_type,
+        "config": {
+            **manifest["config"],
+            "digest": client.upload_blob(repository, config_blob),
+            "size": len(config_blob),
+        },
+        "layers": manifest["layers"] + [
+            {
+                "mediaType": layer_type,
+                "digest": client.upload_blob(repository, layer),
+                "size": len(layer),
+            }
+        ],
+    }
+    return client.put_manifest(repository, reference, manifest)
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+IMAGE_FINGERPRINT_DIR = ".tmp/images"
+
+
+def get_image_fingerprint_path(image_name: str) -> Path:
+    image_hash = hashlib.sha256(image_name.encode()).hexdigest()
+    return Path(IMAGE_FINGERPRINT_DIR) / f"{image_hash}.json"
+
+
+def load_image_fingerprint(image_name: str) -> Dict:
+    """
+    Returns the fingerprint of the last image pushed under that name, the
+    hashes of the files of its context by path, and the image code layers are
+    pushed on top of.
+    """
+    try:
+        with open(get_image_fingerprint_path(image_name)) as f:
+            return {"base": None, **json.load(f)}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"fingerprint": None, "files": {}, "base": None}
+
+
+def save_image_fingerprint(
+    image_name: str, fingerprint: str, files: Dict, base: Optional[Dict] = None
+):
+    os.makedirs(IMAGE_FINGERPRINT_DIR, exist_ok=True)
+    fingerprint_path = get_image_fingerprint_path(image_name)
+    partial_path = fingerprint_path.with_suffix(f".{os.getpid()}.partial")
+    with open(partial_path, "w") as f:
+        json.dump({"fingerprint": fingerprint, "files": files, "base": base}, f)
+    os.replace(partial_path, fingerprint_path)
+
+
+def get_dockerignore_path(build) -> Path:
+    """
+    BuildKit reads <Dockerfile>.dockerignore next to the Dockerfile first,
+    then the .dockerignore at the root of the context.
+    """
+    dockerfile_ignore_path = Path(f"{build.dockerfile}.dockerignore")
+    if dockerfile_ignore_path.is_file():
+        return dockerfile_ignore_path
+    return Path(build.context) / ".dockerignore"
+
+
+def read_dockerignore_patterns(dockerignore_path: Path) -> List[str]:
+    try:
+        lines = dockerignore_path.read_text().splitlines()
+    except FileNotFoundError:
+        return []
+    return [
+        line.strip()
+        for line in lines
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def compile_dockerignore_pattern(pattern: str) -> Tuple[re.Pattern, bool]:
+    """
+    Translates a .dockerignore pattern into a regex on the path relative to
+    the context: * and ? do not match /, ** matches any number of directories.
+    Returns the regex and whether the pattern is an exception (!).
+    """
+    exception = pattern.startswith("!")
+    if exception:
+        pattern = pattern[1:].strip()
+    pattern = os.path.normpath(pattern).lstrip("/")
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += pattern[i : end + 1].replace("[!", "[^", 1)
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex += re.escape(pattern[i])
+        else:
+            regex += re.escape(char)
+        i += 1
+    return re.compile(f"^{regex}$"), exception
+
+
+def is_ignored(path: str, patterns: List[Tuple[re.Pattern, bool]]) -> bool:
+    """
+    A path is ignored when the last pattern matching it, or one of its parent
+    directories, is not an exception.
+    """
+    parents = path.split("/")
+    candidates = ["/".join(parents[: i + 1]) for i in range(len(parents))]
+    ignored = False
+    for regex, exception in patterns:
+        if any(regex.match(candidate) for candidate in candidates):
+            ignored = not exception
+    return ignored
+
+
+def list_context_files(context: str, patterns: List[str]) -> List[str]:
+    """
+    Lists the files of the context sent to the builder, relative to it.
+    """
+    compiled_patterns = [compile_dockerignore_pattern(pattern) for pattern in patterns]
+    has_exceptions = any(exception for _, exception in compiled_patterns)
+    # The state of easyecs, these fingerprints included, is not an input of
+    # the image even when it lies in the context.
+    state_dir = os.path.abspath(os.path.dirname(IMAGE_FINGERPRINT_DIR))
+    files = []
+    for root, dirs, filenames in os.walk(context):
+        relative_root = os.path.relpath(root, context)
+        relative_root = "" if relative_root == "." else f"{relative_root}/"
+        dirs[:] = [
+            name
+            for name in dirs
+            if os.path.abspath(os.path.join(root, name)) != state_dir
+        ]
+        # An exception may re-include a file of an ignored directory.
+        if not has_exceptions:
+            dirs[:] = [
+                name
+                for name in dirs
+                if not is_ignored(f"{relative_root}{name}", compiled_patterns)
+            ]
+        for name in filenames + [
+            name for name in dirs if os.path.islink(os.path.join(root, name))
+        ]:
+            path = f"{relative_root}{name}"
+            if not is_ignored(path, compiled_patterns):
+                files.append(path)
+    return sorted(files)
+
+
+def hash_file(path: Path) -> str:
+    if path.is_symlink():
+        return hashlib.sha256(os.readlink(path).encode()).hexdigest()
+    hash_sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hash_sha256.update(chunk)
+    return hash_sha256.hexdigest()
+
+
+def hash_optional_file(path: Path) -> Optional[str]:
+    try:
+        return hash_file(path)
+    except FileNotFoundError:
+        return None
+
+
+def hash_context_files(context: str, patterns: List[str], cached_files: Dict) -> Dict:
+    """
+    Hashes the files of the context by path, along with their mode. A file
+    whose size and modification time did not change keeps its cached hash.
+    """
+    files = {}
+    for path in list_context_files(context, patterns):
+        file_path = Path(context) / path
+        stat = file_path.lstat()
+        cached = cached_files.get(path)
+        if cached and cached[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_mode]:
+            files[path] = cached
+        else:
+            files[path] = [
+                stat.st_size,
+                stat.st_mtime_ns,
+                stat.st_mode,
+                hash_file(file_path),
+            ]
+    return files
+
+
+def hash_build(build, build_cmd: str, patterns: List[str], files: Dict) -> str:
+    payload = {
+        "build_cmd": build_cmd,
+        "code_layer": build.code_layer.model_dump() if build.code_layer else None,
+        "dockerfile": hash_optional_file(Path(build.dockerfile)),
+        "dockerignore": patterns,
+        "files": {path: [file[2], file[3]] for path, file in files.items()},
+        "soci": build.soci,
+    }
+    canonical_payload = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical_payload.encode()).hexdigest()
+
+
+def compute_build_fingerprint(
+    build, build_cmd: str, cached_files: Dict
+) -> Tuple[str, Dict]:
+    """
+    Hashes everything the image is built from: the build command (image name,
+    Dockerfile path, target, build args and platform), the Dockerfile, the
+    .dockerignore and the files of the context it lets through.
+    Returns the fingerprint and the hashes of the files of the context.
+    """
+    dockerignore_path = get_dockerignore_path(build)
+    patterns = read_dockerignore_patterns(dockerignore_path)
+    files = hash_context_files(build.context, patterns, cached_files)
+    return hash_build(build, build_cmd, patterns, files), files
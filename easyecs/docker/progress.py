@@ -0,0 +1,156 @@
+import base64
+import json
+import os
+import re
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional
+
+BUILD_SUMMARIES_PATH = ".tmp/builds.jsonl"
+
+_summaries_lock = Lock()
+
+
+def parse_timestamp(timestamp: Optional[str]) -> Optional[datetime]:
+    """
+    Parses the RFC 3339 timestamps of BuildKit, down to the microsecond.
+    """
+    if not timestamp:
+        return None
+    timestamp = re.sub(r"(\.\d{6})\d+", r"\1", timestamp).replace("Z", "+00:00")
+    return datetime.fromisoformat(timestamp)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1000 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+
+
+class BuildProgress:
+    def __init__(self):
+        """
+        Folds the --progress=rawjson stream of BuildKit, one solve status per
+        line, into the duration of each step of the build, whether it was
+        cached, and the bytes pushed.
+        """
+        # Vertex digest -> last state of the vertex.
+        self.vertexes = {}
+        # (vertex digest, status id) -> bytes of a pushed blob.
+        self.pushes = {}
+
+    def feed(self, line: str) -> List[str]:
+        """
+        Updates the progress with a line of the stream. Returns the lines to
+        show to the user: the steps started and completed, and their logs.
+        """
+        try:
+            status = json.loads(line)
+        except json.JSONDecodeError:
+            return [line]
+        if not isinstance(status, dict):
+            return [line]
+        lines = []
+        for vertex in status.get("vertexes") or []:
+            previous = self.vertexes.get(vertex["digest"], {})
+            self.vertexes[vertex["digest"]] = {**previous, **vertex}
+            if vertex.get("cached") and not previous.get("cached"):
+                lines.append(f"CACHED {vertex['name']}\n")
+            elif vertex.get("started") and not previous.get("started"):
+                lines.append(f"=> {vertex['name']}\n")
+            if vertex.get("error") and not previous.get("error"):
+                lines.append(f"ERROR {vertex['name']}: {vertex['error']}\n")
+        for item in status.get("statuses") or []:
+            vertex = self.vertexes.get(item.get("vertex"), {})
+            if vertex.get("name", "").startswith("pushing"):
+                key = (item["vertex"], item["id"])
+                size = item.get("total") or item.get("current") or 0
+                self.pushes[key] = max(self.pushes.get(key, 0), size)
+        for log in status.get("logs") or []:
+            data = base64.b64decode(log.get("data") or "")
+            lines += data.decode(errors="replace").splitlines(keepends=True)
+        return lines
+
+    def steps(self) -> List[Dict]:
+        steps = []
+        for vertex in self.vertexes.values():
+            started = parse_timestamp(vertex.get("started"))
+            completed = parse_timestamp(vertex.get("completed"))
+            duration = (
+                (completed - started).total_seconds() if started and completed else 0
+            )
+            steps.append(
+                {
+                    "name": vertex["name"],
+                    "started": started,
+                    "duration": duration,
+                    "cached": bool(vertex.get("cached")),
+                }
+            )
+        steps.sort(
+            key=lambda step: (
+                step["started"] is None,
+                step["started"].timestamp() if step["started"] else 0,
+            )
+        )
+        return [
+            {key: value for key, value in step.items() if key != "started"}
+            for step in steps
+        ]
+
+    def summary(self) -> Dict:
+        steps = self.steps()
+        started = [
+            parse_timestamp(vertex["started"])
+            for vertex in self.vertexes.values()
+            if vertex.get("started")
+        ]
+        completed = [
+            parse_timestamp(vertex["completed"])
+            for vertex in self.vertexes.values()
+            if vertex.get("completed")
+        ]
+        duration = (
+            (max(completed) - min(started)).total_seconds()
+            if started and completed
+            else 0
+        )
+        return {
+            "duration": duration,
+            "steps": steps,
+            "cached_steps": sum(step["cached"] for step in steps),
+            "pushed_bytes": sum(self.pushes.values()),
+        }
+
+
+def format_build_summary(name: str, summary: Dict) -> str:
+    """
+    Sums up the build of an image on a single line.
+    """
+    parts = [
+        f"{summary['duration']:.1f}s",
+        f"{summary['cached_steps']}/{len(summary['steps'])} steps cached",
+    ]
+    if summary["pushed_bytes"]:
+        parts.append(f"{format_bytes(summary['pushed_bytes'])} pushed")
+    if summary.get("push") == "skipped":
+        parts.append("push skipped, already in the registry")
+    uncached_steps = [step for step in summary["steps"] if not step["cached"]]
+    if uncached_steps:
+        slowest_step = max(uncached_steps, key=lambda step: step["duration"])
+        parts.append(
+            f"slowest step: {slowest_step['name']} ({slowest_step['duration']:.1f}s)"
+        )
+    return f"{name}: {', '.join(parts)}"
+
+
+def save_build_summary(summary: Dict):
+    """
+    Appends the summary of a build to a JSON lines file, one build per line,
+    to follow the build times across runs.
+    """
+    with _summaries_lock:
+        os.makedirs(os.path.dirname(BUILD_SUMMARIES_PATH), exist_ok=True)
+        with open(BUILD_SUMMARIES_PATH, "a") as f:
+            f.write(json.dumps(summary) + "\n")
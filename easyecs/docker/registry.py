@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import json
+import re
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Optional, Set, Tuple
+
+import boto3
+
+DOCKER_MANIFEST_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+DOCKER_MANIFEST_LIST_TYPE = "application/vnd.docker.distribution.manifest.list.v2+json"
+OCI_MANIFEST_TYPE = "application/vnd.oci.image.manifest.v1+json"
+OCI_INDEX_TYPE = "application/vnd.oci.image.index.v1+json"
+MANIFEST_TYPES = [
+    DOCKER_MANIFEST_TYPE,
+    OCI_MANIFEST_TYPE,
+    DOCKER_MANIFEST_LIST_TYPE,
+    OCI_INDEX_TYPE,
+]
+INDEX_TYPES = [DOCKER_MANIFEST_LIST_TYPE, OCI_INDEX_TYPE]
+DOCKER_HUB_REGISTRY = "registry-1.docker.io"
+ECR_REGISTRY_PATTERN = r"^\d{12}\.dkr\.ecr\.([a-z0-9-]+)\.amazonaws\.com$"
+
+
+def parse_image_name(image_name: str) -> Tuple[str, str, str]:
+    """
+    Splits an image name into its registry, its repository and its reference,
+    a digest or a tag.
+    """
+    registry, _, repository = image_name.partition("/")
+    if not repository or not (
+        "." in registry or ":" in registry or registry == "localhost"
+    ):
+        registry, repository = DOCKER_HUB_REGISTRY, image_name
+        if "/" not in repository:
+            repository = f"library/{repository}"
+    if "@" in repository:
+        repository, reference = repository.split("@", 1)
+    elif ":" in repository:
+        repository, reference = repository.rsplit(":", 1)
+    else:
+        reference = "latest"
+    return registry, repository, reference
+
+
+def get_registry_token(registry: str) -> Optional[str]:
+    """
+    Returns the base64 encoded user:password of an ECR registry, None for
+    other registries.
+    """
+    match = re.match(ECR_REGISTRY_PATTERN, registry)
+    if not match:
+        return None
+    client = boto3.client("ecr", region_name=match.group(1))
+    response = client.get_authorization_token()
+    return response["authorizationData"][0]["authorizationToken"]
+
+
+def get_registry_authorization(registry: str) -> Optional[str]:
+    token = get_registry_token(registry)
+    return f"Basic {token}" if token else None
+
+
+def get_registry_credentials(registry: str) -> Optional[str]:
+    token = get_registry_token(registry)
+    return base64.b64decode(token).decode() if token else None
+
+
+def compute_digest(data: bytes) -> str:
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+class RegistryClient:
+    def __init__(self, registry: str):
+        """
+        Talks to a registry through its HTTP API, without the docker daemon.
+        ECR is authenticated with the AWS credentials, other registries are
+        accessed anonymously.
+        """
+        self.registry = registry
+        scheme = (
+            "http" if registry.split(":")[0] in ["localhost", "127.0.0.1"] else "https"
+        )
+        self.base_url = f"{scheme}://{registry}"
+        self.authorization = get_registry_authorization(registry)
+
+    def request(self, method, url, data=None, headers=None):
+        url = urllib.parse.urljoin(self.base_url, url)
+        request = urllib.request.Request(
+            url, data=data, headers=headers or {}, method=method
+        )
+        if self.authorization:
+            # Not forwarded on redirects: ECR redirects blob downloads to S3,
+            # which rejects requests carrying a second authorization.
+            request.add_unredirected_header("Authorization", self.authorization)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as error:
+            if method == "HEAD" and error.code == 404:
+                return error.code, error.headers, b""
+            raise Exception(
+                f"The registry {self.registry} answered {error.code} to"
+                f" {method} {urllib.parse.urlparse(url).path}!"
+            )
+
+    def get_manifest(self, repository: str, reference: str) -> Tuple[Dict, str, str]:
+        """
+        Returns the manifest, its media type and its digest.
+        """
+        _, headers, body = self.request(
+            "GET",
+            f"/v2/{repository}/manifests/{reference}",
+            headers={"Accept": ", ".join(MANIFEST_TYPES)},
+        )
+        manifest = json.loads(body)
+        media_type = manifest.get("mediaType") or headers.get_content_type()
+        return manifest, media_type, compute_digest(body)
+
+    def put_manifest(self, repository: str, reference: str, manifest: Dict) -> str:
+        body = json.dumps(manifest, separators=(",", ":")).encode()
+        self.request(
+            "PUT",
+            f"/v2/{repository}/manifests/{reference}",
+            data=body,
+            headers={"Content-Type": manifest["mediaType"]},
+        )
+        return compute_digest(body)
+
+    def get_blob(self, repository: str, digest: str) -> bytes:
+        _, _, body = self.request("GET", f"/v2/{repository}/blobs/{digest}")
+        return body
+
+    def blob_exists(self, repository: str, digest: str) -> bool:
+        status, _, _ = self.request("HEAD", f"/v2/{repository}/blobs/{digest}")
+        return status == 200
+
+    def upload_blob(self, repository: str, data: bytes) -> str:
+        """
+        Uploads a blob in a single request, unless the registry already has it.
+        Returns its digest.
+        """
+        digest = compute_digest(data)
+        if self.blob_exists(repository, digest):
+            return digest
+        _, headers, _ = self.request("POST", f"/v2/{repository}/blobs/uploads/")
+        location = headers["Location"]
+        separator = "&" if "?" in location else "?"
+        self.request(
+            "PUT",
+            f"{location}{separator}digest={urllib.parse.quote(digest)}",
+            data=data,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        return digest
+
+
+def select_platform_manifest(index: Dict, platform: str) -> Optional[str]:
+    """
+    Returns the digest of the manifest of an index for a platform, e.g.
+    linux/arm64, skipping the attestations buildx pushes along with it.
+    """
+    os_name, architecture = platform.split("/")[:2]
+    for descriptor in index["manifests"]:
+        descriptor_platform = descriptor.get("platform", {})
+        if (
+            descriptor_platform.get("os") == os_name
+            and descriptor_platform.get("architecture") == architecture
+        ):
+            return descriptor["digest"]
+    return None
+
+
+def resolve_platform_manifest(image_name: str, platform: str) -> Optional[str]:
+    """
+    Returns the digest of the manifest of the image for a platform, None when
+    its index holds no manifest for that platform.
+    """
+    registry, repository, reference = parse_image_name(image_name)
+    client = RegistryClient(registry)
+    manifest, media_type, digest = client.get_manifest(repository, reference)
+    if media_type not in INDEX_TYPES:
+        return digest
+    return select_platform_manifest(manifest, platform)
+
+
+def fetch_image_digests(image_name: str, platform: str) -> Set[str]:
+    """
+    Returns the digests identifying the image in the registry: the one of its
+    manifest, of its index if any, and of its config.
+    """
+    registry, repository, reference = parse_image_name(image_name)
+    client = RegistryClient(registry)
+    manifest, media_type, digest = client.get_manifest(repository, reference)
+    digests = {digest}
+    if media_type in INDEX_TYPES:
+        digest = select_platform_manifest(manifest, platform)
+        if digest is None:
+            return digests
+        manifest, _, digest = client.get_manifest(repository, digest)
+        digests.add(digest)
+    digests.add(manifest["config"]["digest"])
+    return digests
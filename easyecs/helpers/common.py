@@ -1,8 +1,6 @@
-import json
 import os
 import random
 import re
-from typing import Dict
 import boto3
 import socket
 from botocore.exceptions import UnauthorizedSSOTokenError
@@ -10,14 +8,6 @@ from botocore.exceptions import UnauthorizedSSOTokenError
 from easyecs.helpers.color import Color
 
 
-def load_template(stack_name: str) -> Dict:
-    """
-    Loads the CloudFormation template from a JSON file.
-    """
-    with open(f".cloudformation/{stack_name}.template.json") as f:
-        return json.load(f)
-
-
 def template_with_env_var(value: str) -> str:
     template_pattern = r"{{.[^}]+}}"
     tpl_values = re.findall(template_pattern, value)
@@ -79,6 +69,16 @@ def check_credentials() -> None:
         exit(-1)
 
 
+def adaptive_delays(initial=0.5, factor=1.5, maximum=5.0):
+    """
+    Yields polling delays that start short and grow up to a maximum.
+    """
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
 def generate_random_port():
     random_port = random.randint(1024, 65535)
     while is_port_in_use(random_port):
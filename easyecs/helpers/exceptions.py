@@ -4,3 +4,15 @@ class FileNotFoundException(Exception):
 
 class TTYContainerWithoutTTYCommandException(Exception):
     pass
+
+
+class UnsupportedNativeTemplateException(Exception):
+    pass
+
+
+class StackDeploymentException(Exception):
+    pass
+
+
+class DockerBuildCancelledException(Exception):
+    pass
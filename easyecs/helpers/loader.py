@@ -23,6 +23,7 @@ class Loader:
         self.timeout = timeout
         self.time = 0
         self.metadata = None
+        self.status = None
 
         self._thread = Thread(target=self._animate, daemon=True)
         self.steps = ["⢿", "⣻", "⣽", "⣾", "⣷", "⣯", "⣟", "⡿"]
@@ -37,8 +38,11 @@ class Loader:
             if self.done:
                 break
             if not self.metadata:
+                status = f" {self.status}" if self.status else ""
+                # Erases the end of the line, left over by a longer status.
                 print(
-                    f"\r{self.desc} {c} {Color.GRAY}[{floor(self.time)}s]{Color.END}",
+                    f"\r{self.desc} {c} {Color.GRAY}[{floor(self.time)}s]"
+                    f"{status}{Color.END}\033[K",
                     flush=True,
                     end="",
                 )
@@ -54,6 +58,9 @@ class Loader:
     def set_metadata(self, metadata):
         self.metadata = metadata
 
+    def set_status(self, status):
+        self.status = status
+
     def stop(self):
         self.done = True
         cols = get_terminal_size((80, 20)).columns
@@ -67,10 +67,48 @@ def delete_hash(aws_account):
     with open(".tmp/easyecs.tmp", "r") as f:
         cache_configuration = json.load(f)
     cache_configuration[aws_account]["sha256"] = None
+    cache_configuration[aws_account]["manifest"] = None
+    cache_configuration[aws_account]["reconcile"] = False
     with open(".tmp/easyecs.tmp", "w") as f:
         json.dump(cache_configuration, f)
 
 
+def save_deployed_manifest(aws_account, deployed_manifest, reconcile: bool):
+    """
+    Saves the manifest the service was last deployed with, and whether it was
+    deployed without CloudFormation which then has to be reconciled.
+    """
+    with open(".tmp/easyecs.tmp", "r") as f:
+        cache_configuration = json.load(f)
+    cache_configuration[aws_account]["manifest"] = deployed_manifest
+    cache_configuration[aws_account]["reconcile"] = reconcile
+    with open(".tmp/easyecs.tmp", "w") as f:
+        json.dump(cache_configuration, f)
+
+
+def save_image_pull(app_name, image_pull, max_pulls=20):
+    """
+    Records the duration of the image pull of the tasks of the application,
+    when they were started by a new deployment. Returns the previous pull.
+    """
+    pulls_path = ".tmp/image_pulls.json"
+    try:
+        with open(pulls_path, "r") as f:
+            image_pulls = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        image_pulls = {}
+    app_pulls = image_pulls.get(app_name, [])
+    started_at, duration = image_pull
+    if app_pulls and app_pulls[-1]["started_at"] == started_at:
+        return app_pulls[-2] if len(app_pulls) > 1 else None
+    pull = {"started_at": started_at, "duration": duration}
+    image_pulls[app_name] = (app_pulls + [pull])[-max_pulls:]
+    os.makedirs(".tmp", exist_ok=True)
+    with open(pulls_path, "w") as f:
+        json.dump(image_pulls, f)
+    return app_pulls[-1] if app_pulls else None
+
+
 def load_settings(aws_account):
     try:
         os.makedirs(".tmp", exist_ok=True)
@@ -98,6 +136,8 @@ def load_settings(aws_account):
         subnet_ids = fetch_container_subnet_ids(vpc_id)
 
     hash_sha256 = account_cache_configuration.get("sha256", None)
+    deployed_manifest = account_cache_configuration.get("manifest", None)
+    reconcile = account_cache_configuration.get("reconcile", False)
 
     cache_configuration[aws_account] = {
         "aws_region": aws_region,
@@ -106,6 +146,8 @@ def load_settings(aws_account):
         "subnet_ids": subnet_ids,
         "azs": azs,
         "sha256": hash_sha256,
+        "manifest": deployed_manifest,
+        "reconcile": reconcile,
     }
 
     print(
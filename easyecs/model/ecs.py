@@ -1,6 +1,6 @@
 import os
 import re
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel, computed_field, field_validator, model_validator
 from pathlib import Path
 
@@ -11,6 +11,16 @@ class EcsFileMetadataModel(BaseModel):
     appname: str
     user: str = os.environ["USER"]
     auto_destruction: Optional[int] = None
+    layered_stacks: bool = False
+    shared_cluster: bool = False
+
+    @model_validator(mode="after")
+    def validate_layered_stacks(self):
+        # The auto destruction only deletes its own stack, it would leave the
+        # base stack behind.
+        if self.layered_stacks and self.auto_destruction is not None:
+            raise ValueError("auto_destruction is not supported with layered_stacks!")
+        return self
 
 
 class EcsFileStatementModel(BaseModel):
@@ -52,11 +62,60 @@ class EcsFileResourcesModel(BaseModel):
     limits: EcsFileLimitsModel
 
 
+class EcsFileCodeLayerModel(BaseModel):
+    # Paths of the context holding the application source, relative to it,
+    # "." for the whole context.
+    paths: List[str]
+    # Directory of the image the context is copied to.
+    destination: str
+
+    @field_validator("paths")
+    def validate_paths(cls, paths):
+        normalized_paths = []
+        for path in paths:
+            normalized_path = os.path.normpath(path)
+            if os.path.isabs(path) or normalized_path.split(os.sep)[0] == "..":
+                raise ValueError(
+                    f"Code layer paths must be sub paths of the context, got {path}"
+                )
+            normalized_paths.append(normalized_path)
+        if not normalized_paths:
+            raise ValueError("Code layer paths must not be empty")
+        return normalized_paths
+
+    @field_validator("destination")
+    def validate_destination(cls, destination):
+        if not destination.startswith("/"):
+            raise ValueError(
+                f"Code layer destination must be an absolute path, got {destination}"
+            )
+        return destination
+
+
 class EcsFileBuildModel(BaseModel):
     dockerfile: str = "Dockerfile"
     target: Optional[str] = None
     args: Dict[str, str] = {}
     context: str = "."
+    # BuildKit cache preset, defaulting cache_from and cache_to for the image.
+    cache: Optional[Literal["registry", "local", "inline"]] = None
+    # Values of docker buildx build --cache-from and --cache-to.
+    cache_from: List[str] = []
+    cache_to: List[str] = []
+    # Pushes the changes of the application source as a layer on top of the
+    # last built image, when nothing else of the build changed.
+    code_layer: Optional[EcsFileCodeLayerModel] = None
+    # Compression of the layers of the pushed image, zstd decompresses faster.
+    compression: Optional[Literal["gzip", "zstd"]] = None
+    # Generates a SOCI index of the pushed image, so that Fargate lazy loads it.
+    soci: bool = False
+
+    @model_validator(mode="after")
+    def validate_soci(self):
+        # SOCI indexes gzip layers only.
+        if self.soci and self.compression == "zstd":
+            raise ValueError("soci is not supported with zstd compression!")
+        return self
 
 
 class EcsFileEnvModel(BaseModel):
@@ -144,6 +203,28 @@ class EcsTaskDefinitionModel(BaseModel):
     resources: EcsFileResourcesModel
     containers: List[EcsFileContainerModel]
     ephemeral_storage: Optional[int] = None
+    # CPU architecture the tasks run on and the images are built for. A list
+    # builds multi-architecture images, the tasks running on the first one.
+    architecture: Union[
+        Literal["x86_64", "arm64"], List[Literal["x86_64", "arm64"]], None
+    ] = None
+
+    @field_validator("architecture")
+    def validate_architecture(cls, value):
+        if isinstance(value, list) and (not value or len(set(value)) != len(value)):
+            raise ValueError(
+                "Architectures must be a non empty list without duplicates, got"
+                f" {value}"
+            )
+        return value
+
+    @property
+    def architectures(self) -> List[str]:
+        if self.architecture is None:
+            return []
+        if isinstance(self.architecture, str):
+            return [self.architecture]
+        return self.architecture
 
     @field_validator("ephemeral_storage")
     def validate_ephemeral_storage(cls, value):
@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.cloudformation.stack.change_set import (
+    create_change_set,
+    execute_change_set,
+)
+from easyecs.helpers.exceptions import StackDeploymentException
+
+
+@pytest.fixture
+def client(mocker):
+    client = MagicMock()
+    mocker.patch(
+        "easyecs.cloudformation.stack.change_set.get_client_cloudformation",
+        return_value=client,
+    )
+    mocker.patch("easyecs.cloudformation.stack.change_set.time.sleep")
+    return client
+
+
+def test_change_set_is_polled_until_computed(client):
+    client.describe_change_set.side_effect = [
+        {"Status": "CREATE_PENDING"},
+        {"Status": "CREATE_IN_PROGRESS"},
+        {"Status": "CREATE_COMPLETE"},
+    ]
+
+    change_set_name = create_change_set("bob-app", {"Resources": {}}, "UPDATE")
+
+    assert change_set_name.startswith("easyecs-")
+    assert client.describe_change_set.call_count == 3
+    assert client.create_change_set.call_args.kwargs["ChangeSetType"] == "UPDATE"
+
+
+def test_empty_change_set_is_deleted(client):
+    client.describe_change_set.return_value = {
+        "Status": "FAILED",
+        "StatusReason": "The submitted information didn't contain changes.",
+    }
+
+    assert create_change_set("bob-app", {"Resources": {}}, "UPDATE") is None
+    client.delete_change_set.assert_called_once()
+
+
+def test_failed_change_set_raises(client):
+    client.describe_change_set.return_value = {
+        "Status": "FAILED",
+        "StatusReason": "Template format error",
+    }
+
+    with pytest.raises(StackDeploymentException, match="Template format error"):
+        create_change_set("bob-app", {"Resources": {}}, "CREATE")
+
+
+def test_execution_is_tagged_with_a_token(client):
+    token = execute_change_set("bob-app", "easyecs-change-set")
+
+    assert client.execute_change_set.call_args.kwargs["ClientRequestToken"] == token
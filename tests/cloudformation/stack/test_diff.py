@@ -0,0 +1,124 @@
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.cloudformation.stack.diff import (
+    diff_templates,
+    fetch_deployed_template,
+    print_template_changes,
+    save_deployed_template,
+)
+
+TEMPLATE = {
+    "Resources": {
+        "cluster": {"Type": "AWS::ECS::Cluster", "Properties": {"ClusterName": "c"}},
+        "loggroup": {
+            "Type": "AWS::Logs::LogGroup",
+            "Properties": {"LogGroupName": "l", "RetentionInDays": 1},
+        },
+    }
+}
+
+
+def _stack(status="UPDATE_COMPLETE", last_updated_time=None):
+    return {
+        "StackId": "arn:aws:cloudformation:eu-west-1:1:stack/bob-app/1",
+        "StackStatus": status,
+        "CreationTime": datetime.datetime(2023, 1, 1),
+        "LastUpdatedTime": last_updated_time or datetime.datetime(2023, 1, 2),
+    }
+
+
+@pytest.fixture
+def client(mocker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = MagicMock()
+    client.describe_stacks.return_value = {"Stacks": [_stack()]}
+    client.get_template.return_value = {"TemplateBody": TEMPLATE}
+    mocker.patch(
+        "easyecs.cloudformation.stack.diff.get_client_cloudformation",
+        return_value=client,
+    )
+    return client
+
+
+def test_key_order_is_not_a_change():
+    reordered = {
+        "Resources": {
+            "loggroup": {
+                "Properties": {"RetentionInDays": 1, "LogGroupName": "l"},
+                "Type": "AWS::Logs::LogGroup",
+            },
+            "cluster": {
+                "Properties": {"ClusterName": "c"},
+                "Type": "AWS::ECS::Cluster",
+            },
+        }
+    }
+
+    assert diff_templates(TEMPLATE, reordered) == {}
+
+
+def test_changes_are_reported_by_resource():
+    template = {
+        "Resources": {
+            "cluster": {
+                "Type": "AWS::ECS::Cluster",
+                "Properties": {"ClusterName": "d"},
+            },
+            "service": {"Type": "AWS::ECS::Service"},
+        },
+        "Outputs": {"url": {"Value": "u"}},
+    }
+
+    assert diff_templates(TEMPLATE, template) == {
+        "cluster": "modified",
+        "loggroup": "removed",
+        "service": "added",
+        "Outputs": "modified",
+    }
+
+
+def test_print_template_changes(capsys):
+    template = {"Resources": {"service": {"Type": "AWS::ECS::Service"}}}
+
+    print_template_changes({"service": "added"}, TEMPLATE, template)
+
+    assert "+ service (AWS::ECS::Service)" in capsys.readouterr().out
+
+
+def test_deployed_template_is_fetched_once(client):
+    assert fetch_deployed_template("bob-app") == TEMPLATE
+    assert fetch_deployed_template("bob-app") == TEMPLATE
+
+    client.get_template.assert_called_once()
+
+
+def test_deployed_template_is_fetched_again_after_an_update(client):
+    fetch_deployed_template("bob-app")
+    client.describe_stacks.return_value = {
+        "Stacks": [_stack(last_updated_time=datetime.datetime(2023, 1, 3))]
+    }
+
+    fetch_deployed_template("bob-app")
+
+    assert client.get_template.call_count == 2
+
+
+def test_updated_template_is_cached(client):
+    template = {"Resources": {}}
+
+    save_deployed_template("bob-app", template)
+
+    assert fetch_deployed_template("bob-app") == template
+    client.get_template.assert_not_called()
+
+
+def test_stack_in_progress_has_no_deployed_template(client):
+    client.describe_stacks.return_value = {
+        "Stacks": [_stack(status="UPDATE_IN_PROGRESS")]
+    }
+
+    assert fetch_deployed_template("bob-app") is None
+    client.get_template.assert_not_called()
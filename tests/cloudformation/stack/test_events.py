@@ -0,0 +1,111 @@
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.cloudformation.stack.events import (
+    describe_blocking_resource,
+    watch_stack_events,
+)
+from easyecs.helpers.exceptions import StackDeploymentException
+
+TOKEN = "easyecs-token"
+
+
+def _event(event_id, logical_id, status, reason=None, token=TOKEN, second=0):
+    resource_type = (
+        "AWS::CloudFormation::Stack" if logical_id == "bob-app" else "AWS::ECS::Service"
+    )
+    event = {
+        "EventId": event_id,
+        "LogicalResourceId": logical_id,
+        "ResourceType": resource_type,
+        "ResourceStatus": status,
+        "ClientRequestToken": token,
+        "Timestamp": datetime.datetime(2023, 1, 1, 0, 0, second),
+    }
+    if reason:
+        event["ResourceStatusReason"] = reason
+    return event
+
+
+@pytest.fixture
+def client(mocker):
+    client = MagicMock()
+    mocker.patch(
+        "easyecs.cloudformation.stack.events.get_client_cloudformation",
+        return_value=client,
+    )
+    mocker.patch("easyecs.cloudformation.stack.events.time.sleep")
+    return client
+
+
+def _responses(*pages):
+    # describe_stack_events lists the newest events first.
+    return [{"StackEvents": list(reversed(page))} for page in pages]
+
+
+def test_watch_returns_on_stack_completion(client):
+    previous = _event("0", "bob-app", "UPDATE_COMPLETE", token="previous")
+    started = [
+        previous,
+        _event("1", "bob-app", "UPDATE_IN_PROGRESS"),
+        _event("2", "service", "UPDATE_IN_PROGRESS", second=1),
+    ]
+    completed = started + [
+        _event("3", "service", "UPDATE_COMPLETE", second=2),
+        _event("4", "bob-app", "UPDATE_COMPLETE", second=3),
+    ]
+    client.describe_stack_events.side_effect = _responses(
+        [previous], started, completed
+    )
+    loader = MagicMock()
+
+    assert watch_stack_events("bob-app", TOKEN, loader) == "UPDATE_COMPLETE"
+    assert client.describe_stack_events.call_count == 3
+    loader.set_status.assert_any_call(
+        "waiting for service (AWS::ECS::Service) UPDATE_IN_PROGRESS"
+    )
+
+
+def test_watch_pages_until_the_last_seen_event(client):
+    first_page = {
+        "StackEvents": [_event("2", "service", "UPDATE_IN_PROGRESS")],
+        "NextToken": "next",
+    }
+    second_page = {"StackEvents": [_event("1", "bob-app", "UPDATE_IN_PROGRESS")]}
+    client.describe_stack_events.side_effect = [
+        first_page,
+        second_page,
+        {"StackEvents": [_event("3", "bob-app", "UPDATE_COMPLETE")]},
+    ]
+
+    assert watch_stack_events("bob-app", TOKEN) == "UPDATE_COMPLETE"
+    assert client.describe_stack_events.call_args_list[1].kwargs["NextToken"] == "next"
+
+
+def test_watch_raises_failure_reasons(client):
+    events = [
+        _event("1", "bob-app", "UPDATE_IN_PROGRESS"),
+        _event("2", "service", "UPDATE_FAILED", reason="Invalid image"),
+        _event("3", "other", "UPDATE_FAILED", reason="Resource update cancelled"),
+        _event("4", "bob-app", "UPDATE_ROLLBACK_COMPLETE"),
+    ]
+    client.describe_stack_events.side_effect = _responses(events)
+
+    with pytest.raises(StackDeploymentException) as e:
+        watch_stack_events("bob-app", TOKEN)
+
+    assert "UPDATE_ROLLBACK_COMPLETE" in str(e.value)
+    assert "service: Invalid image" in str(e.value)
+    assert "cancelled" not in str(e.value)
+
+
+def test_blocking_resource_is_the_oldest_in_progress():
+    in_progress_events = {
+        "service": _event("2", "service", "UPDATE_IN_PROGRESS", second=5),
+        "task": _event("1", "task", "CREATE_IN_PROGRESS", second=1),
+    }
+
+    assert describe_blocking_resource(in_progress_events).startswith("waiting for task")
+    assert describe_blocking_resource({}) is None
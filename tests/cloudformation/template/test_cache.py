@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+from easyecs.cloudformation.template import create_template, is_aws_cdk_required
+from easyecs.cloudformation.template.cache import (
+    TEMPLATE_CACHE_DIR,
+    compute_template_key,
+    evict_cached_templates,
+    load_cached_template,
+    save_cached_template,
+)
+from easyecs.model.ecs import EcsFileModel
+
+pytestmark = pytest.mark.usefixtures("in_tmp_path")
+
+
+def _template_args(manifest, run=False):
+    return (
+        "bob-app",
+        "123456789012",
+        "eu-west-1",
+        "vpc-1",
+        ["subnet-a"],
+        ["eu-west-1a"],
+        EcsFileModel(**manifest),
+        run,
+    )
+
+
+def test_key_ignores_field_order_of_the_manifest(manifest_data):
+    manifest = manifest_data()
+    reordered = dict(reversed(list(manifest.items())))
+
+    assert compute_template_key(*_template_args(manifest)) == compute_template_key(
+        *_template_args(reordered)
+    )
+
+
+@pytest.mark.parametrize(
+    "container, run",
+    [
+        ({}, True),
+        ({"env": {"A": "1", "B": "2"}}, False),
+        ({"env": {"B": "2", "A": "1"}}, False),
+    ],
+)
+def test_key_changes_with_what_is_rendered(container, run, manifest_data):
+    keys = {
+        compute_template_key(*_template_args(manifest_data())),
+        compute_template_key(*_template_args(manifest_data(**container), run)),
+    }
+
+    assert len(keys) == 2
+
+
+def test_create_template_hits_cache(mocker, manifest_data):
+    from easyecs.cloudformation.template import native
+
+    create_native_template = mocker.patch(
+        "easyecs.cloudformation.template.create_native_template",
+        wraps=native.create_native_template,
+    )
+    args = _template_args(manifest_data())
+
+    first_template = create_template(*args)
+    second_template = create_template(*args)
+
+    create_native_template.assert_called_once()
+    assert first_template == second_template
+    assert json.dumps(first_template) == json.dumps(second_template)
+
+
+def test_cdk_template_is_cached(mocker, manifest_data):
+    create_cdk_template = mocker.patch(
+        "easyecs.cloudformation.template.create_cdk_template",
+        return_value={"Resources": {"cdk": {}}},
+    )
+    # An empty inline policy is only handled by CDK.
+    manifest = manifest_data()
+    manifest["role"]["statements"] = []
+    args = _template_args(manifest)
+
+    assert is_aws_cdk_required(*args)
+    create_template(*args)
+    create_template(*args)
+
+    create_cdk_template.assert_called_once()
+    assert not is_aws_cdk_required(*args)
+
+
+def test_least_recently_used_templates_are_evicted():
+    for index in range(4):
+        save_cached_template(f"key{index}", {"index": index})
+        os.utime(f"{TEMPLATE_CACHE_DIR}/key{index}.json", (index, index))
+    assert load_cached_template("key0") == {"index": 0}
+
+    evict_cached_templates(size=2)
+
+    assert sorted(os.listdir(TEMPLATE_CACHE_DIR)) == ["key0.json", "key3.json"]
+
+
+def test_template_evicted_while_loaded_is_a_miss(mocker):
+    save_cached_template("key", {"index": 0})
+    mocker.patch(
+        "easyecs.cloudformation.template.cache.os.utime",
+        side_effect=FileNotFoundError,
+    )
+
+    assert load_cached_template("key") is None
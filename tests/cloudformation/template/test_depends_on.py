@@ -1,5 +1,5 @@
 import pytest
-from easyecs.cloudformation.template import create_template
+from easyecs.cloudformation.template import create_cdk_template
 from unittest.mock import MagicMock
 
 
@@ -79,9 +79,10 @@ def test_depends_on_container_has_depends_on(depends_on, mocker):
     container = MagicMock()
     container.depends_on = depends_on
     ecs_data.task_definition.containers = [container]
+    ecs_data.task_definition.architectures = []
     ecs_data.metadata.auto_destruction = None
 
-    create_template(
+    create_cdk_template(
         "test_service",
         "123456789012",
         "us-west-2",
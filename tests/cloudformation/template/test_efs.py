@@ -1,5 +1,5 @@
 import pytest
-from easyecs.cloudformation.template import create_template
+from easyecs.cloudformation.template import create_cdk_template
 from unittest.mock import MagicMock
 
 
@@ -38,8 +38,9 @@ def test_efs_add_mount_points_if_container_has_efs_volumes(efs_volumes, count, m
     container.efs_volumes = efs_volumes
     ecs_data.metadata.auto_destruction = None
     ecs_data.task_definition.containers = [container]
+    ecs_data.task_definition.architectures = []
 
-    create_template(
+    create_cdk_template(
         "test_service",
         "123456789012",
         "us-west-2",
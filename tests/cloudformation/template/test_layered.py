@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+from easyecs.cloudformation.template.layered import (
+    find_references,
+    get_base_stack_name,
+    split_template,
+)
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+
+
+def _template(name):
+    return json.loads((GOLDEN_DIR / f"{name}.json").read_text())["template"]
+
+
+def test_split_template_keeps_task_definition_and_service_in_service_stack():
+    template = _template("lb")
+
+    base_template, service_template = split_template(template, "bob-app")
+
+    assert sorted(
+        resource["Type"] for resource in service_template["Resources"].values()
+    ) == ["AWS::ECS::Service", "AWS::ECS::TaskDefinition"]
+    assert set(base_template["Resources"]) | set(service_template["Resources"]) == set(
+        template["Resources"]
+    )
+    assert "AWS::ElasticLoadBalancingV2::LoadBalancer" in [
+        resource["Type"] for resource in base_template["Resources"].values()
+    ]
+
+
+def test_split_template_imports_base_resources():
+    template = _template("lb")
+
+    base_template, service_template = split_template(template, "bob-app")
+
+    service = service_template["Resources"]["bobappserviceService878D97A4"]
+    assert service["Properties"]["Cluster"] == {
+        "Fn::ImportValue": "bob-app-base:bobappcluster45F3AB9C:Ref"
+    }
+    assert service["Properties"]["NetworkConfiguration"]["AwsvpcConfiguration"][
+        "SecurityGroups"
+    ] == [{"Fn::ImportValue": "bob-app-base:bobappsg735F44CE:GroupId"}]
+    assert service["Properties"]["TaskDefinition"] == {
+        "Ref": "bobapptaskdefinition2A4E5EB7"
+    }
+    # The base stack is deployed first, the service only depends on itself.
+    assert "DependsOn" not in service
+    assert base_template["Outputs"]["bobappsg735F44CEGroupId"] == {
+        "Value": {"Fn::GetAtt": ["bobappsg735F44CE", "GroupId"]},
+        "Export": {"Name": "bob-app-base:bobappsg735F44CE:GroupId"},
+    }
+    for resource in service_template["Resources"].values():
+        assert find_references(resource) <= set(service_template["Resources"])
+    for output in base_template["Outputs"].values():
+        assert find_references(output["Value"]) <= set(base_template["Resources"])
+
+
+def test_split_template_moves_resources_depending_on_the_service():
+    template = _template("basic")
+    template["Resources"]["Alarm"] = {
+        "Type": "AWS::CloudWatch::Alarm",
+        "Properties": {
+            "Dimensions": [
+                {
+                    "Name": "ServiceName",
+                    "Value": {"Fn::GetAtt": "bobappserviceService878D97A4.Name"},
+                }
+            ]
+        },
+    }
+
+    base_template, service_template = split_template(template, "bob-app")
+
+    assert "Alarm" in service_template["Resources"]
+    assert "Alarm" not in base_template["Resources"]
+
+
+def test_split_template_does_not_modify_the_template():
+    template = _template("full")
+    expected = json.loads(json.dumps(template))
+
+    split_template(template, "bob-app")
+
+    assert template == expected
+
+
+def test_get_base_stack_name():
+    assert get_base_stack_name("bob-app") == "bob-app-base"
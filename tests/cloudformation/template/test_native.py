@@ -0,0 +1,161 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from easyecs.cloudformation.template import (
+    create_cdk_template,
+    create_template,
+    write_template,
+)
+from easyecs.cloudformation.template.native import (
+    create_native_template,
+    is_native_template_supported,
+    make_unique_id,
+    schedule_rate,
+)
+from easyecs.model.ecs import EcsFileModel
+
+# Golden templates are synthesized by aws_cdk, regenerate them with:
+#   python tests/cloudformation/template/test_native.py
+GOLDEN_DIR = Path(__file__).parent / "golden"
+AWS_ACCOUNT_ID = "123456789012"
+AWS_REGION = "eu-west-1"
+VPC_ID = "vpc-1"
+SUBNET_IDS = ["subnet-a", "subnet-b"]
+AZS = ["eu-west-1a", "eu-west-1b"]
+
+
+def _template_args(golden):
+    return (
+        golden["stack_name"],
+        AWS_ACCOUNT_ID,
+        AWS_REGION,
+        VPC_ID,
+        SUBNET_IDS,
+        AZS,
+        EcsFileModel(**golden["manifest"]),
+        golden["run"],
+    )
+
+
+def _golden(name):
+    return json.loads((GOLDEN_DIR / f"{name}.json").read_text())
+
+
+@pytest.mark.parametrize(
+    "golden_path", sorted(GOLDEN_DIR.glob("*.json")), ids=lambda path: path.stem
+)
+def test_native_template_matches_cdk(golden_path):
+    golden = json.loads(golden_path.read_text())
+
+    template = create_native_template(*_template_args(golden))
+
+    assert template == golden["template"]
+    assert json.dumps(template, indent=1) == json.dumps(golden["template"], indent=1)
+
+
+def test_create_template_returns_native_template(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    create_cdk_template = mocker.patch(
+        "easyecs.cloudformation.template.create_cdk_template"
+    )
+    golden = _golden("basic")
+
+    template = create_template(*_template_args(golden))
+
+    create_cdk_template.assert_not_called()
+    assert template == golden["template"]
+    assert not (tmp_path / ".cloudformation").exists()
+
+
+def test_create_template_falls_back_to_cdk(tmp_path, monkeypatch, mocker):
+    monkeypatch.chdir(tmp_path)
+    create_cdk_template = mocker.patch(
+        "easyecs.cloudformation.template.create_cdk_template",
+        return_value={"Resources": {}},
+    )
+    golden = _golden("basic")
+    golden["manifest"]["role"]["statements"] = []
+
+    assert create_template(*_template_args(golden)) == {"Resources": {}}
+    create_cdk_template.assert_called_once()
+
+
+def test_write_template_uses_a_directory_per_invocation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    first_path = write_template("bob-app", {"Resources": {"a": {}}})
+    second_path = write_template("bob-app", {"Resources": {"b": {}}})
+
+    assert first_path != second_path
+    assert json.loads(Path(first_path).read_text()) == {"Resources": {"a": {}}}
+    assert json.loads(Path(second_path).read_text()) == {"Resources": {"b": {}}}
+
+
+@pytest.mark.parametrize(
+    "update",
+    [
+        lambda manifest: manifest["role"].update(statements=[]),
+        lambda manifest: manifest["task_definition"]["containers"][0].update(
+            ports=["80:8080"]
+        ),
+        lambda manifest: manifest["task_definition"]["containers"][0].update(
+            env={"A": 1}
+        ),
+        lambda manifest: manifest["task_definition"]["resources"]["limits"].update(
+            cpu=0
+        ),
+        lambda manifest: manifest.update(
+            role={"arn": "arn:aws:iam::123456789012:role/same"},
+            execution_role={"arn": "arn:aws:iam::123456789012:role/same"},
+        ),
+    ],
+)
+def test_unsupported_manifests_fall_back_to_cdk(update):
+    manifest = _golden("basic")["manifest"]
+    update(manifest)
+
+    assert not is_native_template_supported(EcsFileModel(**manifest))
+
+
+def test_mocked_manifest_is_not_supported():
+    assert not is_native_template_supported(object())
+
+
+def test_make_unique_id():
+    assert (
+        make_unique_id(["bob-app-service", "Service"]) == "bobappserviceService878D97A4"
+    )
+    assert (
+        make_unique_id(["bob-app", "bob-app-task-definition"])
+        == "bobappbobapptaskdefinitionF835424B"
+    )
+
+
+@pytest.mark.parametrize(
+    "minutes, expected",
+    [
+        (1, "rate(1 minute)"),
+        (45, "rate(45 minutes)"),
+        (60, "rate(1 hour)"),
+        (90, "rate(90 minutes)"),
+        (120, "rate(2 hours)"),
+        (1440, "rate(1 day)"),
+        (4320, "rate(3 days)"),
+    ],
+)
+def test_schedule_rate(minutes, expected):
+    assert schedule_rate(minutes) == expected
+
+
+def synthesize_golden(golden_path: Path):
+    golden = json.loads(golden_path.read_text())
+    golden["template"] = create_cdk_template(*_template_args(golden))
+    golden_path.write_text(json.dumps(golden, indent=1) + "\n")
+
+
+if __name__ == "__main__":
+    for golden_path in sorted(GOLDEN_DIR.glob("*.json")):
+        print(f"Synthesizing {golden_path.name}")
+        synthesize_golden(golden_path)
@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+
+from easyecs.cloudformation.template.layered import find_references, split_template
+from easyecs.cloudformation.template.shared import (
+    create_shared_template,
+    get_cluster_name,
+    share_template,
+)
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+
+
+def _template(name):
+    return json.loads((GOLDEN_DIR / f"{name}.json").read_text())["template"]
+
+
+def test_create_shared_template_exports_cluster_and_log_group():
+    template = create_shared_template("bob")
+
+    assert sorted(resource["Type"] for resource in template["Resources"].values()) == [
+        "AWS::ECS::Cluster",
+        "AWS::Logs::LogGroup",
+    ]
+    cluster = next(
+        resource
+        for resource in template["Resources"].values()
+        if resource["Type"] == "AWS::ECS::Cluster"
+    )
+    assert cluster["Properties"]["ClusterName"] == "bob-cluster"
+    assert {
+        name: output["Export"]["Name"] for name, output in template["Outputs"].items()
+    } == {
+        "ClusterName": "bob-easyecs-shared:ClusterName",
+        "ClusterArn": "bob-easyecs-shared:ClusterArn",
+        "LogGroupName": "bob-easyecs-shared:LogGroupName",
+        "LogGroupArn": "bob-easyecs-shared:LogGroupArn",
+    }
+    for output in template["Outputs"].values():
+        assert find_references(output["Value"]) <= set(template["Resources"])
+
+
+def test_share_template_imports_cluster_and_log_group():
+    template = share_template(_template("basic"), "bob", "app")
+
+    resources = template["Resources"]
+    assert "bobappcluster45F3AB9C" not in resources
+    assert "bobapplog0207A9B4" not in resources
+    service = resources["bobappserviceService878D97A4"]
+    assert service["Properties"]["Cluster"] == {
+        "Fn::ImportValue": "bob-easyecs-shared:ClusterName"
+    }
+    container_definition = resources["bobapptaskdefinition2A4E5EB7"]["Properties"][
+        "ContainerDefinitions"
+    ][0]
+    assert container_definition["LogConfiguration"]["Options"] == {
+        "awslogs-group": {"Fn::ImportValue": "bob-easyecs-shared:LogGroupName"},
+        "awslogs-stream-prefix": "app",
+        "awslogs-region": "eu-west-1",
+    }
+    assert "bob-easyecs-shared:LogGroupArn" in json.dumps(resources)
+    for resource in resources.values():
+        assert find_references(resource) <= set(resources)
+
+
+def test_share_template_composes_with_layered_stacks():
+    template = share_template(_template("lb"), "bob", "app")
+
+    base_template, service_template = split_template(template, "bob-app")
+
+    assert "bobappcluster45F3AB9CRef" not in base_template["Outputs"]
+    service = service_template["Resources"]["bobappserviceService878D97A4"]
+    assert service["Properties"]["Cluster"] == {
+        "Fn::ImportValue": "bob-easyecs-shared:ClusterName"
+    }
+
+
+def test_get_cluster_name():
+    assert get_cluster_name("bob", "app") == "bob-app-cluster"
+    assert get_cluster_name("bob", "app", shared_cluster=True) == "bob-cluster"
@@ -1,4 +1,4 @@
-from easyecs.cloudformation.template import create_template
+from easyecs.cloudformation.template import create_cdk_template
 from unittest.mock import MagicMock
 
 
@@ -48,6 +48,7 @@ def _create_mock_container():
 def _create_mock_ecs_data(container):
     ecs_data = MagicMock()
     ecs_data.task_definition.containers = [container]
+    ecs_data.task_definition.architectures = []
     return ecs_data
 
 
@@ -60,7 +61,7 @@ def test_command_is_always_sleep_when_tty(mocker):
     ecs_data = _create_mock_ecs_data(container)
     ecs_data.metadata.auto_destruction = None
 
-    create_template(
+    create_cdk_template(
         "test_service",
         "123456789012",
         "us-west-2",
@@ -98,7 +99,7 @@ def test_command_is_always_sleep_when_run(mocker):
     ecs_data = _create_mock_ecs_data(container)
     ecs_data.metadata.auto_destruction = None
 
-    create_template(
+    create_cdk_template(
         "test_service",
         "123456789012",
         "us-west-2",
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.cloudformation.fetch import (
+    fetch_tasks,
+    fetch_tasks_containers,
+    get_image_pull,
+    is_task_ready,
+    wait_for_tasks_ready,
+)
+
+
+def _container(name, status="RUNNING", agent="RUNNING", health="UNKNOWN"):
+    return {
+        "name": name,
+        "lastStatus": status,
+        "healthStatus": health,
+        "managedAgents": [{"name": "ExecuteCommandAgent", "lastStatus": agent}],
+    }
+
+
+def _task(status, containers, task_arn="arn:task/cluster/1", desired="RUNNING"):
+    return {
+        "taskArn": task_arn,
+        "lastStatus": status,
+        "desiredStatus": desired,
+        "containers": containers,
+    }
+
+
+@pytest.mark.parametrize(
+    "task, healthchecked, ready",
+    [
+        (_task("PROVISIONING", [_container("app", status="PENDING")]), [], False),
+        (_task("RUNNING", [_container("app")]), [], True),
+        (_task("RUNNING", [_container("app", agent="PENDING")]), [], False),
+        (_task("RUNNING", [_container("app")]), ["app"], False),
+        (_task("RUNNING", [_container("app", health="HEALTHY")]), ["app"], True),
+        (
+            _task("RUNNING", [_container("app"), _container("init", "STOPPED", "")]),
+            [],
+            True,
+        ),
+        (_task("RUNNING", [{"name": "app", "lastStatus": "RUNNING"}]), [], False),
+    ],
+)
+def test_is_task_ready(task, healthchecked, ready):
+    assert is_task_ready(task, healthchecked) == ready
+
+
+def test_fetch_tasks_paginates_and_batches(mocker):
+    client = MagicMock()
+    task_arns = [f"arn:task/cluster/{i}" for i in range(250)]
+    client.get_paginator().paginate.return_value = [
+        {"taskArns": task_arns[:100]},
+        {"taskArns": task_arns[100:]},
+    ]
+    client.describe_tasks.side_effect = lambda cluster, tasks: {
+        "tasks": [{"taskArn": task_arn} for task_arn in tasks]
+    }
+    mocker.patch("easyecs.cloudformation.fetch.boto3.client", return_value=client)
+
+    tasks = fetch_tasks("cluster")
+
+    assert [task["taskArn"] for task in tasks] == task_arns
+    assert [
+        len(call.kwargs["tasks"]) for call in client.describe_tasks.call_args_list
+    ] == [100, 100, 50]
+
+
+def test_wait_for_tasks_ready_polls_until_every_task_is_ready(mocker):
+    first = _task("RUNNING", [_container("app")], "arn:task/cluster/1")
+    second_pending = _task(
+        "RUNNING", [_container("app", agent="PENDING")], "arn:task/cluster/2"
+    )
+    second = _task("RUNNING", [_container("app")], "arn:task/cluster/2")
+    stopping = _task("RUNNING", [_container("app")], "arn:task/cluster/0", "STOPPED")
+    mocker.patch(
+        "easyecs.cloudformation.fetch.fetch_tasks",
+        side_effect=[[], [stopping, second_pending, first], [second, first]],
+    )
+    sleep = mocker.patch("easyecs.cloudformation.fetch.time.sleep")
+
+    assert wait_for_tasks_ready("cluster") == [first, second]
+    assert [call.args[0] for call in sleep.call_args_list] == [0.5, 0.75]
+
+
+def test_wait_for_tasks_ready_times_out(mocker):
+    mocker.patch("easyecs.cloudformation.fetch.fetch_tasks", return_value=[])
+    mocker.patch("easyecs.cloudformation.fetch.time.sleep")
+
+    with pytest.raises(Exception, match="were not ready after 0 seconds"):
+        wait_for_tasks_ready("cluster", timeout=0)
+
+
+def test_fetch_tasks_containers_indexes_by_task_id(mocker):
+    container = _container("app")
+    container["runtimeId"] = "abc-123"
+    mocker.patch(
+        "easyecs.cloudformation.fetch.wait_for_tasks_ready",
+        return_value=[_task("RUNNING", [container], "arn:task/user-app-cluster/abc")],
+    )
+
+    tasks_containers, tasks = fetch_tasks_containers("user", "app")
+
+    assert list(tasks_containers.keys()) == ["abc"]
+    assert [task["taskArn"] for task in tasks] == ["arn:task/user-app-cluster/abc"]
+    assert (
+        tasks_containers["abc"]["app"]["ssm_target"]
+        == "ecs:user-app-cluster_abc_abc-123"
+    )
+
+
+def test_fetch_tasks_containers_filters_service_of_shared_cluster(mocker):
+    container = _container("app")
+    container["runtimeId"] = "abc-123"
+    wait_for_tasks_ready = mocker.patch(
+        "easyecs.cloudformation.fetch.wait_for_tasks_ready",
+        return_value=[_task("RUNNING", [container], "arn:task/user-cluster/abc")],
+    )
+
+    tasks_containers, _ = fetch_tasks_containers("user", "app", shared_cluster=True)
+
+    wait_for_tasks_ready.assert_called_once_with(
+        "user-cluster", (), service_name="user-app-service"
+    )
+    assert (
+        tasks_containers["abc"]["app"]["ssm_target"] == "ecs:user-cluster_abc_abc-123"
+    )
+
+
+def test_image_pull_is_the_slowest_pull_of_the_tasks():
+    started_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    tasks = [
+        {
+            "pullStartedAt": started_at,
+            "pullStoppedAt": started_at + timedelta(seconds=12),
+        },
+        {
+            "pullStartedAt": started_at + timedelta(seconds=1),
+            "pullStoppedAt": started_at + timedelta(seconds=21),
+        },
+        {"pullStartedAt": started_at},
+    ]
+
+    assert get_image_pull(tasks) == (started_at.isoformat(), 20.0)
+    assert get_image_pull([{}]) is None
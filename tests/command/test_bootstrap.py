@@ -0,0 +1,170 @@
+import io
+import subprocess
+from unittest.mock import MagicMock
+
+from easyecs.command import (
+    bootstrap_container,
+    generate_bootstrap_command,
+    parse_bootstrap_status,
+    read_bootstrap_status,
+    run_nc_commands,
+)
+
+
+def test_bootstrap_command_starts_one_receiver_per_port():
+    command = generate_bootstrap_command(["8000", "8001"], False)
+
+    assert "receive 8000 &" in command
+    assert "receive 8001 &" in command
+    assert '\\"ports\\": [8000, 8001]' in command
+    assert "[ 0 = 1 ]" in command
+
+
+def test_bootstrap_command_allows_install_with_auto_install_nc():
+    command = generate_bootstrap_command(["8000"], True)
+
+    assert "[ 1 = 1 ]" in command
+    assert "apt install -y netcat-openbsd" in command
+
+
+def test_parse_bootstrap_status():
+    line = 'EASYECS_BOOTSTRAP {"nc": "installed", "ports": [8000]}\r\n'
+
+    assert parse_bootstrap_status(line) == {"nc": "installed", "ports": [8000]}
+    assert parse_bootstrap_status("Starting session with SessionId: 1234") is None
+    assert parse_bootstrap_status('+ echo "EASYECS_BOOTSTRAP {}"') is None
+
+
+def test_read_bootstrap_status_skips_session_output():
+    process = MagicMock()
+    process.stdout = io.BytesIO(
+        b"\r\nStarting session with SessionId: 1234\r\n"
+        b'EASYECS_BOOTSTRAP {"nc": "present", "ports": [8000]}\r\n'
+    )
+
+    assert read_bootstrap_status(process) == {"nc": "present", "ports": [8000]}
+
+
+def test_read_bootstrap_status_session_ended():
+    process = MagicMock()
+    process.stdout = io.BytesIO(b"\r\nStarting session with SessionId: 1234\r\n")
+
+    assert read_bootstrap_status(process) is None
+
+
+def test_read_bootstrap_status_kills_a_hanging_session():
+    process = subprocess.Popen(
+        ["sh", "-c", "echo Starting session; exec sleep 60"],
+        start_new_session=True,
+        stdout=subprocess.PIPE,
+    )
+
+    assert read_bootstrap_status(process, timeout=0.5) is None
+    assert process.wait(timeout=5) is not None
+
+
+def test_bootstrap_container_opens_a_single_session(mocker):
+    client = MagicMock()
+    mocker.patch("easyecs.command.boto3.client", return_value=client)
+    mocker.patch("easyecs.command.generate_ssm_cmd")
+    mocker.patch("easyecs.command.subprocess.Popen")
+    mocker.patch("easyecs.command.Thread")
+    mocker.patch("easyecs.command.generate_random_port", side_effect=["8000", "8001"])
+    mocker.patch(
+        "easyecs.command.read_bootstrap_status",
+        return_value={"nc": "present", "ports": [8000, 8001]},
+    )
+    port_forward = mocker.patch("easyecs.command.port_forward")
+    container = MagicMock()
+    container.name = "app"
+    container.volumes = ["/src:/app/src", "/conf:/app/conf"]
+    parsed_containers = {"app": {"ssm_target": "ecs:target"}}
+
+    status = bootstrap_container(
+        parsed_containers, container, "eu-west-1", "account", False
+    )
+
+    assert status == {"nc": "present", "ports": [8000, 8001]}
+    client.start_session.assert_called_once()
+    assert port_forward.call_count == 2
+
+
+def test_bootstrap_container_without_nc_opens_no_port_forward(mocker):
+    mocker.patch("easyecs.command.boto3.client")
+    mocker.patch("easyecs.command.generate_ssm_cmd")
+    mocker.patch("easyecs.command.subprocess.Popen")
+    mocker.patch("easyecs.command.generate_random_port", return_value="8000")
+    mocker.patch(
+        "easyecs.command.read_bootstrap_status",
+        return_value={"nc": "missing", "ports": []},
+    )
+    port_forward = mocker.patch("easyecs.command.port_forward")
+    container = MagicMock()
+    container.name = "app"
+    container.volumes = ["/src:/app/src"]
+    parsed_containers = {"app": {"ssm_target": "ecs:target"}}
+
+    status = bootstrap_container(
+        parsed_containers, container, "eu-west-1", "account", False
+    )
+
+    assert status["nc"] == "missing"
+    port_forward.assert_not_called()
+
+
+def test_run_nc_commands_fans_out_to_every_task(mocker):
+    bootstrap = mocker.patch(
+        "easyecs.command.bootstrap_container",
+        return_value={"nc": "present", "ports": [8000]},
+    )
+    run_sync_thread = mocker.patch("easyecs.command.run_sync_thread")
+    container = MagicMock()
+    container.name = "app"
+    container.volumes = ["/src:/app/src"]
+    ecs_manifest = MagicMock()
+    ecs_manifest.task_definition.containers = [container]
+    tasks_containers = {"task1": {"app": {}}, "task2": {"app": {}}}
+
+    run_nc_commands(tasks_containers, "eu-west-1", "account", ecs_manifest, False)
+
+    assert bootstrap.call_count == 2
+    assert run_sync_thread.call_count == 2
+
+
+def test_bootstrap_container_without_status_reports_a_failure(mocker):
+    mocker.patch("easyecs.command.boto3.client")
+    mocker.patch("easyecs.command.generate_ssm_cmd")
+    mocker.patch("easyecs.command.subprocess.Popen")
+    mocker.patch("easyecs.command.generate_random_port", return_value="8000")
+    mocker.patch("easyecs.command.read_bootstrap_status", return_value=None)
+    port_forward = mocker.patch("easyecs.command.port_forward")
+    container = MagicMock()
+    container.name = "app"
+    container.volumes = ["/src:/app/src"]
+    parsed_containers = {"app": {"ssm_target": "ecs:target"}}
+
+    status = bootstrap_container(
+        parsed_containers, container, "eu-west-1", "account", False
+    )
+
+    assert status["nc"] == "failed"
+    port_forward.assert_not_called()
+
+
+def test_run_nc_commands_reports_failed_bootstraps(mocker, capsys):
+    mocker.patch(
+        "easyecs.command.bootstrap_container",
+        side_effect=[{"nc": "present", "ports": [8000]}, {"nc": "failed", "ports": []}],
+    )
+    run_sync_thread = mocker.patch("easyecs.command.run_sync_thread")
+    container = MagicMock()
+    container.name = "app"
+    container.volumes = ["/src:/app/src"]
+    ecs_manifest = MagicMock()
+    ecs_manifest.task_definition.containers = [container]
+    tasks_containers = {"task1": {"app": {}}, "task2": {"app": {}}}
+
+    run_nc_commands(tasks_containers, "eu-west-1", "account", ecs_manifest, False)
+
+    assert run_sync_thread.call_count == 1
+    assert "ended or timed out" in capsys.readouterr().out
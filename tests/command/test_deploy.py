@@ -0,0 +1,210 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.command.deploy import (
+    dump_deployed_manifest,
+    find_fast_path_changes,
+    register_task_definition_revision,
+    update_service_task_definition,
+    wait_for_service_deployment,
+)
+from easyecs.model.ecs import EcsFileModel
+
+
+@pytest.mark.parametrize(
+    "container", [{"image": "nginx:2"}, {"env": {"A": "2"}}, {"env": None}]
+)
+def test_image_or_env_change_takes_the_fast_path(container, manifest_data):
+    deployed_manifest = dump_deployed_manifest(EcsFileModel(**manifest_data()), False)
+    manifest = EcsFileModel(**manifest_data(**container))
+
+    changes = find_fast_path_changes(deployed_manifest, manifest, False)
+
+    assert list(changes) == ["web"]
+
+
+@pytest.mark.parametrize(
+    "deployed_run, container, run",
+    [
+        (None, {"image": "nginx:2"}, False),
+        (True, {"image": "nginx:2"}, False),
+        (False, {}, False),
+        (False, {"image": "nginx:2", "command": "serve"}, False),
+        (False, {"env": {"A": 2}}, False),
+    ],
+)
+def test_other_changes_go_through_cloudformation(
+    deployed_run, container, run, manifest_data
+):
+    deployed_manifest = None
+    if deployed_run is not None:
+        deployed_manifest = dump_deployed_manifest(
+            EcsFileModel(**manifest_data()), deployed_run
+        )
+
+    manifest = EcsFileModel(**manifest_data(**container))
+
+    assert find_fast_path_changes(deployed_manifest, manifest, run) is None
+
+
+def _task_definition_client(mocker, tags):
+    client = MagicMock()
+    client.describe_task_definition.return_value = {
+        "taskDefinition": {
+            "taskDefinitionArn": "arn:task-definition:1",
+            "family": "bob-app",
+            "revision": 1,
+            "status": "ACTIVE",
+            "cpu": "1024",
+            "containerDefinitions": [
+                {"name": "web", "image": "nginx:1", "environment": []},
+                {"name": "sidecar", "image": "envoy", "environment": []},
+            ],
+        },
+        "tags": tags,
+    }
+    client.register_task_definition.return_value = {
+        "taskDefinition": {"taskDefinitionArn": "arn:task-definition:2"}
+    }
+    mocker.patch("easyecs.command.deploy.boto3.client", return_value=client)
+    return client
+
+
+def test_revision_only_changes_image_and_environment(mocker, manifest_data):
+    client = _task_definition_client(mocker, [{"key": "team", "value": "dev"}])
+    manifest = EcsFileModel(**manifest_data(image="nginx:2"))
+    container = manifest.task_definition.containers[0]
+
+    arn = register_task_definition_revision("arn:task-definition:1", {"web": container})
+
+    assert arn == "arn:task-definition:2"
+    client.register_task_definition.assert_called_once_with(
+        family="bob-app",
+        cpu="1024",
+        containerDefinitions=[
+            {
+                "name": "web",
+                "image": "nginx:2",
+                "environment": [{"name": "A", "value": "1"}],
+            },
+            {"name": "sidecar", "image": "envoy", "environment": []},
+        ],
+        tags=[{"key": "team", "value": "dev"}],
+    )
+
+
+@pytest.mark.parametrize(
+    "tags, expected",
+    [
+        (
+            [
+                {"key": "aws:cloudformation:stack-name", "value": "bob-app"},
+                {"key": "team", "value": "dev"},
+            ],
+            [{"key": "team", "value": "dev"}],
+        ),
+        ([{"key": "aws:cloudformation:stack-name", "value": "bob-app"}], None),
+    ],
+)
+def test_revision_drops_reserved_tags(mocker, tags, expected, manifest_data):
+    client = _task_definition_client(mocker, tags)
+    manifest = EcsFileModel(**manifest_data(image="nginx:2"))
+    container = manifest.task_definition.containers[0]
+
+    register_task_definition_revision("arn:task-definition:1", {"web": container})
+
+    assert client.register_task_definition.call_args.kwargs.get("tags") == expected
+
+
+def _service(task_definition, running_count, rollout_state="IN_PROGRESS", count=1):
+    deployment = {
+        "taskDefinition": task_definition,
+        "runningCount": running_count,
+        "rolloutState": rollout_state,
+    }
+    return {
+        "services": [
+            {"desiredCount": 1, "deployments": [deployment] * count},
+        ]
+    }
+
+
+def test_wait_for_service_deployment(mocker):
+    client = MagicMock()
+    client.describe_services.side_effect = [
+        _service("arn:2", 0, count=2),
+        _service("arn:2", 0),
+        _service("arn:2", 1, rollout_state="COMPLETED"),
+    ]
+    mocker.patch("easyecs.command.deploy.boto3.client", return_value=client)
+    sleep = mocker.patch("easyecs.command.deploy.time.sleep")
+
+    wait_for_service_deployment("bob-app-cluster", "bob-app-service", "arn:2")
+
+    assert client.describe_services.call_count == 3
+    assert all(call.args[0] <= 2 for call in sleep.call_args_list)
+
+
+def test_failed_service_deployment_raises(mocker):
+    client = MagicMock()
+    client.describe_services.return_value = _service("arn:2", 0, "FAILED")
+    mocker.patch("easyecs.command.deploy.boto3.client", return_value=client)
+    mocker.patch("easyecs.command.deploy.time.sleep")
+
+    with pytest.raises(Exception, match="failed"):
+        wait_for_service_deployment("bob-app-cluster", "bob-app-service", "arn:2")
+
+
+def test_failing_deployment_raises_while_the_previous_one_runs(mocker):
+    previous = {
+        "taskDefinition": "arn:1",
+        "runningCount": 1,
+        "failedTasks": 0,
+        "rolloutState": "COMPLETED",
+    }
+    client = MagicMock()
+    client.describe_services.side_effect = [
+        {
+            "services": [
+                {
+                    "desiredCount": 1,
+                    "deployments": [
+                        {
+                            "taskDefinition": "arn:2",
+                            "runningCount": 0,
+                            "failedTasks": failed_tasks,
+                            "rolloutState": "IN_PROGRESS",
+                        },
+                        previous,
+                    ],
+                }
+            ]
+        }
+        for failed_tasks in [0, 1]
+    ]
+    mocker.patch("easyecs.command.deploy.boto3.client", return_value=client)
+    mocker.patch("easyecs.command.deploy.time.sleep")
+
+    with pytest.raises(Exception, match="1 task\\(s\\) of the new task definition"):
+        wait_for_service_deployment("bob-app-cluster", "bob-app-service", "arn:2")
+    assert client.describe_services.call_count == 2
+
+
+def test_service_update_enables_the_circuit_breaker(mocker):
+    client = MagicMock()
+    client.describe_services.return_value = _service("arn:2", 1, "COMPLETED")
+    client.describe_services.return_value["services"][0]["taskDefinition"] = "arn:1"
+    mocker.patch("easyecs.command.deploy.boto3.client", return_value=client)
+    mocker.patch(
+        "easyecs.command.deploy.register_task_definition_revision",
+        return_value="arn:2",
+    )
+
+    update_service_task_definition("bob-app", {})
+
+    configuration = client.update_service.call_args.kwargs["deploymentConfiguration"]
+    assert configuration["deploymentCircuitBreaker"] == {
+        "enable": True,
+        "rollback": False,
+    }
@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.command import (
+    allocate_local_ports,
+    create_port_forwards,
+    select_task_containers,
+)
+
+
+def test_select_task_containers_defaults_to_first_task():
+    tasks_containers = {"abc": {"app": 1}, "def": {"app": 2}}
+
+    assert select_task_containers(tasks_containers) == ("abc", {"app": 1})
+    assert select_task_containers(tasks_containers, "de") == ("def", {"app": 2})
+
+
+def test_select_task_containers_unknown_task():
+    with pytest.raises(Exception, match="Task xyz not found"):
+        select_task_containers({"abc": {}}, "xyz")
+
+
+def test_port_forwards_round_robin_local_ports_across_tasks(mocker):
+    mocker.patch("easyecs.command.is_port_in_use", return_value=False)
+    port_forward = mocker.patch("easyecs.command.port_forward")
+    container = MagicMock()
+    container.name = "app"
+    container.port_forward = ["8000:80"]
+    ecs_manifest = MagicMock()
+    ecs_manifest.task_definition.containers = [container]
+    tasks_containers = {"a": {"app": "a"}, "b": {"app": "b"}, "c": {"app": "c"}}
+
+    create_port_forwards(ecs_manifest, "eu-west-1", "account", tasks_containers)
+
+    assert [call.args[:4] for call in port_forward.call_args_list] == [
+        ({"app": "a"}, "app", "80", "8000"),
+        ({"app": "b"}, "app", "80", "8001"),
+        ({"app": "c"}, "app", "80", "8002"),
+    ]
+
+
+def _container(name, port_forward):
+    container = MagicMock()
+    container.name = name
+    container.port_forward = port_forward
+    return container
+
+
+def test_local_ports_of_tasks_never_collide():
+    containers = [
+        _container("app", ["8080:80", "8081:81"]),
+        _container("worker", ["8083:83"]),
+    ]
+
+    tasks_local_ports = allocate_local_ports(containers, 2)
+
+    assert tasks_local_ports == [
+        {
+            ("app", "8080:80"): "8080",
+            ("app", "8081:81"): "8081",
+            ("worker", "8083:83"): "8083",
+        },
+        {
+            ("app", "8080:80"): "8082",
+            ("app", "8081:81"): "8084",
+            ("worker", "8083:83"): "8085",
+        },
+    ]
+
+
+def test_port_forwards_print_the_ports_of_each_task(mocker, capsys):
+    mocker.patch("easyecs.command.is_port_in_use", return_value=False)
+    mocker.patch("easyecs.command.port_forward")
+    ecs_manifest = MagicMock()
+    ecs_manifest.task_definition.containers = [_container("app", ["8000:80"])]
+    tasks_containers = {"a": {"app": "a"}, "b": {"app": "b"}}
+
+    create_port_forwards(ecs_manifest, "eu-west-1", "account", tasks_containers)
+
+    out = capsys.readouterr().out
+    assert "Task a: app 80 on 8000" in out
+    assert "Task b: app 80 on 8001" in out
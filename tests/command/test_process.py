@@ -0,0 +1,94 @@
+import signal
+import subprocess
+import sys
+import time
+
+from easyecs.command.process import ProcessManager, terminate_processes
+
+
+def _spawn(code):
+    return subprocess.Popen([sys.executable, "-c", code])
+
+
+def test_wait_returns_when_process_exits():
+    process_manager = ProcessManager()
+    tracked = process_manager.track(_spawn("import time; time.sleep(0.2)"), "sleep")
+
+    assert process_manager.wait(tracked, timeout=10)
+    assert tracked.returncode == 0
+    assert tracked.lifetime >= 0.2
+    assert process_manager.running() == []
+
+
+def test_on_exit_is_notified_with_return_code():
+    process_manager = ProcessManager()
+    exited = []
+    tracked = process_manager.track(
+        _spawn("raise SystemExit(3)"), "failing", on_exit=exited.append
+    )
+
+    process_manager.wait(tracked, timeout=10)
+
+    assert exited == [tracked]
+    assert tracked.returncode == 3
+
+
+def test_running_process_is_reported_in_lifetimes():
+    process_manager = ProcessManager()
+    process = _spawn("import time; time.sleep(30)")
+    tracked = process_manager.track(process, "long")
+    try:
+        assert not process_manager.wait(tracked, timeout=0.1)
+        assert process_manager.running() == [tracked]
+        lifetimes = process_manager.lifetimes()
+        assert lifetimes[0]["name"] == "long"
+        assert lifetimes[0]["pid"] == process.pid
+        assert lifetimes[0]["running"]
+    finally:
+        process.kill()
+    assert process_manager.wait(tracked, timeout=10)
+    assert not process_manager.lifetimes()[0]["running"]
+
+
+def test_fallback_without_pidfd(mocker):
+    mocker.patch("easyecs.command.process.open_pidfd", return_value=None)
+    process_manager = ProcessManager()
+
+    start = time.monotonic()
+    tracked = process_manager.track(_spawn("pass"), "quick")
+
+    assert process_manager.wait(tracked, timeout=10)
+    assert time.monotonic() - start < 10
+    assert tracked.returncode == 0
+
+
+def test_terminate_processes_waits_for_graceful_exit():
+    process = _spawn("import time; time.sleep(30)")
+    process.terminate()
+
+    terminate_processes([process], time.monotonic() + 5)
+
+    assert process.poll() is not None
+
+
+def test_terminate_processes_escalates_after_deadline():
+    ignore_signals = (
+        "import signal, time\n"
+        "signal.signal(signal.SIGINT, signal.SIG_IGN)\n"
+        "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+        "print('ready', flush=True)\n"
+        "time.sleep(30)\n"
+    )
+    processes = [
+        subprocess.Popen([sys.executable, "-c", ignore_signals], stdout=subprocess.PIPE)
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.stdout.readline()
+        process.send_signal(signal.SIGINT)
+
+    start = time.monotonic()
+    terminate_processes(processes, start + 0.5, escalation_timeout=0.5)
+
+    assert time.monotonic() - start < 5
+    assert [process.returncode for process in processes] == [-signal.SIGKILL] * 3
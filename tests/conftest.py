@@ -0,0 +1,92 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from easyecs.model.ecs import EcsFileBuildModel
+
+
+@pytest.fixture
+def in_tmp_path(tmp_path, monkeypatch):
+    """
+    Runs the test from an empty directory, where the .tmp files of easyecs
+    are written instead of the repository.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def build_context(in_tmp_path):
+    (in_tmp_path / "Dockerfile").write_text("FROM scratch\n")
+    return in_tmp_path
+
+
+@pytest.fixture
+def mock_manifest():
+    """
+    Returns a factory of mocked manifests, whose containers build an image
+    named after them unless an image is given.
+    """
+
+    def mock_manifest(*names, image=None, build=None, architectures=()):
+        containers = []
+        for name in names or ["app"]:
+            container = MagicMock()
+            container.name = name
+            container.image = image or name
+            container.build = build or EcsFileBuildModel()
+            containers.append(container)
+        ecs_manifest = MagicMock()
+        ecs_manifest.task_definition.containers = containers
+        ecs_manifest.task_definition.architectures = list(architectures)
+        return ecs_manifest
+
+    return mock_manifest
+
+
+@pytest.fixture
+def manifest_data():
+    """
+    Returns a factory of the data of a manifest with a single web container,
+    whose fields are overridden by the given ones.
+    """
+
+    def manifest_data(**container):
+        return {
+            "metadata": {"appname": "app", "user": "bob"},
+            "role": {
+                "statements": [
+                    {
+                        "sid": "s",
+                        "resources": ["*"],
+                        "actions": ["s3:*"],
+                        "effect": "Allow",
+                    }
+                ]
+            },
+            "execution_role": {
+                "managed_policies": ["service-role/AmazonECSTaskExecutionRolePolicy"],
+                "statements": [
+                    {
+                        "sid": "l",
+                        "resources": ["*"],
+                        "actions": ["logs:*"],
+                        "effect": "Allow",
+                    }
+                ],
+            },
+            "task_definition": {
+                "resources": {"limits": {"cpu": 1, "memory": 2048}},
+                "containers": [
+                    {
+                        "name": "web",
+                        "image": "nginx:1",
+                        "resources": {"limits": {"cpu": 1, "memory": 2048}},
+                        "env": {"A": "1"},
+                        **container,
+                    }
+                ],
+            },
+        }
+
+    return manifest_data
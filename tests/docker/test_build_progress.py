@@ -0,0 +1,198 @@
+import base64
+import json
+import os
+import shlex
+
+import pytest
+
+from easyecs.docker import build_docker_image, is_rawjson_progress_supported
+from easyecs.docker.progress import (
+    BUILD_SUMMARIES_PATH,
+    BuildProgress,
+    format_build_summary,
+    format_bytes,
+    parse_timestamp,
+)
+
+
+def _vertex(digest, name, started=None, completed=None, cached=False):
+    vertex = {"digest": digest, "name": name, "cached": cached}
+    if started is not None:
+        vertex["started"] = f"2026-01-01T00:00:{started:02d}.123456789Z"
+    if completed is not None:
+        vertex["completed"] = f"2026-01-01T00:00:{completed:02d}.123456789Z"
+    return vertex
+
+
+STREAM = [
+    {"vertexes": [_vertex("sha256:1", "[1/3] FROM python", 0, 1, cached=True)]},
+    {"vertexes": [_vertex("sha256:2", "[2/3] RUN pip install", 1)]},
+    {
+        "logs": [
+            {
+                "vertex": "sha256:2",
+                "stream": 1,
+                "data": base64.b64encode(b"Collecting click\n").decode(),
+            }
+        ]
+    },
+    {"vertexes": [_vertex("sha256:2", "[2/3] RUN pip install", 1, 21)]},
+    {"vertexes": [_vertex("sha256:3", "[3/3] COPY . /srv", 21, 22)]},
+    {"vertexes": [_vertex("sha256:4", "pushing layers", 22)]},
+    {
+        "statuses": [
+            {"id": "sha256:a", "vertex": "sha256:4", "current": 1000, "total": 3000},
+            {"id": "sha256:b", "vertex": "sha256:4", "current": 500, "total": 500},
+        ]
+    },
+    {
+        "statuses": [
+            {"id": "sha256:a", "vertex": "sha256:4", "current": 3000, "total": 3000}
+        ]
+    },
+    {"vertexes": [_vertex("sha256:4", "pushing layers", 22, 25)]},
+]
+
+
+def _feed(progress):
+    lines = []
+    for status in STREAM:
+        lines += progress.feed(json.dumps(status) + "\n")
+    return lines
+
+
+def test_progress_shows_steps_and_logs():
+    lines = _feed(BuildProgress())
+
+    assert lines == [
+        "CACHED [1/3] FROM python\n",
+        "=> [2/3] RUN pip install\n",
+        "Collecting click\n",
+        "=> [3/3] COPY . /srv\n",
+        "=> pushing layers\n",
+    ]
+
+
+def test_progress_summary():
+    progress = BuildProgress()
+    _feed(progress)
+
+    summary = progress.summary()
+
+    assert summary == {
+        "duration": 25.0,
+        "steps": [
+            {"name": "[1/3] FROM python", "duration": 1.0, "cached": True},
+            {"name": "[2/3] RUN pip install", "duration": 20.0, "cached": False},
+            {"name": "[3/3] COPY . /srv", "duration": 1.0, "cached": False},
+            {"name": "pushing layers", "duration": 3.0, "cached": False},
+        ],
+        "cached_steps": 1,
+        "pushed_bytes": 3500,
+    }
+    assert (
+        format_build_summary("app", summary)
+        == "app: 25.0s, 1/4 steps cached, 3.5 KB pushed, slowest step: [2/3] RUN pip"
+        " install (20.0s)"
+    )
+
+
+def test_lines_out_of_the_stream_are_shown_as_is():
+    progress = BuildProgress()
+
+    assert progress.feed("ERROR: failed to solve\n") == ["ERROR: failed to solve\n"]
+    assert progress.summary()["steps"] == []
+
+
+@pytest.mark.parametrize(
+    "size, expected", [(999, "999 B"), (1500, "1.5 KB"), (2_000_000_000, "2.0 GB")]
+)
+def test_format_bytes(size, expected):
+    assert format_bytes(size) == expected
+
+
+def test_nanosecond_timestamps_are_parsed():
+    timestamp = parse_timestamp("2026-01-01T00:00:01.123456789Z")
+
+    assert timestamp.microsecond == 123456 and timestamp.utcoffset().seconds == 0
+
+
+@pytest.mark.usefixtures("build_context")
+def test_build_summaries_are_collected_and_stored(mocker, mock_manifest):
+    stream = "".join(json.dumps(status) + "\n" for status in STREAM)
+    mocker.patch(
+        "easyecs.docker.docker_build_cmd",
+        return_value=f"printf %s {shlex.quote(stream)} >&2",
+    )
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    mocker.patch("easyecs.docker.is_rawjson_progress_supported", return_value=True)
+    ecs_manifest = mock_manifest()
+    summaries = {}
+
+    build_docker_image(ecs_manifest, False, summaries=summaries)
+
+    assert summaries["app"]["pushed_bytes"] == 3500
+    stored = [json.loads(line) for line in open(BUILD_SUMMARIES_PATH)]
+    assert len(stored) == 1
+    assert stored[0]["image"] == "app" and stored[0]["containers"] == ["app"]
+    assert stored[0]["duration"] == 25.0
+    assert stored[0]["push"] == "pushed"
+
+
+def test_skipped_push_is_reported_in_the_summary():
+    progress = BuildProgress()
+    _feed(progress)
+    summary = {**progress.summary(), "push": "skipped"}
+
+    assert format_build_summary("app", summary).endswith(
+        "push skipped, already in the registry, slowest step: [2/3] RUN pip"
+        " install (20.0s)"
+    )
+
+
+@pytest.mark.usefixtures("build_context")
+def test_builds_without_rawjson_progress_have_no_summary(mocker, mock_manifest):
+    docker_build_cmd = mocker.patch(
+        "easyecs.docker.docker_build_cmd", return_value="true"
+    )
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    mocker.patch("easyecs.docker.is_rawjson_progress_supported", return_value=False)
+    ecs_manifest = mock_manifest()
+    summaries = {}
+
+    assert build_docker_image(ecs_manifest, False, summaries=summaries) == {
+        "app": "built"
+    }
+
+    assert docker_build_cmd.call_args.kwargs["progress"] is None
+    assert summaries == {}
+    assert not os.path.exists(BUILD_SUMMARIES_PATH)
+
+
+@pytest.mark.parametrize(
+    "help_output, expected",
+    [
+        (
+            '--progress string  Set type of progress output ("auto", "plain", "tty")',
+            False,
+        ),
+        (
+            (
+                '--progress string  Set type of progress output ("auto", "quiet",'
+                ' "plain", "tty", "rawjson")'
+            ),
+            True,
+        ),
+    ],
+)
+def test_rawjson_progress_support_is_detected(help_output, expected, mocker):
+    run = mocker.patch("easyecs.docker.subprocess.run")
+    run.return_value.stdout = help_output
+    is_rawjson_progress_supported.cache_clear()
+
+    try:
+        assert is_rawjson_progress_supported() is expected
+        assert is_rawjson_progress_supported() is expected
+    finally:
+        is_rawjson_progress_supported.cache_clear()
+    run.assert_called_once()
@@ -0,0 +1,215 @@
+import time
+
+import pytest
+
+from easyecs.docker import build_docker_image
+from easyecs.model.ecs import EcsFileBuildModel
+
+pytestmark = pytest.mark.usefixtures("build_context")
+
+
+def _commands(mocker, build_cmds, push_cmd=lambda image_name: "true"):
+    mocker.patch(
+        "easyecs.docker.docker_build_cmd",
+        side_effect=lambda build, image_name, **kwargs: build_cmds[image_name],
+    )
+    return mocker.patch("easyecs.docker.docker_push_cmd", side_effect=push_cmd)
+
+
+def test_builds_run_concurrently(mocker, mock_manifest):
+    _commands(mocker, {name: "sleep 0.5" for name in ["a", "b", "c"]})
+
+    start = time.monotonic()
+    build_docker_image(mock_manifest("a", "b", "c"), False, parallelism=3)
+
+    assert time.monotonic() - start < 1.2
+
+
+def test_parallelism_limits_concurrent_builds(tmp_path, mocker, mock_manifest):
+    log = tmp_path / "log"
+    _commands(
+        mocker,
+        {
+            name: f"echo start >> {log}; sleep 0.2; echo end >> {log}"
+            for name in ["a", "b", "c"]
+        },
+    )
+
+    build_docker_image(mock_manifest("a", "b", "c"), False, parallelism=1)
+
+    assert log.read_text().split() == ["start", "end"] * 3
+
+
+def test_failed_build_cancels_the_other_builds(mocker, mock_manifest):
+    docker_push_cmd = _commands(
+        mocker, {"a": "sleep 0.1; exit 1", "b": "sleep 10", "c": "sleep 10"}
+    )
+
+    start = time.monotonic()
+    with pytest.raises(Exception, match="building the docker image of a"):
+        build_docker_image(mock_manifest("a", "b", "c"), False, parallelism=2)
+
+    assert time.monotonic() - start < 5
+    docker_push_cmd.assert_not_called()
+
+
+def test_image_is_pushed_once_built(tmp_path, mocker, mock_manifest):
+    log = tmp_path / "log"
+    _commands(
+        mocker,
+        {"a": f"echo build >> {log}"},
+        push_cmd=lambda image_name: f"echo push {image_name} >> {log}",
+    )
+
+    build_docker_image(mock_manifest("a"), False)
+
+    assert log.read_text().splitlines() == ["build", "push a"]
+
+
+def test_logs_are_prefixed_with_the_container_name(mocker, capsys, mock_manifest):
+    _commands(mocker, {"a": "echo from a", "b": "echo from b"})
+
+    build_docker_image(mock_manifest("a", "b"), True)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert any(line.startswith("\033[90m[a]\033[0m from a") for line in lines)
+    assert any(line.startswith("\033[90m[b]\033[0m from b") for line in lines)
+
+
+def test_containers_without_build_are_skipped(mocker, mock_manifest):
+    ecs_manifest = mock_manifest("a")
+    ecs_manifest.task_definition.containers[0].build = None
+    popen = mocker.patch("easyecs.docker.subprocess.Popen")
+
+    build_docker_image(ecs_manifest, False)
+
+    popen.assert_not_called()
+
+
+def test_image_is_pushed_while_other_builds_go_on(tmp_path, mocker, mock_manifest):
+    log = tmp_path / "log"
+    _commands(
+        mocker,
+        {"a": "true", "b": f"sleep 0.5; echo build b >> {log}"},
+        push_cmd=lambda image_name: f"echo push {image_name} >> {log}",
+    )
+
+    build_docker_image(mock_manifest("a", "b"), False, parallelism=2)
+
+    assert log.read_text().splitlines() == ["push a", "build b", "push b"]
+
+
+def test_buildx_push_skips_docker_push(mocker, mock_manifest):
+    docker_build_cmd = mocker.patch(
+        "easyecs.docker.docker_build_cmd", return_value="true"
+    )
+    docker_push_cmd = mocker.patch("easyecs.docker.docker_push_cmd")
+
+    build_docker_image(mock_manifest("a"), False, buildx_push=True)
+
+    assert True in [call.kwargs.get("push") for call in docker_build_cmd.call_args_list]
+    docker_push_cmd.assert_not_called()
+
+
+def test_images_are_built_for_the_task_architectures(mocker, mock_manifest):
+    docker_build_cmd = mocker.patch(
+        "easyecs.docker.docker_build_cmd", return_value="true"
+    )
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    ecs_manifest = mock_manifest("a")
+    ecs_manifest.task_definition.architectures = ["arm64"]
+
+    build_docker_image(ecs_manifest, False)
+
+    platforms = {
+        tuple(call.kwargs["platforms"]) for call in docker_build_cmd.call_args_list
+    }
+    assert platforms == {("linux/arm64",)}
+
+
+def test_multi_platform_images_are_pushed_by_buildx(mocker, mock_manifest):
+    docker_build_cmd = mocker.patch(
+        "easyecs.docker.docker_build_cmd", return_value="true"
+    )
+    docker_push_cmd = mocker.patch("easyecs.docker.docker_push_cmd")
+    ecs_manifest = mock_manifest("a")
+    ecs_manifest.task_definition.architectures = ["arm64", "x86_64"]
+
+    build_docker_image(ecs_manifest, False)
+
+    assert True in [call.kwargs.get("push") for call in docker_build_cmd.call_args_list]
+    docker_push_cmd.assert_not_called()
+
+
+def test_image_shared_by_containers_is_built_once(tmp_path, mocker, mock_manifest):
+    log = tmp_path / "log"
+    _commands(
+        mocker,
+        {"app": f"echo build >> {log}"},
+        push_cmd=lambda image_name: f"echo push {image_name} >> {log}",
+    )
+    ecs_manifest = mock_manifest("app", "worker")
+    ecs_manifest.task_definition.containers[1].image = "app"
+
+    results = build_docker_image(ecs_manifest, False)
+
+    assert results == {"app": "built", "worker": "built"}
+    assert log.read_text().splitlines() == ["build", "push app"]
+
+
+def test_image_built_differently_by_containers_is_rejected(mocker, mock_manifest):
+    popen = mocker.patch("easyecs.docker.subprocess.Popen")
+    ecs_manifest = mock_manifest("app", "worker")
+    ecs_manifest.task_definition.containers[1].image = "app"
+    ecs_manifest.task_definition.containers[1].build = EcsFileBuildModel(target="dev")
+
+    with pytest.raises(Exception, match="build the image app differently"):
+        build_docker_image(ecs_manifest, False)
+    popen.assert_not_called()
+
+
+def test_compressed_images_are_pushed_by_buildx(mocker, mock_manifest):
+    docker_build_cmd = mocker.patch(
+        "easyecs.docker.docker_build_cmd", return_value="true"
+    )
+    docker_push_cmd = mocker.patch("easyecs.docker.docker_push_cmd")
+    ecs_manifest = mock_manifest("a")
+    ecs_manifest.task_definition.containers[0].build = EcsFileBuildModel(
+        compression="zstd"
+    )
+
+    build_docker_image(ecs_manifest, False)
+
+    assert True in [call.kwargs.get("push") for call in docker_build_cmd.call_args_list]
+    docker_push_cmd.assert_not_called()
+
+
+def test_soci_index_is_generated_once_pushed(tmp_path, mocker, mock_manifest):
+    log = tmp_path / "log"
+    _commands(
+        mocker,
+        {"a": f"echo build >> {log}"},
+        push_cmd=lambda image_name: f"echo push >> {log}",
+    )
+    mocker.patch("easyecs.docker.shutil.which", return_value="/usr/bin/soci")
+    mocker.patch(
+        "easyecs.docker.soci_index_cmd",
+        side_effect=lambda image_name, platforms: f"echo soci >> {log}",
+    )
+    ecs_manifest = mock_manifest("a")
+    ecs_manifest.task_definition.containers[0].build = EcsFileBuildModel(soci=True)
+
+    build_docker_image(ecs_manifest, False)
+
+    assert log.read_text().split() == ["build", "push", "soci"]
+
+
+def test_soci_index_requires_the_soci_command(mocker, mock_manifest):
+    mocker.patch("easyecs.docker.shutil.which", return_value=None)
+    docker_build_cmd = mocker.patch("easyecs.docker.docker_build_cmd")
+    ecs_manifest = mock_manifest("a")
+    ecs_manifest.task_definition.containers[0].build = EcsFileBuildModel(soci=True)
+
+    with pytest.raises(Exception, match="soci"):
+        build_docker_image(ecs_manifest, False)
+    docker_build_cmd.assert_not_called()
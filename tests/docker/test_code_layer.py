@@ -0,0 +1,404 @@
+import gzip
+import hashlib
+import io
+import json
+import re
+import tarfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from easyecs.docker import build_docker_image
+from easyecs.docker.code_layer import (
+    create_code_layer,
+    is_code_path,
+    push_code_layer,
+)
+from easyecs.docker.registry import (
+    DOCKER_MANIFEST_TYPE,
+    OCI_INDEX_TYPE,
+    RegistryClient,
+    fetch_image_digests,
+    parse_image_name,
+    resolve_platform_manifest,
+)
+from easyecs.model.ecs import EcsFileBuildModel, EcsFileCodeLayerModel
+
+
+def _digest(data):
+    return f"sha256:{hashlib.sha256(data).hexdigest()}"
+
+
+class FakeRegistry(BaseHTTPRequestHandler):
+    """
+    The subset of the registry HTTP API used by the code layers, in memory.
+    """
+
+    blobs = {}
+    manifests = {}
+    uploads = set()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        match = re.match(r"^/storage/(.+)/([^/]+)$", path)
+        if match:
+            # As S3, the storage rejects the credentials of the registry.
+            if "Authorization" in self.headers:
+                return self.reply(400)
+            blob = self.blobs.get(match.groups())
+            return self.reply(200, blob) if blob is not None else self.reply(404)
+        match = re.match(r"^/v2/(.+)/(manifests|blobs)/([^/]+)$", path)
+        if not match:
+            return self.reply(404)
+        repository, kind, reference = match.groups()
+        if kind == "blobs" and self.command == "GET":
+            # As ECR, blobs are downloaded from a presigned storage URL.
+            location = f"/storage/{repository}/{reference}"
+            return self.reply(307, headers={"Location": location})
+        if kind == "blobs":
+            blob = self.blobs.get((repository, reference))
+            return self.reply(200, blob) if blob is not None else self.reply(404)
+        if (repository, reference) not in self.manifests:
+            return self.reply(404)
+        media_type, body = self.manifests[(repository, reference)]
+        self.reply(
+            200,
+            body,
+            {"Content-Type": media_type, "Docker-Content-Digest": _digest(body)},
+        )
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        match = re.match(r"^/v2/(.+)/blobs/uploads/$", urlparse(self.path).path)
+        upload = str(uuid.uuid4())
+        self.uploads.add(upload)
+        location = f"/v2/{match.group(1)}/blobs/uploads/{upload}?_state=1"
+        self.reply(202, headers={"Location": location})
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        match = re.match(r"^/v2/(.+)/blobs/uploads/([^/]+)$", url.path)
+        if match:
+            repository, upload = match.groups()
+            digest = parse_qs(url.query)["digest"][0]
+            if upload not in self.uploads or digest != _digest(body):
+                return self.reply(400)
+            self.blobs[(repository, digest)] = body
+            return self.reply(201)
+        repository, reference = re.match(
+            r"^/v2/(.+)/manifests/([^/]+)$", url.path
+        ).groups()
+        manifest = json.loads(body)
+        for descriptor in [manifest["config"]] + manifest["layers"]:
+            if (repository, descriptor["digest"]) not in self.blobs:
+                return self.reply(400)
+        entry = (self.headers["Content-Type"], body)
+        self.manifests[(repository, reference)] = entry
+        self.manifests[(repository, _digest(body))] = entry
+        self.reply(201)
+
+
+@pytest.fixture
+def registry():
+    FakeRegistry.blobs, FakeRegistry.manifests = {}, {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRegistry)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _push_base_image(registry, repository="app", reference="latest"):
+    layer = gzip.compress(b"base layer")
+    config = json.dumps(
+        {
+            "architecture": "amd64",
+            "os": "linux",
+            "rootfs": {"type": "layers", "diff_ids": [_digest(b"base layer")]},
+            "history": [{"created_by": "COPY . /srv"}],
+        }
+    ).encode()
+    FakeRegistry.blobs[(repository, _digest(layer))] = layer
+    FakeRegistry.blobs[(repository, _digest(config))] = config
+    manifest = json.dumps(
+        {
+            "schemaVersion": 2,
+            "mediaType": DOCKER_MANIFEST_TYPE,
+            "config": {
+                "mediaType": "application/vnd.docker.container.image.v1+json",
+                "digest": _digest(config),
+                "size": len(config),
+            },
+            "layers": [
+                {
+                    "mediaType": "application/vnd.docker.image.rootfs.diff.tar.gzip",
+                    "digest": _digest(layer),
+                    "size": len(layer),
+                }
+            ],
+        }
+    ).encode()
+    entry = (DOCKER_MANIFEST_TYPE, manifest)
+    FakeRegistry.manifests[(repository, reference)] = entry
+    FakeRegistry.manifests[(repository, _digest(manifest))] = entry
+    return _digest(manifest)
+
+
+def _read_layer(layer):
+    with tarfile.open(fileobj=io.BytesIO(gzip.decompress(layer))) as tar:
+        return {
+            member.name: tar.extractfile(member).read() if member.isfile() else None
+            for member in tar.getmembers()
+        }
+
+
+@pytest.fixture
+def build_context(build_context):
+    (build_context / "Dockerfile").write_text("FROM scratch\nCOPY . /srv\n")
+    (build_context / "src").mkdir()
+    (build_context / "src" / "app.py").write_text("print('hello')\n")
+    (build_context / "requirements.txt").write_text("click\n")
+    return build_context
+
+
+def _build():
+    return EcsFileBuildModel(
+        code_layer=EcsFileCodeLayerModel(paths=["src"], destination="/srv")
+    )
+
+
+@pytest.mark.parametrize(
+    "image_name, expected",
+    [
+        ("app", ("registry-1.docker.io", "library/app", "latest")),
+        ("localhost:5000/team/app:v1", ("localhost:5000", "team/app", "v1")),
+        (
+            "123456789012.dkr.ecr.eu-west-1.amazonaws.com/app@sha256:abc",
+            ("123456789012.dkr.ecr.eu-west-1.amazonaws.com", "app", "sha256:abc"),
+        ),
+    ],
+)
+def test_parse_image_name(image_name, expected):
+    assert parse_image_name(image_name) == expected
+
+
+@pytest.mark.parametrize(
+    "path, code_paths, expected",
+    [
+        ("src/app.py", ["src"], True),
+        ("src", ["src"], True),
+        ("srcs/app.py", ["src"], False),
+        ("Dockerfile", ["."], True),
+    ],
+)
+def test_is_code_path(path, code_paths, expected):
+    assert is_code_path(path, code_paths) == expected
+
+
+def test_code_layer_holds_the_code_under_the_destination(build_context):
+    layer, diff_id = create_code_layer(".", "/srv", ["src/app.py"], ["src/old.py"])
+
+    files = _read_layer(layer)
+    assert files == {"srv/src/app.py": b"print('hello')\n", "srv/src/.wh.old.py": b""}
+    assert diff_id == _digest(gzip.decompress(layer))
+
+
+def test_code_layer_is_pushed_on_top_of_the_base_image(build_context, registry):
+    base_digest = _push_base_image(registry)
+    base = {"manifest": base_digest, "code_files": ["src/app.py", "src/old.py"]}
+
+    digest = push_code_layer(_build(), f"{registry}/app:latest", base, ["src/app.py"])
+
+    media_type, body = FakeRegistry.manifests[("app", "latest")]
+    manifest = json.loads(body)
+    assert media_type == DOCKER_MANIFEST_TYPE and digest == _digest(body)
+    assert len(manifest["layers"]) == 2
+    layer = FakeRegistry.blobs[("app", manifest["layers"][1]["digest"])]
+    assert _read_layer(layer) == {
+        "srv/src/app.py": b"print('hello')\n",
+        "srv/src/.wh.old.py": b"",
+    }
+    config = json.loads(FakeRegistry.blobs[("app", manifest["config"]["digest"])])
+    assert config["rootfs"]["diff_ids"][1] == _digest(gzip.decompress(layer))
+    assert len(config["history"]) == 2
+
+
+def test_platform_manifest_is_resolved_from_an_index(registry):
+    base_digest = _push_base_image(registry, reference="amd64")
+    index = json.dumps(
+        {
+            "schemaVersion": 2,
+            "mediaType": OCI_INDEX_TYPE,
+            "manifests": [
+                {"digest": "sha256:0", "platform": {"os": "unknown"}},
+                {
+                    "digest": base_digest,
+                    "platform": {"os": "linux", "architecture": "amd64"},
+                },
+            ],
+        }
+    ).encode()
+    FakeRegistry.manifests[("app", "latest")] = (OCI_INDEX_TYPE, index)
+
+    image_name = f"{registry}/app:latest"
+    assert resolve_platform_manifest(image_name, "linux/amd64") == base_digest
+    assert resolve_platform_manifest(image_name, "linux/arm64") is None
+
+
+def test_authorization_is_not_sent_to_the_blob_storage(registry, mocker):
+    mocker.patch(
+        "easyecs.docker.registry.get_registry_authorization",
+        return_value="Basic dXNlcjpwYXNzd29yZA==",
+    )
+    FakeRegistry.blobs[("app", _digest(b"blob"))] = b"blob"
+
+    client = RegistryClient(registry)
+
+    assert client.get_blob("app", _digest(b"blob")) == b"blob"
+
+
+def _config_digest(repository, manifest_digest):
+    manifest = json.loads(FakeRegistry.manifests[(repository, manifest_digest)][1])
+    return manifest["config"]["digest"]
+
+
+def test_image_digests_of_a_manifest(registry):
+    base_digest = _push_base_image(registry)
+
+    digests = fetch_image_digests(f"{registry}/app:latest", "linux/amd64")
+
+    assert digests == {base_digest, _config_digest("app", base_digest)}
+
+
+def test_image_digests_of_an_index(registry):
+    base_digest = _push_base_image(registry, reference="amd64")
+    index = json.dumps(
+        {
+            "schemaVersion": 2,
+            "mediaType": OCI_INDEX_TYPE,
+            "manifests": [
+                {
+                    "digest": base_digest,
+                    "platform": {"os": "linux", "architecture": "amd64"},
+                }
+            ],
+        }
+    ).encode()
+    FakeRegistry.manifests[("app", "latest")] = (OCI_INDEX_TYPE, index)
+
+    digests = fetch_image_digests(f"{registry}/app:latest", "linux/amd64")
+
+    assert digests == {
+        _digest(index),
+        base_digest,
+        _config_digest("app", base_digest),
+    }
+
+
+@pytest.mark.parametrize("local_image", ["config", "other"])
+def test_push_is_skipped_when_the_registry_has_the_image(
+    build_context, registry, mocker, local_image, mock_manifest
+):
+    base_digest = _push_base_image(registry)
+    image_id = (
+        _config_digest("app", base_digest) if local_image == "config" else "sha256:0"
+    )
+    mocker.patch("easyecs.docker.docker_image_id", return_value=image_id)
+    mocker.patch("easyecs.docker.docker_build_cmd", return_value="true")
+    docker_push_cmd = mocker.patch(
+        "easyecs.docker.docker_push_cmd", return_value="true"
+    )
+    ecs_manifest = mock_manifest(image=f"{registry}/app:latest")
+
+    results = build_docker_image(ecs_manifest, False)
+
+    if local_image == "config":
+        assert results == {"app": "already pushed"}
+        docker_push_cmd.assert_not_called()
+    else:
+        assert results == {"app": "built"}
+        docker_push_cmd.assert_called_once()
+
+
+def test_push_is_not_skipped_when_the_registry_lacks_the_image(
+    build_context, registry, mocker, mock_manifest
+):
+    mocker.patch("easyecs.docker.docker_image_id", return_value="sha256:0")
+    mocker.patch("easyecs.docker.docker_build_cmd", return_value="true")
+    docker_push_cmd = mocker.patch(
+        "easyecs.docker.docker_push_cmd", return_value="true"
+    )
+    ecs_manifest = mock_manifest(image=f"{registry}/app:latest")
+
+    assert build_docker_image(ecs_manifest, False) == {"app": "built"}
+    docker_push_cmd.assert_called_once()
+
+
+def test_code_change_pushes_a_code_layer(
+    build_context, registry, mocker, mock_manifest
+):
+    mocker.patch("easyecs.docker.docker_build_cmd", return_value="true")
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    image_name = f"{registry}/app:latest"
+    _push_base_image(registry)
+    assert build_docker_image(
+        mock_manifest(image=image_name, build=_build()), False
+    ) == {"app": "built"}
+
+    (build_context / "src" / "app.py").write_text("print('world')\n")
+    results = build_docker_image(mock_manifest(image=image_name, build=_build()), False)
+
+    assert results == {"app": "code layer"}
+    manifest = json.loads(FakeRegistry.manifests[("app", "latest")][1])
+    layer = FakeRegistry.blobs[("app", manifest["layers"][-1]["digest"])]
+    assert _read_layer(layer) == {"srv/src/app.py": b"print('world')\n"}
+
+
+def test_other_changes_rebuild_the_image(
+    build_context, registry, mocker, mock_manifest
+):
+    mocker.patch("easyecs.docker.docker_build_cmd", return_value="true")
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    image_name = f"{registry}/app:latest"
+    _push_base_image(registry)
+    build_docker_image(mock_manifest(image=image_name, build=_build()), False)
+
+    (build_context / "requirements.txt").write_text("click\npyyaml\n")
+
+    assert build_docker_image(
+        mock_manifest(image=image_name, build=_build()), False
+    ) == {"app": "built"}
+
+
+def test_missing_base_image_falls_back_to_a_full_build(
+    build_context, registry, mocker, mock_manifest
+):
+    mocker.patch("easyecs.docker.docker_build_cmd", return_value="true")
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    image_name = f"{registry}/app:latest"
+    base_digest = _push_base_image(registry)
+    build_docker_image(mock_manifest(image=image_name, build=_build()), False)
+    del FakeRegistry.manifests[("app", base_digest)]
+
+    (build_context / "src" / "app.py").write_text("print('world')\n")
+
+    assert build_docker_image(
+        mock_manifest(image=image_name, build=_build()), False
+    ) == {"app": "built"}
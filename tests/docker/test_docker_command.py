@@ -1,6 +1,15 @@
 from unittest.mock import MagicMock
 
-from easyecs.docker import docker_build_cmd
+import pytest
+
+from easyecs.docker import (
+    docker_build_cmd,
+    get_build_cache,
+    get_build_platforms,
+    get_image_repository,
+    soci_index_cmd,
+)
+from easyecs.model.ecs import EcsFileBuildModel
 
 
 def test_docker_command():
@@ -63,3 +72,170 @@ def test_docker_command_without_args():
         " --platform=linux/amd64 ."
     )
     assert docker_build_cmd(build, image_name) == expected_command
+
+
+def test_docker_command_with_push():
+    build = MagicMock()
+    build.dockerfile = "Dockerfile"
+    build.context = "."
+    build.args = {}
+    build.target = None
+    image_name = "test_image"
+
+    expected_command = (
+        "docker buildx build -t test_image -f Dockerfile --push"
+        " --platform=linux/amd64 ."
+    )
+    assert docker_build_cmd(build, image_name, push=True) == expected_command
+
+
+@pytest.mark.parametrize(
+    "image_name, repository",
+    [
+        ("app", "app"),
+        ("app:latest", "app"),
+        ("localhost:5000/app", "localhost:5000/app"),
+        ("localhost:5000/app:1.0", "localhost:5000/app"),
+        (
+            "123.dkr.ecr.eu-west-1.amazonaws.com/app@sha256:abc",
+            "123.dkr.ecr.eu-west-1.amazonaws.com/app",
+        ),
+    ],
+)
+def test_get_image_repository(image_name, repository):
+    assert get_image_repository(image_name) == repository
+
+
+def test_registry_cache_defaults():
+    build = EcsFileBuildModel(cache="registry")
+
+    assert get_build_cache(build, "registry/app:latest") == (
+        ["type=registry,ref=registry/app:buildcache"],
+        [
+            "type=registry,ref=registry/app:buildcache,mode=max,image-manifest=true,"
+            "oci-mediatypes=true"
+        ],
+    )
+
+
+def test_local_cache_defaults_to_a_directory_per_image():
+    cache_from, cache_to = get_build_cache(
+        EcsFileBuildModel(cache="local"), "registry/app:latest"
+    )
+    other_cache_from, _ = get_build_cache(
+        EcsFileBuildModel(cache="local"), "registry/worker:latest"
+    )
+
+    assert cache_from[0].startswith("type=local,src=.tmp/buildcache/")
+    assert cache_to == [
+        f"type=local,dest={cache_from[0][len('type=local,src='):]},mode=max"
+    ]
+    assert cache_from != other_cache_from
+
+
+def test_inline_cache_defaults():
+    assert get_build_cache(
+        EcsFileBuildModel(cache="inline"), "registry/app:latest"
+    ) == (
+        ["type=registry,ref=registry/app:latest"],
+        ["type=inline"],
+    )
+
+
+def test_explicit_cache_overrides_the_preset():
+    build = EcsFileBuildModel(cache="registry", cache_to=["type=local,dest=/tmp/cache"])
+
+    cache_from, cache_to = get_build_cache(build, "registry/app:latest")
+
+    assert cache_from == ["type=registry,ref=registry/app:buildcache"]
+    assert cache_to == ["type=local,dest=/tmp/cache"]
+
+
+def test_docker_command_with_cache():
+    build = EcsFileBuildModel(
+        dockerfile="Dockerfile",
+        cache_from=["type=local,src=/tmp/my cache"],
+        cache_to=["type=inline"],
+    )
+
+    expected_command = (
+        "docker buildx build -t test_image -f Dockerfile"
+        " --cache-from='type=local,src=/tmp/my cache' --cache-to=type=inline"
+        " --platform=linux/amd64 ."
+    )
+    assert docker_build_cmd(build, "test_image") == expected_command
+
+
+def test_docker_command_with_platforms():
+    build = EcsFileBuildModel()
+
+    command = docker_build_cmd(
+        build, "test_image", platforms=["linux/arm64", "linux/amd64"]
+    )
+
+    assert (
+        command
+        == "docker buildx build -t test_image -f Dockerfile"
+        " --platform=linux/arm64,linux/amd64 ."
+    )
+
+
+@pytest.mark.parametrize(
+    "architectures, platforms",
+    [
+        ([], ["linux/amd64"]),
+        (["arm64"], ["linux/arm64"]),
+        (["arm64", "x86_64"], ["linux/arm64", "linux/amd64"]),
+    ],
+)
+def test_build_platforms(architectures, platforms):
+    assert get_build_platforms(architectures) == platforms
+
+
+@pytest.mark.parametrize("push", [False, True])
+def test_docker_command_with_zstd_compression(push):
+    build = EcsFileBuildModel(compression="zstd")
+
+    command = docker_build_cmd(build, "test_image", push=push)
+
+    assert (
+        command
+        == "docker buildx build -t test_image -f Dockerfile"
+        f" --output=type=image,push={str(push).lower()},compression=zstd,"
+        "force-compression=true,oci-mediatypes=true --platform=linux/amd64 ."
+    )
+
+
+def test_soci_index_command(mocker):
+    mocker.patch("easyecs.docker.get_registry_credentials", return_value="AWS:pass")
+
+    command = soci_index_cmd("123456789012.dkr.ecr.eu-west-1.amazonaws.com/app:v1")
+
+    image = "123456789012.dkr.ecr.eu-west-1.amazonaws.com/app:v1"
+    assert (
+        command
+        == f"ctr image pull --user AWS:pass --platform linux/amd64 {image}"
+        f" && soci create --platform linux/amd64 {image}"
+        f" && soci push --user AWS:pass --platform linux/amd64 {image}"
+    )
+
+
+def test_soci_index_command_of_multi_platform_image():
+    command = soci_index_cmd("localhost:5000/app", ["linux/arm64", "linux/amd64"])
+
+    assert (
+        command
+        == "ctr image pull --all-platforms localhost:5000/app"
+        " && soci create --all-platforms localhost:5000/app"
+        " && soci push --all-platforms localhost:5000/app"
+    )
+
+
+def test_docker_command_with_progress():
+    command = docker_build_cmd(EcsFileBuildModel(), "test_image", progress="rawjson")
+
+    assert (
+        command
+        == "docker buildx build -t test_image -f Dockerfile --progress=rawjson"
+        " --platform=linux/amd64 ."
+    )
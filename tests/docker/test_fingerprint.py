@@ -0,0 +1,151 @@
+import pytest
+
+from easyecs.docker import build_docker_image
+from easyecs.docker.fingerprint import (
+    compile_dockerignore_pattern,
+    compute_build_fingerprint,
+    is_ignored,
+    list_context_files,
+)
+from easyecs.model.ecs import EcsFileBuildModel
+
+
+@pytest.fixture(autouse=True)
+def build_context(build_context):
+    (build_context / "Dockerfile").write_text("FROM scratch\nCOPY . .\n")
+    (build_context / "app.py").write_text("print('hello')\n")
+    (build_context / "node_modules").mkdir()
+    (build_context / "node_modules" / "lib.js").write_text("")
+    (build_context / ".dockerignore").write_text("# deps\nnode_modules\n*.log\n")
+    return build_context
+
+
+@pytest.fixture
+def docker(mocker):
+    mocker.patch("easyecs.docker.docker_push_cmd", return_value="true")
+    return mocker.patch("easyecs.docker.docker_build_cmd", return_value="true")
+
+
+@pytest.mark.parametrize(
+    "pattern, path, ignored",
+    [
+        ("node_modules", "node_modules/lib.js", True),
+        ("/node_modules/", "node_modules", True),
+        ("*.log", "debug.log", True),
+        ("*.log", "logs/debug.log", False),
+        ("**/*.log", "logs/debug.log", True),
+        ("**/*.log", "debug.log", True),
+        ("src/**", "src/a/b.py", True),
+        ("te?t", "test", True),
+        ("[a-c].py", "b.py", True),
+        ("[!a-c].py", "b.py", False),
+        ("docs", "docsite/index.md", False),
+    ],
+)
+def test_dockerignore_patterns(pattern, path, ignored):
+    assert is_ignored(path, [compile_dockerignore_pattern(pattern)]) == ignored
+
+
+def test_last_matching_pattern_wins():
+    patterns = [
+        compile_dockerignore_pattern(pattern)
+        for pattern in ["*.md", "!README.md", "README*"]
+    ]
+
+    assert is_ignored("CHANGELOG.md", patterns)
+    assert is_ignored("README.md", patterns)
+    assert not is_ignored("README.md", patterns[:2])
+
+
+def test_list_context_files_applies_dockerignore(build_context):
+    (build_context / "debug.log").write_text("")
+
+    assert list_context_files(".", ["node_modules", "*.log"]) == [
+        ".dockerignore",
+        "Dockerfile",
+        "app.py",
+    ]
+    assert list_context_files(".", ["node_modules", "!node_modules/lib.js"]) == [
+        ".dockerignore",
+        "Dockerfile",
+        "app.py",
+        "debug.log",
+        "node_modules/lib.js",
+    ]
+
+
+def test_unchanged_image_is_not_built_again(docker, mock_manifest):
+    assert build_docker_image(mock_manifest(), False) == {"app": "built"}
+    assert build_docker_image(mock_manifest(), False) == {"app": "unchanged"}
+    assert docker.call_count == 3
+
+
+def test_rebuild_forces_the_build(docker, mock_manifest):
+    build_docker_image(mock_manifest(), False)
+
+    assert build_docker_image(mock_manifest(), False, rebuild=True) == {"app": "built"}
+
+
+@pytest.mark.parametrize(
+    "update, rebuilt",
+    [
+        (lambda context: (context / "app.py").write_text("print('bye')\n"), True),
+        (lambda context: (context / "Dockerfile").write_text("FROM alpine\n"), True),
+        (lambda context: (context / "new.py").write_text(""), True),
+        (lambda context: (context / "node_modules" / "lib.js").write_text("x"), False),
+        (lambda context: (context / "debug.log").write_text(""), False),
+    ],
+)
+def test_context_changes_trigger_a_build(
+    build_context, docker, update, rebuilt, mock_manifest
+):
+    build_docker_image(mock_manifest(), False)
+
+    update(build_context)
+
+    expected = "built" if rebuilt else "unchanged"
+    assert build_docker_image(mock_manifest(), False) == {"app": expected}
+
+
+def test_build_args_are_fingerprinted(docker, mock_manifest):
+    docker.side_effect = lambda build, image_name, **kwargs: f"true {build.args['A']}"
+    build_docker_image(mock_manifest(build=EcsFileBuildModel(args={"A": "1"})), False)
+
+    results = build_docker_image(
+        mock_manifest(build=EcsFileBuildModel(args={"A": "2"})), False
+    )
+
+    assert results == {"app": "built"}
+
+
+def test_architectures_are_fingerprinted(docker, mock_manifest):
+    docker.side_effect = (
+        lambda build, image_name, platforms, **kwargs: f"true {','.join(platforms)}"
+    )
+    build_docker_image(mock_manifest(), False)
+
+    results = build_docker_image(mock_manifest(architectures=["arm64"]), False)
+
+    assert results == {"app": "built"}
+
+
+def test_failed_build_is_not_fingerprinted(docker, mock_manifest):
+    docker.return_value = "false"
+    with pytest.raises(Exception):
+        build_docker_image(mock_manifest(), False)
+
+    docker.return_value = "true"
+    assert build_docker_image(mock_manifest(), False) == {"app": "built"}
+
+
+def test_unchanged_files_are_not_hashed_again(mocker):
+    build = EcsFileBuildModel()
+    _, files = compute_build_fingerprint(build, "docker buildx build", {})
+    hash_file = mocker.patch(
+        "easyecs.docker.fingerprint.hash_file", return_value="hash"
+    )
+
+    compute_build_fingerprint(build, "docker buildx build", files)
+
+    # Only the Dockerfile, which is hashed wherever it lies.
+    assert hash_file.call_count == 1
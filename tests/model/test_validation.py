@@ -10,6 +10,8 @@ from easyecs.model.ecs import (
     EcsFileResourcesModel,
     EcsFileContainerModel,
     EcsTaskDefinitionModel,
+    EcsFileCodeLayerModel,
+    EcsFileBuildModel,
 )  # Replace 'your_module' with the actual module name
 
 
@@ -39,6 +41,15 @@ def test_unique_sid_validation():
     assert "Duplicate sid" in error_message
 
 
+def test_layered_stacks_without_auto_destruction():
+    with pytest.raises(ValidationError) as exc_info:
+        EcsFileMetadataModel(
+            appname="test_app", layered_stacks=True, auto_destruction=60
+        )
+    error_message = exc_info.value.errors()[0]["msg"]
+    assert "auto_destruction is not supported with layered_stacks" in error_message
+
+
 def test_single_tty_validation():
     with pytest.raises(ValidationError) as exc_info:
         container1 = EcsFileContainerModel(
@@ -99,3 +110,56 @@ def test_arn_validation(test_input: str, expected: Union[str, ValidationError]):
     else:
         fm = EcsFileRoleModel(arn=test_input)
         assert fm.arn == expected, f"Expected: {expected}, Got: {fm.arn}"
+
+
+def _task_definition(**kwargs):
+    return EcsTaskDefinitionModel(
+        resources=EcsFileResourcesModel(
+            limits=EcsFileLimitsModel(cpu=1024, memory=2048)
+        ),
+        containers=[
+            EcsFileContainerModel(
+                name="container1",
+                image="image1",
+                resources=EcsFileResourcesModel(
+                    limits=EcsFileLimitsModel(cpu=1024, memory=2048)
+                ),
+            )
+        ],
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize(
+    "architecture,expected",
+    [(None, []), ("arm64", ["arm64"]), (["arm64", "x86_64"], ["arm64", "x86_64"])],
+)
+def test_architectures(architecture, expected):
+    assert _task_definition(architecture=architecture).architectures == expected
+
+
+@pytest.mark.parametrize("architecture", [[], ["arm64", "arm64"], "armv7"])
+def test_architecture_validation(architecture):
+    with pytest.raises(ValidationError):
+        _task_definition(architecture=architecture)
+
+
+@pytest.mark.parametrize(
+    "paths,destination",
+    [(["../src"], "/srv"), (["/src"], "/srv"), ([], "/srv"), (["src"], "srv")],
+)
+def test_code_layer_validation(paths, destination):
+    with pytest.raises(ValidationError):
+        EcsFileCodeLayerModel(paths=paths, destination=destination)
+
+
+def test_code_layer_paths_are_normalized():
+    code_layer = EcsFileCodeLayerModel(paths=["./src/", "."], destination="/srv")
+    assert code_layer.paths == ["src", "."]
+
+
+def test_soci_with_zstd_compression():
+    with pytest.raises(ValidationError) as exc_info:
+        EcsFileBuildModel(compression="zstd", soci=True)
+    error_message = exc_info.value.errors()[0]["msg"]
+    assert "soci is not supported with zstd compression" in error_message
@@ -1,12 +1,28 @@
 import json
+from pathlib import Path
+import signal
 import subprocess
+import threading
+import time
 from unittest.mock import MagicMock
 
 from botocore.client import ClientError
 import pytest
 
-from easyecs.cli import action_dev, action_run
+from easyecs.cli import (
+    action_delete,
+    action_dev,
+    action_run,
+    step_bring_up_stack,
+    step_clean_exit,
+    step_create_or_update_stacks,
+    step_docker_build_and_push,
+    step_import_aws_cdk,
+    step_prewarm_aws_cdk,
+    step_wait_for_containers,
+)
 from easyecs.command import generate_ssm_cmd
+from easyecs.helpers.exceptions import StackDeploymentException
 
 # Those tests are checking if cloudformation is called in different use cases.
 # It also checks if waiters are called to wait for the stack to be completed.
@@ -16,16 +32,32 @@ from easyecs.command import generate_ssm_cmd
 @pytest.fixture
 def setup_mocker(mocker):
     mocker.patch("easyecs.cli.load_settings")
-    mocker.patch("easyecs.cli.read_ecs_file")
+    read_ecs_file = mocker.patch("easyecs.cli.read_ecs_file")
+    read_ecs_file.return_value.metadata.layered_stacks = False
+    read_ecs_file.return_value.metadata.shared_cluster = False
+    mocker.patch("easyecs.cli.is_aws_cdk_required", return_value=True)
+    mocker.patch("easyecs.cli.step_prewarm_aws_cdk")
     mocker.patch("easyecs.cli.step_import_aws_cdk")
-    mocker.patch("easyecs.cli.step_docker_build_and_push")
-    mocker.patch("easyecs.cli.fetch_containers")
+    mocker.patch("easyecs.cli.step_docker_build_and_push", return_value={})
+    mocker.patch("easyecs.cli.fetch_tasks_containers", return_value=({"task": {}}, []))
     mocker.patch("easyecs.cli.fetch_aws_account")
     mocker.patch("easyecs.cli.fetch_load_balancer_dns")
     mocker.patch("easyecs.cli.create_port_forwards")
     mocker.patch("easyecs.cloudformation.stack.create.fetch_stack_url")
     mocker.patch("easyecs.cloudformation.stack.update.fetch_stack_url")
     mocker.patch("easyecs.cloudformation.stack.delete.fetch_stack_url")
+    mocker.patch(
+        "easyecs.cloudformation.stack.update.fetch_deployed_template",
+        return_value=None,
+    )
+    mocker.patch("easyecs.cloudformation.stack.update.save_deployed_template")
+    mocker.patch("easyecs.cloudformation.stack.create.save_deployed_template")
+    mocker.patch(
+        "easyecs.cloudformation.stack.change_set.wait_for_change_set",
+        return_value={"Status": "CREATE_COMPLETE"},
+    )
+    mocker.patch("easyecs.cloudformation.stack.create.watch_stack_events")
+    mocker.patch("easyecs.cloudformation.stack.update.watch_stack_events")
     mocker.patch("easyecs.cloudformation.stack.waiter.get_client_cloudformation")
     mocker.patch("easyecs.cli.run_nc_commands")
     mocker.patch("easyecs.command.run_sync_thread")
@@ -34,6 +66,8 @@ def setup_mocker(mocker):
     mocker.patch("easyecs.cli.step_clean_exit")
     mocker.patch("easyecs.cli.save_hash")
     mocker.patch("easyecs.cli.has_ecs_file_changed", return_value=True)
+    mocker.patch("easyecs.cli.save_deployed_manifest")
+    mocker.patch("easyecs.cli.step_reconcile_service")
 
 
 def get_params():
@@ -60,18 +94,19 @@ actions = [action_dev, action_run]
 @pytest.mark.parametrize("action", actions)
 def test_cloudformation_create_stack_is_called(action, setup_mocker, mocker):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=False)
-    mocker.patch("easyecs.cloudformation.stack.create.load_template", return_value={})
 
     mock = MagicMock()
     mocker.patch(
-        "easyecs.cloudformation.stack.create.get_client_cloudformation",
+        "easyecs.cloudformation.stack.change_set.get_client_cloudformation",
         return_value=mock,
     )
 
     params = get_params()
     run_action(action, params)
 
-    mock.create_stack.assert_called_once()
+    mock.create_change_set.assert_called_once()
+    assert mock.create_change_set.call_args.kwargs["ChangeSetType"] == "CREATE"
+    mock.execute_change_set.assert_called_once()
 
 
 @pytest.mark.parametrize("action", actions)
@@ -79,20 +114,17 @@ def test_cloudformation_create_stack_is_not_called_stack_created(
     action, setup_mocker, mocker
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
-    mocker.patch("easyecs.cloudformation.stack.update.update_cloudformation_stack")
-    mocker.patch("easyecs.cloudformation.stack.update.wait_for_stack_update")
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
 
     mock = MagicMock()
     mocker.patch(
-        "easyecs.cloudformation.stack.create.get_client_cloudformation",
+        "easyecs.cloudformation.stack.change_set.get_client_cloudformation",
         return_value=mock,
     )
 
     params = get_params()
     run_action(action, params)
 
-    mock.create_stack.assert_not_called()
+    assert mock.create_change_set.call_args.kwargs["ChangeSetType"] != "CREATE"
 
 
 @pytest.mark.parametrize("action", actions)
@@ -100,18 +132,19 @@ def test_cloudformation_update_stack_is_called_stack_created(
     action, setup_mocker, mocker
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
 
     mock = MagicMock()
     mocker.patch(
-        "easyecs.cloudformation.stack.update.get_client_cloudformation",
+        "easyecs.cloudformation.stack.change_set.get_client_cloudformation",
         return_value=mock,
     )
 
     params = get_params()
     run_action(action, params)
 
-    mock.update_stack.assert_called_once()
+    mock.create_change_set.assert_called_once()
+    assert mock.create_change_set.call_args.kwargs["ChangeSetType"] == "UPDATE"
+    mock.execute_change_set.assert_called_once()
 
 
 @pytest.mark.parametrize("action", actions)
@@ -119,28 +152,56 @@ def test_cloudformation_update_stack_is_called_stack_created_no_update(
     action, setup_mocker, mocker
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
+    mocker.patch(
+        "easyecs.cloudformation.stack.change_set.wait_for_change_set",
+        return_value={
+            "Status": "FAILED",
+            "StatusReason": (
+                "The submitted information didn't contain changes. Submit"
+                " different information to create a change set."
+            ),
+        },
+    )
 
-    error_response = {
-        "Error": {"Code": None, "Message": "No updates are to be performed."}
-    }
+    mock = MagicMock()
     mocker.patch(
-        "easyecs.cloudformation.stack.update.wait_for_stack_update",
-        side_effect=ClientError(
-            error_response=error_response, operation_name="stack_rollback_complete"
-        ),
+        "easyecs.cloudformation.stack.change_set.get_client_cloudformation",
+        return_value=mock,
+    )
+
+    params = get_params()
+    run_action(action, params)
+
+    mock.create_change_set.assert_called_once()
+    mock.delete_change_set.assert_called_once()
+    mock.execute_change_set.assert_not_called()
+
+
+@pytest.mark.parametrize("action", actions)
+def test_cloudformation_update_stack_is_not_called_template_unchanged(
+    action, setup_mocker, mocker
+):
+    mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
+    mocker.patch(
+        "easyecs.cloudformation.stack.update.fetch_deployed_template",
+        return_value={},
+    )
+    run_force_new_deployment = mocker.patch(
+        "easyecs.cloudformation.stack.update.run_force_new_deployment"
     )
 
     mock = MagicMock()
     mocker.patch(
-        "easyecs.cloudformation.stack.update.get_client_cloudformation",
+        "easyecs.cloudformation.stack.change_set.get_client_cloudformation",
         return_value=mock,
     )
 
     params = get_params()
+    params["force_redeployment"] = True
     run_action(action, params)
 
-    mock.update_stack.assert_called_once()
+    mock.create_change_set.assert_not_called()
+    run_force_new_deployment.assert_called_once()
 
 
 @pytest.mark.parametrize("action", actions)
@@ -148,12 +209,11 @@ def test_cloudformation_cancel_update_is_called_stack_created_no_update_update_i
     action, setup_mocker, mocker
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
-    mocker.patch("easyecs.cloudformation.stack.update.get_client_cloudformation")
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
 
     error_response = {"Error": {"Code": None, "Message": "UPDATE_IN_PROGRESS"}}
     mocker.patch(
-        "easyecs.cloudformation.stack.update.wait_for_stack_update",
+        "easyecs.cloudformation.stack.update.watch_stack_events",
         side_effect=ClientError(
             error_response=error_response, operation_name="stack_rollback_complete"
         ),
@@ -176,12 +236,11 @@ def test_cloudformation_waiter_stack_rollback_complete_is_called_stack_created_n
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
     mocker.patch("easyecs.cloudformation.stack.update.boto3.resource")
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
-    mocker.patch("easyecs.cloudformation.stack.update.get_client_cloudformation")
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
 
     error_response = {"Error": {"Code": None, "Message": "UPDATE_IN_PROGRESS"}}
     mocker.patch(
-        "easyecs.cloudformation.stack.update.wait_for_stack_update",
+        "easyecs.cloudformation.stack.update.watch_stack_events",
         side_effect=ClientError(
             error_response=error_response, operation_name="stack_rollback_complete"
         ),
@@ -205,12 +264,11 @@ def test_cloudformation_waiter_stack_rollback_complete_is_called_stack_created_n
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
     mocker.patch("easyecs.cloudformation.stack.update.boto3.resource")
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
-    mocker.patch("easyecs.cloudformation.stack.update.get_client_cloudformation")
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
 
     error_response = {"Error": {"Code": None, "Message": "ROLLBACK_IN_PROGRESS"}}
     mocker.patch(
-        "easyecs.cloudformation.stack.update.wait_for_stack_update",
+        "easyecs.cloudformation.stack.update.watch_stack_events",
         side_effect=ClientError(
             error_response=error_response, operation_name="stack_rollback_complete"
         ),
@@ -234,12 +292,11 @@ def test_cloudformation_waiter_stack_rollback_complete_is_called_stack_created_n
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
     mocker.patch("easyecs.cloudformation.stack.update.boto3.resource")
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
-    mocker.patch("easyecs.cloudformation.stack.update.get_client_cloudformation")
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
 
     error_response = {"Error": {"Code": None, "Message": "CREATE_IN_PROGRESS"}}
     mocker.patch(
-        "easyecs.cloudformation.stack.update.wait_for_stack_update",
+        "easyecs.cloudformation.stack.update.watch_stack_events",
         side_effect=ClientError(
             error_response=error_response, operation_name="stack_create_complete"
         ),
@@ -258,43 +315,72 @@ def test_cloudformation_waiter_stack_rollback_complete_is_called_stack_created_n
 
 
 @pytest.mark.parametrize("action", actions)
-def test_cloudformation_waiter_stack_update_complete_is_called_stack_created(  # noqa: E501
+def test_cloudformation_stack_events_are_watched_stack_created(  # noqa: E501
     action, setup_mocker, mocker
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
-    mocker.patch("easyecs.cloudformation.stack.update.boto3.resource")
-    mocker.patch("easyecs.cloudformation.stack.update.load_template", return_value={})
-    mocker.patch("easyecs.cloudformation.stack.update.get_client_cloudformation")
-
-    mock = MagicMock()
-    mocker.patch(
-        "easyecs.cloudformation.stack.waiter.get_client_cloudformation",
-        return_value=mock,
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
+    watch_stack_events = mocker.patch(
+        "easyecs.cloudformation.stack.update.watch_stack_events"
     )
 
     params = get_params()
     run_action(action, params)
 
-    mock.get_waiter.assert_called_once_with("stack_update_complete")
+    watch_stack_events.assert_called_once()
 
 
 @pytest.mark.parametrize("action", actions)
-def test_cloudformation_waiter_stack_create_complete_is_called_stack_not_created(  # noqa: E501
+def test_cloudformation_stack_events_are_watched_stack_not_created(  # noqa: E501
     action, setup_mocker, mocker
 ):
     mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=False)
-    mocker.patch("easyecs.cloudformation.stack.create.load_template", return_value={})
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
+    watch_stack_events = mocker.patch(
+        "easyecs.cloudformation.stack.create.watch_stack_events"
+    )
 
-    mock = MagicMock()
+    params = get_params()
+    run_action(action, params)
+
+    watch_stack_events.assert_called_once()
+
+
+@pytest.mark.parametrize("action", actions)
+def test_cloudformation_stack_is_deleted_creation_failed(action, setup_mocker, mocker):
+    mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=False)
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
     mocker.patch(
-        "easyecs.cloudformation.stack.create.get_client_cloudformation",
-        return_value=mock,
+        "easyecs.cloudformation.stack.create.watch_stack_events",
+        side_effect=StackDeploymentException("Stack ended in ROLLBACK_COMPLETE"),
     )
+    delete_stack = mocker.patch("easyecs.cloudformation.stack.create.delete_stack")
 
     params = get_params()
     run_action(action, params)
 
-    mock.get_waiter.assert_called_once_with("stack_create_complete")
+    delete_stack.assert_called_once()
+
+
+@pytest.mark.parametrize("action", actions)
+def test_run_stops_when_stack_update_failed(action, setup_mocker, mocker):
+    mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
+    mocker.patch("easyecs.cloudformation.stack.change_set.get_client_cloudformation")
+    mocker.patch(
+        "easyecs.cloudformation.stack.update.watch_stack_events",
+        side_effect=StackDeploymentException("Stack ended in UPDATE_ROLLBACK_COMPLETE"),
+    )
+    save_hash = mocker.patch("easyecs.cli.save_hash")
+    save_deployed_manifest = mocker.patch("easyecs.cli.save_deployed_manifest")
+
+    params = get_params()
+    if action == action_run:
+        params.pop("auto_install_nc")
+    with pytest.raises(SystemExit):
+        action(**params)
+
+    save_hash.assert_not_called()
+    save_deployed_manifest.assert_not_called()
 
 
 @pytest.mark.parametrize("action", actions)
@@ -304,7 +390,7 @@ def test_cloudformation_waiter_stack_no_create_or_update_if_hash_same(  # noqa:
     mocker.patch("easyecs.cli.has_ecs_file_changed", return_value=False)
 
     mocks = [
-        mocker.patch("easyecs.cli.step_import_aws_cdk"),
+        mocker.patch("easyecs.cli.is_aws_cdk_required", return_value=True),
         mocker.patch("easyecs.cli.step_docker_build_and_push"),
         mocker.patch("easyecs.cli.step_create_or_update_stack"),
         mocker.patch("easyecs.cli.save_hash"),
@@ -324,7 +410,7 @@ def test_cloudformation_waiter_stack_create_or_update_if_hash_same_force_redeplo
     mocker.patch("easyecs.cli.has_ecs_file_changed", return_value=False)
 
     mocks = [
-        mocker.patch("easyecs.cli.step_import_aws_cdk"),
+        mocker.patch("easyecs.cli.is_aws_cdk_required", return_value=True),
         mocker.patch("easyecs.cli.step_docker_build_and_push"),
         mocker.patch("easyecs.cli.step_create_or_update_stack"),
         mocker.patch("easyecs.cli.save_hash"),
@@ -350,16 +436,24 @@ def test_run_nc_when_dev_with_volumes(action, mocker):  # noqa: E501
     ecs_manifest.task_definition.containers = [container]
     mocker.patch("easyecs.cli.read_ecs_file", return_value=ecs_manifest)
     mocker.patch("easyecs.cli.step_bring_up_stack")
+    mocker.patch("easyecs.cli.step_prewarm_aws_cdk")
     parsed_containers = MagicMock()
-    mocker.patch("easyecs.cli.fetch_containers", return_value=parsed_containers)
+    mocker.patch(
+        "easyecs.cli.fetch_tasks_containers",
+        return_value=({"task": parsed_containers}, []),
+    )
     mocker.patch("easyecs.cli.create_port_forwards")
     mocker.patch("easyecs.command.run_sync_thread")
     mocker.patch("easyecs.cli.execute_command")
     mocker.patch("easyecs.cli.step_idle_keyboard")
     mocker.patch("easyecs.cli.step_clean_exit")
-    mocker.patch("easyecs.command.check_nc_command", return_value=True)
+    mocker.patch(
+        "easyecs.command.read_bootstrap_status",
+        return_value={"nc": "present", "ports": [8000]},
+    )
+    mocker.patch("easyecs.command.Thread")
     mocker.patch("easyecs.command.generate_random_port", return_value=8000)
-    mocker.patch("easyecs.command.port_forward")
+    port_forward = mocker.patch("easyecs.command.port_forward")
     mocker.patch("easyecs.command.boto3.client")
     ssm_cmd = MagicMock()
     mocker.patch("easyecs.command.generate_ssm_cmd", return_value=ssm_cmd)
@@ -373,8 +467,10 @@ def test_run_nc_when_dev_with_volumes(action, mocker):  # noqa: E501
         ssm_cmd,
         start_new_session=True,
         stdin=subprocess.PIPE,
-        stdout=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
     )
+    port_forward.assert_called_once()
 
 
 def test_generate_cmd_nc_server(mocker):  # noqa: E501
@@ -407,14 +503,21 @@ def test_no_run_nc_when_dev_without_synchronize(action, mocker):  # noqa: E501
     ecs_manifest.task_definition.containers = [container]
     mocker.patch("easyecs.cli.read_ecs_file", return_value=ecs_manifest)
     mocker.patch("easyecs.cli.step_bring_up_stack")
+    mocker.patch("easyecs.cli.step_prewarm_aws_cdk")
     parsed_containers = MagicMock()
-    mocker.patch("easyecs.cli.fetch_containers", return_value=parsed_containers)
+    mocker.patch(
+        "easyecs.cli.fetch_tasks_containers",
+        return_value=({"task": parsed_containers}, []),
+    )
     mocker.patch("easyecs.cli.create_port_forwards")
     mocker.patch("easyecs.command.run_sync_thread")
     mocker.patch("easyecs.cli.execute_command")
     mocker.patch("easyecs.cli.step_idle_keyboard")
     mocker.patch("easyecs.cli.step_clean_exit")
-    mocker.patch("easyecs.command.check_nc_command", return_value=True)
+    mocker.patch(
+        "easyecs.command.read_bootstrap_status",
+        return_value={"nc": "present", "ports": []},
+    )
     mocker.patch("easyecs.command.generate_random_port", return_value=8000)
     mocker.patch("easyecs.command.port_forward")
     mocker.patch("easyecs.command.boto3.client")
@@ -439,14 +542,21 @@ def test_no_run_nc_when_dev_with_synchronize_without_nc(action, mocker):  # noqa
     ecs_manifest.task_definition.containers = [container]
     mocker.patch("easyecs.cli.read_ecs_file", return_value=ecs_manifest)
     mocker.patch("easyecs.cli.step_bring_up_stack")
+    mocker.patch("easyecs.cli.step_prewarm_aws_cdk")
     parsed_containers = MagicMock()
-    mocker.patch("easyecs.cli.fetch_containers", return_value=parsed_containers)
+    mocker.patch(
+        "easyecs.cli.fetch_tasks_containers",
+        return_value=({"task": parsed_containers}, []),
+    )
     mocker.patch("easyecs.cli.create_port_forwards")
     mocker.patch("easyecs.command.run_sync_thread")
     mocker.patch("easyecs.cli.execute_command")
     mocker.patch("easyecs.cli.step_idle_keyboard")
     mocker.patch("easyecs.cli.step_clean_exit")
-    mocker.patch("easyecs.command.check_nc_command", return_value=False)
+    mocker.patch(
+        "easyecs.command.read_bootstrap_status",
+        return_value={"nc": "missing", "ports": []},
+    )
     mocker.patch("easyecs.command.generate_random_port", return_value=8000)
     mocker.patch("easyecs.command.port_forward")
     mocker.patch("easyecs.command.boto3.client")
@@ -479,8 +589,12 @@ def test_run_port_forward(action, ports, mocker):  # noqa: E501
     ecs_manifest.task_definition.containers = [container]
     mocker.patch("easyecs.cli.read_ecs_file", return_value=ecs_manifest)
     mocker.patch("easyecs.cli.step_bring_up_stack")
+    mocker.patch("easyecs.cli.step_prewarm_aws_cdk")
     parsed_containers = MagicMock()
-    mocker.patch("easyecs.cli.fetch_containers", return_value=parsed_containers)
+    mocker.patch(
+        "easyecs.cli.fetch_tasks_containers",
+        return_value=({"task": parsed_containers}, []),
+    )
     mocker.patch("easyecs.command.run_sync_thread")
     mocker.patch("easyecs.cli.execute_command")
     mocker.patch("easyecs.cli.step_idle_keyboard")
@@ -527,8 +641,12 @@ def test_no_run_port_forward_port_in_use(action, ports, mocker):  # noqa: E501
     ecs_manifest.task_definition.containers = [container]
     mocker.patch("easyecs.cli.read_ecs_file", return_value=ecs_manifest)
     mocker.patch("easyecs.cli.step_bring_up_stack")
+    mocker.patch("easyecs.cli.step_prewarm_aws_cdk")
     parsed_containers = MagicMock()
-    mocker.patch("easyecs.cli.fetch_containers", return_value=parsed_containers)
+    mocker.patch(
+        "easyecs.cli.fetch_tasks_containers",
+        return_value=({"task": parsed_containers}, []),
+    )
     mocker.patch("easyecs.command.run_sync_thread")
     mocker.patch("easyecs.cli.execute_command")
     mocker.patch("easyecs.cli.step_idle_keyboard")
@@ -545,3 +663,317 @@ def test_no_run_port_forward_port_in_use(action, ports, mocker):  # noqa: E501
     run_action(action, params)
 
     process.assert_not_called()
+
+
+def test_clean_exit_signals_every_process_before_waiting(mocker):
+    port_forwards = [MagicMock(), MagicMock()]
+    exec_commands = [MagicMock()]
+    mocker.patch("easyecs.cli.popen_procs_port_forward", port_forwards)
+    mocker.patch("easyecs.cli.popen_procs_exec_command", exec_commands)
+    mocker.patch("easyecs.cli.threads", [])
+    terminate_processes = mocker.patch("easyecs.cli.terminate_processes")
+
+    step_clean_exit()
+
+    for port_forward in port_forwards:
+        port_forward.send_signal.assert_called_once_with(signal.SIGINT)
+        port_forward.wait.assert_not_called()
+    exec_commands[0].stdin.write.assert_called_once()
+    exec_commands[0].wait.assert_not_called()
+    terminate_processes.assert_called_once()
+    assert terminate_processes.call_args[0][0] == port_forwards + exec_commands
+
+
+def _build_and_push(cdk_required=False, no_docker_build=False):
+    return step_docker_build_and_push(
+        no_docker_build,
+        MagicMock(),
+        "bob-app",
+        "123456789012",
+        "eu-west-1",
+        "vpc-1",
+        ["subnet-a"],
+        ["eu-west-1a"],
+        False,
+        False,
+        cdk_required,
+    )
+
+
+def test_template_is_synthesized_while_images_build(mocker):
+    synthesis_started = threading.Event()
+
+    def create_template(*args):
+        synthesis_started.set()
+        return {"Resources": {}}
+
+    def build_docker_image(*args):
+        # Only returns if the template is synthesized concurrently.
+        assert synthesis_started.wait(timeout=10)
+        return {}
+
+    mocker.patch("easyecs.cli.create_template", side_effect=create_template)
+    mocker.patch("easyecs.cli.build_docker_image", side_effect=build_docker_image)
+    step_import_aws_cdk = mocker.patch("easyecs.cli.step_import_aws_cdk")
+    wait_for_aws_cdk = mocker.patch("easyecs.cli.wait_for_aws_cdk")
+
+    assert _build_and_push(cdk_required=True) == {"Resources": {}}
+    step_import_aws_cdk.assert_not_called()
+    wait_for_aws_cdk.assert_called_once()
+
+
+def test_aws_cdk_is_not_imported_when_not_required(mocker):
+    mocker.patch("easyecs.cli.create_template", return_value={"Resources": {}})
+    mocker.patch("easyecs.cli.build_docker_image", return_value={})
+    wait_for_aws_cdk = mocker.patch("easyecs.cli.wait_for_aws_cdk")
+
+    assert _build_and_push() == {"Resources": {}}
+    assert _build_and_push(no_docker_build=True) == {"Resources": {}}
+    wait_for_aws_cdk.assert_not_called()
+
+
+def test_template_synthesis_error_is_raised_after_build(mocker):
+    mocker.patch("easyecs.cli.create_template", side_effect=Exception("synth"))
+    build_docker_image = mocker.patch("easyecs.cli.build_docker_image")
+
+    with pytest.raises(Exception, match="synth"):
+        _build_and_push()
+    build_docker_image.assert_called_once()
+
+
+def test_build_failure_is_raised_without_waiting_for_synthesis(mocker):
+    synthesis_done = threading.Event()
+
+    def create_template(*args):
+        synthesis_done.wait(timeout=10)
+        return {"Resources": {}}
+
+    mocker.patch("easyecs.cli.create_template", side_effect=create_template)
+    mocker.patch("easyecs.cli.build_docker_image", side_effect=Exception("build"))
+
+    start = time.monotonic()
+    try:
+        with pytest.raises(Exception, match="build"):
+            _build_and_push()
+        assert time.monotonic() - start < 5
+    finally:
+        synthesis_done.set()
+
+
+def test_aws_cdk_is_imported_without_docker_build(mocker):
+    mocker.patch("easyecs.cli.create_template", return_value={"Resources": {}})
+    build_docker_image = mocker.patch("easyecs.cli.build_docker_image")
+    step_import_aws_cdk = mocker.patch("easyecs.cli.step_import_aws_cdk")
+
+    assert _build_and_push(cdk_required=True, no_docker_build=True) == {"Resources": {}}
+    step_import_aws_cdk.assert_called_once()
+    build_docker_image.assert_not_called()
+
+
+TEMPLATE_ARGS = (
+    "bob-app",
+    "123456789012",
+    "eu-west-1",
+    "vpc-1",
+    ["subnet-a"],
+    ["eu-west-1a"],
+    MagicMock(),
+    True,
+)
+
+
+def test_aws_cdk_is_prewarmed_when_required(mocker):
+    mocker.patch("easyecs.cli.aws_cdk_prewarm_thread", None)
+    is_aws_cdk_required = mocker.patch(
+        "easyecs.cli.is_aws_cdk_required", return_value=True
+    )
+    imported = threading.Event()
+    import_aws_cdk = mocker.patch(
+        "easyecs.cli.import_aws_cdk", side_effect=imported.set
+    )
+
+    step_prewarm_aws_cdk(TEMPLATE_ARGS)
+    step_prewarm_aws_cdk(TEMPLATE_ARGS)
+
+    assert imported.wait(timeout=10)
+    step_import_aws_cdk()
+    assert import_aws_cdk.call_count == 2
+    is_aws_cdk_required.assert_called_once_with(*TEMPLATE_ARGS)
+
+
+def test_aws_cdk_is_not_prewarmed_for_native_or_cached_template(mocker):
+    mocker.patch("easyecs.cli.aws_cdk_prewarm_thread", None)
+    mocker.patch("easyecs.cli.is_aws_cdk_required", return_value=False)
+    thread = mocker.patch("easyecs.cli.Thread")
+
+    step_prewarm_aws_cdk(TEMPLATE_ARGS)
+
+    thread.assert_not_called()
+
+
+def _cache_settings(deployed_manifest, reconcile=False):
+    return {
+        "aws_region": "eu-west-1",
+        "aws_account_id": "123456789012",
+        "vpc_id": "vpc-1",
+        "subnet_ids": ["subnet-a"],
+        "azs": ["eu-west-1a"],
+        "sha256": None,
+        "manifest": deployed_manifest,
+        "reconcile": reconcile,
+    }
+
+
+@pytest.mark.parametrize("reconcile", [False, True])
+def test_image_change_bypasses_cloudformation(reconcile, mocker):
+    mocker.patch("easyecs.cli.has_ecs_file_changed", return_value=True)
+    mocker.patch("easyecs.cli.fetch_is_stack_created", return_value=True)
+    mocker.patch("easyecs.cli.find_fast_path_changes", return_value={"web": None})
+    mocker.patch("easyecs.cli.dump_deployed_manifest", return_value={})
+    step_fast_update_service = mocker.patch("easyecs.cli.step_fast_update_service")
+    step_docker_build_and_push = mocker.patch("easyecs.cli.step_docker_build_and_push")
+    mocker.patch("easyecs.cli.is_aws_cdk_required", return_value=False)
+    step_create_or_update_stacks = mocker.patch(
+        "easyecs.cli.step_create_or_update_stacks"
+    )
+    save_deployed_manifest = mocker.patch("easyecs.cli.save_deployed_manifest")
+    mocker.patch("easyecs.cli.save_hash")
+
+    step_bring_up_stack(
+        _cache_settings({}),
+        False,
+        MagicMock(),
+        "bob-app",
+        "123456789012",
+        "eu-west-1",
+        "vpc-1",
+        ["subnet-a"],
+        ["eu-west-1a"],
+        False,
+        "account",
+        False,
+        run=False,
+        file_name="ecs.yml",
+        reconcile=reconcile,
+    )
+
+    if reconcile:
+        step_fast_update_service.assert_not_called()
+        step_docker_build_and_push.assert_called_once()
+        step_create_or_update_stacks.assert_called_once()
+        save_deployed_manifest.assert_called_once_with("account", {}, reconcile=False)
+    else:
+        step_fast_update_service.assert_called_once()
+        step_create_or_update_stacks.assert_not_called()
+        save_deployed_manifest.assert_called_once_with("account", {}, reconcile=True)
+
+
+def test_stack_update_reconciles_service_after_fast_path(mocker):
+    mocker.patch("easyecs.cli.has_ecs_file_changed", return_value=True)
+    mocker.patch("easyecs.cli.find_fast_path_changes", return_value=None)
+    mocker.patch("easyecs.cli.dump_deployed_manifest", return_value={})
+    mocker.patch("easyecs.cli.step_docker_build_and_push")
+    mocker.patch("easyecs.cli.is_aws_cdk_required", return_value=False)
+    mocker.patch("easyecs.cli.step_create_or_update_stacks")
+    mocker.patch("easyecs.cli.save_deployed_manifest")
+    mocker.patch("easyecs.cli.save_hash")
+    step_reconcile_service = mocker.patch("easyecs.cli.step_reconcile_service")
+    ecs_manifest = MagicMock()
+    ecs_manifest.metadata.user = "bob"
+    ecs_manifest.metadata.appname = "app"
+    ecs_manifest.metadata.shared_cluster = False
+
+    step_bring_up_stack(
+        _cache_settings({}, reconcile=True),
+        False,
+        ecs_manifest,
+        "bob-app",
+        "123456789012",
+        "eu-west-1",
+        "vpc-1",
+        ["subnet-a"],
+        ["eu-west-1a"],
+        False,
+        "account",
+        False,
+        run=False,
+        file_name="ecs.yml",
+    )
+
+    step_reconcile_service.assert_called_once_with("bob-app", "bob-app-cluster")
+
+
+def test_layered_stacks_deploy_base_stack_first(mocker):
+    ecs_manifest = MagicMock()
+    ecs_manifest.metadata.layered_stacks = True
+    ecs_manifest.metadata.shared_cluster = False
+    golden_path = Path(__file__).parent / "cloudformation/template/golden/basic.json"
+    template = json.loads(golden_path.read_text())["template"]
+    step_create_or_update_stack = mocker.patch(
+        "easyecs.cli.step_create_or_update_stack"
+    )
+
+    step_create_or_update_stacks(ecs_manifest, "bob-app", template, True)
+
+    calls = step_create_or_update_stack.call_args_list
+    assert [call.args[0] for call in calls] == ["bob-app-base", "bob-app"]
+    assert [call.args[2] for call in calls] == [False, True]
+    assert "Outputs" in calls[0].args[1]
+    assert sorted(calls[1].args[1]["Resources"]) == [
+        "bobappserviceService878D97A4",
+        "bobapptaskdefinition2A4E5EB7",
+    ]
+
+
+def test_shared_cluster_deploys_shared_stack_first(mocker):
+    ecs_manifest = MagicMock()
+    ecs_manifest.metadata.user = "bob"
+    ecs_manifest.metadata.appname = "app"
+    ecs_manifest.metadata.layered_stacks = False
+    ecs_manifest.metadata.shared_cluster = True
+    golden_path = Path(__file__).parent / "cloudformation/template/golden/basic.json"
+    template = json.loads(golden_path.read_text())["template"]
+    step_create_or_update_stack = mocker.patch(
+        "easyecs.cli.step_create_or_update_stack"
+    )
+
+    step_create_or_update_stacks(ecs_manifest, "bob-app", template, True)
+
+    calls = step_create_or_update_stack.call_args_list
+    assert [call.args[0] for call in calls] == ["bob-easyecs-shared", "bob-app"]
+    assert calls[1].args[2:] == (True, "bob-cluster")
+    assert "bobappcluster45F3AB9C" not in calls[1].args[1]["Resources"]
+
+
+@pytest.mark.parametrize("layered_stacks", [False, True])
+def test_delete_removes_base_stack_last(layered_stacks, mocker):
+    mocker.patch("easyecs.cli.fetch_aws_account")
+    mocker.patch("easyecs.cli.delete_hash")
+    ecs_manifest = MagicMock()
+    ecs_manifest.metadata.appname = "app"
+    ecs_manifest.metadata.user = "bob"
+    ecs_manifest.metadata.layered_stacks = layered_stacks
+    mocker.patch("easyecs.cli.read_ecs_file", return_value=ecs_manifest)
+    delete_stack = mocker.patch("easyecs.cli.delete_stack")
+
+    action_delete("ecs.yml")
+
+    expected = ["bob-app", "bob-app-base"] if layered_stacks else ["bob-app"]
+    assert [call.args[0] for call in delete_stack.call_args_list] == expected
+
+
+def test_image_pull_is_compared_with_the_previous_one(
+    tmp_path, monkeypatch, mocker, capsys
+):
+    monkeypatch.chdir(tmp_path)
+    mocker.patch("easyecs.cli.fetch_tasks_containers", return_value=({"task": {}}, []))
+    get_image_pull = mocker.patch("easyecs.cli.get_image_pull")
+    ecs_manifest = MagicMock()
+    ecs_manifest.metadata.shared_cluster = False
+
+    get_image_pull.return_value = ("2026-01-01T00:00:00+00:00", 30.0)
+    step_wait_for_containers("bob", "app", ecs_manifest)
+    get_image_pull.return_value = ("2026-01-02T00:00:00+00:00", 12.5)
+    step_wait_for_containers("bob", "app", ecs_manifest)
+
+    assert "Image pull: 12.5s, previously 30.0s" in capsys.readouterr().out
@@ -4,17 +4,24 @@ Test CloudFormation template generation without AWS credentials.
 This validates that the template is generated correctly with the new features.
 """
 
+import os
+
+import pytest
+
 from easyecs.helpers.settings import read_ecs_file
 from easyecs.cloudformation.template import create_template
-import json
 
+ECS_FILE = os.path.join(os.path.dirname(__file__), os.pardir, "ecs.yml")
 
-def test_template_generation():
+
+def test_template_generation(tmp_path, monkeypatch):
     """Test template generation with new features."""
     try:
         # Read config
-        ecs_data = read_ecs_file("ecs.yml")
+        ecs_data = read_ecs_file(ECS_FILE)
         print("✅ Config loaded successfully")
+        # The rendered template is cached under .tmp, kept out of the repo.
+        monkeypatch.chdir(tmp_path)
 
         # Mock AWS values for testing
         service_name = "test-service"
@@ -26,8 +33,7 @@ def test_template_generation():
 
         print("\n🔨 Generating CloudFormation template...")
 
-        # Generate template (this will create .cloudformation directory)
-        create_template(
+        template = create_template(
             service_name,
             aws_account_id,
             aws_region,
@@ -40,11 +46,6 @@ def test_template_generation():
 
         print("✅ Template generated successfully!")
 
-        # Read and analyze the generated template
-        template_path = ".cloudformation/test-service.template.json"
-        with open(template_path, "r") as f:
-            template = json.load(f)
-
         print("\n📋 Template Analysis:")
 
         # Find task definition in template
@@ -86,4 +87,4 @@ def test_template_generation():
 
 
 if __name__ == "__main__":
-    test_template_generation()
+    pytest.main([__file__])